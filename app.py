@@ -1,1396 +1,1407 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from supabase import create_client
-import json
-import time
-import os
-import base64
-import requests
-from datetime import datetime, timedelta, time as dt_time
-
-# ==============================================================================
-# 1. SETUP
-# ==============================================================================
-
-st.set_page_config(
-    page_title="Otti Workspace", 
-    layout="wide", 
-    page_icon="🐙", 
-    initial_sidebar_state="expanded" 
-)
-
-# --- CORES OFICIAIS OCTO ---
-C_BG_OCTO_LIGHT = "#E2E8F0"
-C_SIDEBAR_NAVY  = "#031A89"
-C_ACCENT_NEON   = "#3F00FF"
-C_TEXT_DARK     = "#101828"
-C_CARD_WHITE    = "#FFFFFF"
-C_BTN_DARK      = "#031A89"
-
-# ==============================================================================
-# 2. CONEXÃO
-# ==============================================================================
-
-SUPABASE_URL = st.secrets.get("SUPABASE_URL", "")
-SUPABASE_KEY = st.secrets.get("SUPABASE_KEY", "")
-
-@st.cache_resource
-def init_connection():
-    if not SUPABASE_URL: return None
-    try: return create_client(SUPABASE_URL, SUPABASE_KEY)
-    except: return None
-
-supabase = init_connection()
-
-# ==============================================================================
-# 3. CSS (VISUAL)
-# ==============================================================================
-
-st.markdown(f"""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Sora:wght@400;600;800&family=Inter:wght@300;400;600&display=swap');
-
-    .stApp {{ background-color: {C_BG_OCTO_LIGHT}; color: {C_TEXT_DARK}; font-family: 'Inter', sans-serif; }}
-    
-    /* --- SIDEBAR --- */
-    section[data-testid="stSidebar"] {{ background-color: {C_SIDEBAR_NAVY}; border-right: 1px solid rgba(255,255,255,0.1); }}
-    section[data-testid="stSidebar"] p, section[data-testid="stSidebar"] span, section[data-testid="stSidebar"] label {{ color: #FFFFFF !important; }}
-
-    h1 {{ font-family: 'Sora', sans-serif; color: {C_SIDEBAR_NAVY} !important; font-weight: 800; }}
-    h2, h3, h4 {{ font-family: 'Sora', sans-serif; color: {C_TEXT_DARK} !important; font-weight: 700; }}
-    p, label {{ color: {C_TEXT_DARK} !important; }}
-
-    /* --- ABAS --- */
-    button[data-baseweb="tab"] {{
-        color: {C_TEXT_DARK} !important;
-        font-family: 'Sora', sans-serif !important;
-        font-weight: 600 !important;
-    }}
-    button[data-baseweb="tab"][aria-selected="true"] {{
-        color: {C_ACCENT_NEON} !important;
-        border-color: {C_ACCENT_NEON} !important;
-    }}
-
-    /* --- INPUTS --- */
-    .stTextInput > div > div > input {{
-        background-color: #FFFFFF !important;
-        color: #000000 !important;
-        border: 1px solid #CBD5E1;
-        border-radius: 8px;
-    }}
-    .stTextInput > div > div > button {{
-        background-color: transparent !important;
-        color: #64748B !important;
-        border: none !important;
-    }}
-
-    div[data-baseweb="select"] > div {{ background-color: #FFFFFF !important; border-color: #CBD5E1 !important; }}
-    div[data-baseweb="select"] span {{ color: #000000 !important; }}
-    div[data-baseweb="popover"] {{ background-color: #FFFFFF !important; }}
-    div[data-baseweb="option"] {{ color: #000000 !important; }}
-
-    /* --- BOTÕES GERAIS --- */
-    button[kind="primary"] {{
-        background-color: #FFFFFF !important;
-        color: {C_ACCENT_NEON} !important;
-        border: 2px solid {C_ACCENT_NEON} !important;
-        padding: 0.6rem 1.2rem;
-        border-radius: 8px;
-        font-weight: 700;
-        transition: all 0.2s ease;
-    }}
-    button[kind="primary"]:hover {{
-        background-color: {C_ACCENT_NEON} !important;
-        color: #FFFFFF !important;
-        box-shadow: 0 4px 12px rgba(63, 0, 255, 0.2);
-        transform: translateY(-1px);
-    }}
-
-    /* --- BOTÕES DA SIDEBAR --- */
-    section[data-testid="stSidebar"] button[kind="secondary"] {{
-        background-color: transparent !important;
-        border: 1px solid rgba(255,255,255,0.6) !important;
-        color: #FFFFFF !important;
-    }}
-    section[data-testid="stSidebar"] button[kind="secondary"]:hover {{
-        background-color: #FFFFFF !important;
-        color: {C_SIDEBAR_NAVY} !important;
-        border-color: #FFFFFF !important;
-    }}
-    
-    /* Botão "Novo Cliente" - Azul Neon */
-    section[data-testid="stSidebar"] button[kind="primary"] {{
-        background-color: {C_ACCENT_NEON} !important;
-        color: #FFFFFF !important;
-        border: none !important;
-        font-weight: 800 !important;
-    }}
-    section[data-testid="stSidebar"] button[kind="primary"]:hover {{
-        background-color: #FFFFFF !important;
-        color: {C_ACCENT_NEON} !important;
-        transform: scale(1.02);
-    }}
-    
-    /* --- LOGIN & MOBILE --- */
-    .login-container {{
-        max-width: 400px; margin: 8vh auto 0 auto; background: white;
-        border-radius: 12px; box-shadow: 0 10px 40px rgba(0,0,0,0.1); overflow: hidden; 
-    }}
-    .login-header {{
-        background-color: {C_SIDEBAR_NAVY}; padding: 30px 0; text-align: center;
-        border-bottom: 4px solid {C_ACCENT_NEON}; display: flex; justify-content: center; align-items: center;
-    }}
-    .login-body {{ padding: 40px; padding-top: 20px; }}
-    div[data-testid="stForm"] {{ border: none; padding: 0; }}
-
-    @media (max-width: 600px) {{
-        .login-container {{ margin-top: 2vh; width: 95%; margin-left: auto; margin-right: auto; }}
-    }}
-
-    /* --- HEADER E CONTAINER --- */
-    #MainMenu, footer {{visibility: hidden;}}
-    header[data-testid="stHeader"] {{ background: transparent !important; }}
-    .block-container {{padding-top: 0rem !important; padding-bottom: 2rem;}}
-</style>
-""", unsafe_allow_html=True)
-
-# ==============================================================================
-# 4. LOGIN
-# ==============================================================================
-
-def get_image_as_base64(path):
-    try:
-        with open(path, "rb") as f: data = f.read()
-        return base64.b64encode(data).decode()
-    except: return None
-
-if 'usuario_logado' not in st.session_state: st.session_state['usuario_logado'] = None
-
-def render_login_screen():
-    c1, c2, c3 = st.columns([1, 1, 1])
-    with c2:
-        logo_b64 = get_image_as_base64("logo.png")
-        if logo_b64:
-            img_html = f'<img src="data:image/png;base64,{logo_b64}" width="120" style="filter: brightness(0) invert(1); display: block; margin: 0 auto;">'
-        else:
-            img_html = '<h1 style="color:white !important; margin:0; font-family:Sora;">OCTO</h1>'
-
-        st.markdown(f"""
-        <div class="login-container">
-            <div class="login-header">
-                {img_html}
-            </div>
-            <div class="login-body">
-                <h4 style="text-align:center; color:#101828; margin-bottom:20px; font-family:Sora;">Acessar Workspace</h4>
-        """, unsafe_allow_html=True)
-
-        with st.form("login_master"):
-            email = st.text_input("E-mail")
-            senha = st.text_input("Senha", type="password")            
-
-            st.markdown("<br>", unsafe_allow_html=True)          
-            submitted = st.form_submit_button("ENTRAR", type="primary", use_container_width=True)          
-
-            if submitted:
-                if not email or not senha: 
-                    st.warning("Preencha todos os campos.")
-                else:
-                    if not supabase: 
-                        st.error("Erro de configuração interna.")
-                    else:
-                        try:
-                            res = supabase.table('acesso_painel').select('*').eq('email', email).eq('senha', senha).execute()
-                            if res.data:
-                                st.session_state['usuario_logado'] = res.data[0]
-                                st.rerun()
-                            else: 
-                                st.error("Dados incorretos.")
-                        except Exception as e:
-                            st.error(f"Erro técnico: {e}")
-
-        st.markdown('</div></div>', unsafe_allow_html=True)
-
-if not st.session_state['usuario_logado']:
-    render_login_screen()
-    st.stop()
-
-# ==============================================================================
-# 5. CARREGAMENTO DE DADOS (CRUCIAL: ANTES DA SIDEBAR)
-# ==============================================================================
-
-user = st.session_state['usuario_logado']
-perfil = user.get('perfil', 'user')
-
-# --- CONFIGURAÇÃO DE NAVEGAÇÃO ---
-if 'modo_view' not in st.session_state: 
-    st.session_state['modo_view'] = 'dashboard'
-
-if perfil != 'admin':
-    st.session_state['modo_view'] = 'dashboard'
-
-# --- CARREGA DADOS DO BANCO ---
-if not supabase: st.stop()
-try: 
-    df_kpis = pd.DataFrame(supabase.table('view_dashboard_kpis').select("*").execute().data)
-except: 
-    df_kpis = pd.DataFrame()
-
-c_data = None
-
-# ==============================================================================
-# 6. SIDEBAR
-# ==============================================================================
-
-def render_sidebar_logo():
-    if os.path.exists("logo.png"): st.image("logo.png", width=120)
-    else: st.markdown(f"<h1 style='color:white; margin:0;'>OCTO</h1>", unsafe_allow_html=True)
-
-with st.sidebar:
-    st.markdown("<br>", unsafe_allow_html=True)
-    render_sidebar_logo()
-    st.markdown("---")
-    st.write(f"Olá, **{user.get('nome_usuario', 'User')}**")
-    st.markdown("---")
-
-    if st.button("SAIR", type="secondary"): 
-        st.session_state['usuario_logado'] = None
-        st.rerun()
-
-    # --- MENU DE ADMIN ---
-    if perfil == 'admin':
-        st.success("🔒 PAINEL ADMIN")
-        
-        # MODO DASHBOARD: Mostra seletor e botão de novo
-        if st.session_state['modo_view'] == 'dashboard':
-            if not df_kpis.empty:
-                lista = df_kpis['nome_empresa'].unique()
-                if 'last_cli' not in st.session_state: st.session_state['last_cli'] = lista[0]
-                if st.session_state['last_cli'] not in lista: st.session_state['last_cli'] = lista[0]
-                
-                idx = list(lista).index(st.session_state['last_cli'])
-                sel = st.selectbox("Cliente:", lista, index=idx, key="cli_selector")
-                st.session_state['last_cli'] = sel
-                
-                c_data = df_kpis[df_kpis['nome_empresa'] == sel].iloc[0]
-            else:
-                st.warning("Sem dados de KPI.")
-                c_data = None
-            
-            st.markdown("---")
-            if st.button("➕ NOVO CLIENTE", type="primary", use_container_width=True):
-                st.session_state['modo_view'] = 'cadastro'
-                st.rerun()
-        
-        # MODO CADASTRO: Mostra botão de voltar
-        else:
-            st.info("Modo de Cadastro")
-            st.markdown("---")
-            if st.button("⬅️ VOLTAR AO PAINEL", type="secondary", use_container_width=True):
-                st.session_state['modo_view'] = 'dashboard'
-                st.rerun()
-
-    # --- MENU DE USUÁRIO COMUM ---
-    else:
-        filtro = df_kpis[df_kpis['cliente_id'] == user['cliente_id']]
-        if filtro.empty: 
-            st.error("Cliente não encontrado.")
-            st.stop()
-        c_data = filtro.iloc[0]
-
-# ==============================================================================
-# 7. ROTEADOR DE TELAS (MAIN CONTENT)
-# ==============================================================================
-
-# --- TELA 1: CADASTRO DE CLIENTE (COMPLETO) ---
-if perfil == 'admin' and st.session_state['modo_view'] == 'cadastro':
-    st.title("🏢 Cadastro de Novo Cliente")
-    st.markdown("Configure a infraestrutura completa do novo inquilino.")
-    
-    with st.container(border=True):
-        with st.form("form_novo_cliente_full"):
-            
-            # --- 1. DADOS CADASTRAIS ---
-            st.markdown("### 1. 🏢 Dados da Empresa e Acesso")
-            c1, c2 = st.columns(2)
-            with c1:
-                empresa_nome = st.text_input("Nome da Empresa")
-                whats_id = st.text_input("WhatsApp ID (Ex: 551199999999)")
-                plano_sel = st.selectbox("Plano", ["full", "basic", "trial"], index=0)
-            with c2:
-                email_login = st.text_input("E-mail de Login")
-                senha_login = st.text_input("Senha Inicial", type="password")
-                humano_ativo = st.toggle("Atendimento Humano Ativo?", value=True)
-
-            st.divider()
-
-            # --- 2. FINANCEIRO (PIX E ADQUIRENTES) ---
-            st.markdown("### 2. 💰 Financeiro & Pagamentos")
-            cf1, cf2, cf3 = st.columns(3)
-            with cf1:
-                sinal_val = st.number_input("Sinal Mínimo (R$)", value=100.0, step=10.0)
-                checkout_auto = st.toggle("Checkout Automático?", value=False)
-            with cf2:
-                pix_key = st.text_input("Chave PIX")
-                gateway_sel = st.selectbox("Adquirente (Cartão)", ["Nenhum", "Mercado Pago", "InfinitePay", "Getnet"])
-            with cf3:
-                # Campo genérico para token, dependendo do gateway escolhido
-                gateway_token = st.text_input("Token/API Key do Adquirente", type="password", help="Cole a credencial de produção aqui")
-
-            st.divider()
-
-            # --- 3. INTELIGÊNCIA E COMPORTAMENTO ---
-            with st.expander("🧠 Configurações do Cérebro (IA)", expanded=False):
-                ci1, ci2 = st.columns(2)
-                with ci1:
-                    voz_ia = st.selectbox("Voz da OpenAI", ["alloy", "echo", "fable", "onyx", "nova", "shimmer"], index=0)
-                    temp_ia = st.slider("Criatividade (Temperatura)", 0.0, 1.0, 0.8)
-                with ci2:
-                    aceita_audio = st.toggle("Entende Áudio do Cliente?", value=True)
-                    responde_audio = st.toggle("Responde em Áudio?", value=False)
-                
-                st.markdown("**Instruções de Visão (Análise de Foto):**")
-                visao_txt = st.text_area("Prompt para fotos", value="FOTO DE REFERÊNCIA/INSPIRAÇÃO: Analise a decoração da foto (cores, tema, balões) e diga se conseguimos fazer algo parecido baseando-se no nosso catálogo.", height=80)
-                
-                btn_txt = st.text_input("Texto do Botão de Pedido", value="📝 Fazer Pedido")
-
-            # --- 4. FOLLOW-UP AUTOMÁTICO (COBRANÇA) ---
-            with st.expander("⏰ Follow-up Automático (Recuperação)", expanded=False):
-                f_ativo = st.checkbox("Ativar Follow-up Automático?", value=True)
-                cf_h1, cf_h2 = st.columns(2)
-                with cf_h1:
-                    fu_ini = st.time_input("Início dos Disparos", value=dt_time(9,0))
-                with cf_h2:
-                    fu_fim = st.time_input("Fim dos Disparos", value=dt_time(21,0))
-                
-                st.caption("As etapas padrão (30min, 60min, 24h) serão carregadas automaticamente. Edite no JSON se precisar mudar a lógica.")
-
-            st.markdown("<br>", unsafe_allow_html=True)
-            
-            # --- SUBMIT ---
-            if st.form_submit_button("✅ CADASTRAR", type="primary", use_container_width=True):
-                if not empresa_nome or not email_login or not senha_login:
-                    st.warning("Preencha Nome, Login e Senha pelo menos.")
-                else:
-                    try:
-                        with st.spinner("Subindo configuração completa..."):
-                            
-                            # 1. MONTAGEM DO JSON DE FOLLOW-UP (Padrão Rico)
-                            followup_structure = {
-                                "ativo": f_ativo,
-                                "horario_inicio": fu_ini.strftime("%H:%M"),
-                                "horario_fim": fu_fim.strftime("%H:%M"),
-                                "ignorar_horario_silencio": False,
-                                "system_prompt_template": "Você é o assistente de cobrança da {nome_empresa}. O cliente parou de responder.\nSua última msg foi: '{ultima_msg_bot}'.\n\nAgora, siga estritamente esta ordem: '{instrucao}'.\n\nREGRAS:\n- MÁXIMO 15 PALAVRAS.\n- NÃO mande links.\n- Se o cliente já fechou/desistiu, responda: CANCELAR_FLUXO",
-                                "etapas": [
-                                    {"nivel": 1, "minutos_apos_ultimo_input": 30, "instrucao_ia": "Seja gentil. O cliente parou de responder. Pergunte se ficou alguma dúvida."},
-                                    {"nivel": 2, "minutos_apos_ultimo_input": 60, "instrucao_ia": "Gere leve urgência. A data solicitada é muito procurada."},
-                                    {"nivel": 3, "minutos_apos_ultimo_input": 1440, "acao_sistema": "cancelar", "instrucao_ia": "Despedida profissional. Avise que o sistema liberou a data."}
-                                ]
-                            }
-
-                            # 2. MONTAGEM DO JSON CONFIG_FLUXO (O Cérebro Completo)
-                            config_completa = {
-                                "plano": plano_sel,
-                                # Horários Gerais (Padrão Loja)
-                                "horario_inicio": "09:00", 
-                                "horario_fim": "18:00",
-                                
-                                # Financeiro
-                                "sinal_minimo_reais": sinal_val,
-                                "chave_pix": pix_key,
-                                "checkout_automatico": checkout_auto,
-                                "adquirente_ativo": gateway_sel,
-                                "adquirente_token": gateway_token, # Cuidado com segurança em prod
-                                
-                                # IA & Voz
-                                "temperature": temp_ia,
-                                "openai_voice": voz_ia,
-                                "aceita_audio": aceita_audio,
-                                "responde_em_audio": responde_audio,
-                                "atendimento_humano_ativo": humano_ativo,
-                                "instrucoes_visao_especificas": visao_txt,
-                                "btn_texto_pedido_kit": btn_txt,
-                                
-                                # Módulo Follow-up
-                                "followup_automatico": followup_structure
-                            }
-
-                            # 3. INSERT NO BANCO
-                            res = supabase.table('clientes').insert({
-                                "nome_empresa": empresa_nome,
-                                "whatsapp_id": whats_id,
-                                "ativo": True,
-                                "bot_pausado": False,
-                                "config_fluxo": config_completa # Payload Gigante aqui
-                            }).execute()
-                            
-                            if res.data:
-                                new_id = res.data[0]['id']
-                                # Cria Login
-                                supabase.table('acesso_painel').insert({
-                                    "cliente_id": new_id,
-                                    "email": email_login,
-                                    "senha": senha_login,
-                                    "nome_usuario": f"Admin {empresa_nome}",
-                                    "perfil": "user"
-                                }).execute()
-                                
-                                st.toast(f"Cliente {empresa_nome} cadastrado com sucesso!", icon="🚀")
-                                time.sleep(2)
-                                st.session_state['modo_view'] = 'dashboard'
-                                st.rerun()
-                            else:
-                                st.error("Erro ao obter ID do novo cliente.")
-                                
-                    except Exception as e:
-                        st.error(f"Erro técnico no upload: {e}")
-
-# --- TELA 2: DASHBOARD ---
-else:
-    if c_data is None:
-        st.info("Nenhum cliente selecionado ou base de dados vazia.")
-        st.stop()
-
-    c_id = int(c_data['cliente_id'])
-    active = not bool(c_data.get('bot_pausado', False))
-
-    c1, c2 = st.columns([3, 1])
-    with c1:
-        st.title(c_data['nome_empresa'])
-        st.caption(f"ID: {c_id}")
-    with c2:
-        st.markdown("<br>", unsafe_allow_html=True)
-        lbl = "⏸️ PAUSAR SISTEMA" if active else "▶️ ATIVAR SISTEMA"
-        if st.button(lbl, use_container_width=True):
-            supabase.table('clientes').update({'bot_pausado': active}).eq('id', c_id).execute()
-            st.rerun()
-
-    st.divider()
-
-    # --- KPIS ---
-    SALARIO_MINIMO = 1518.00
-    HORAS_MENSAIS = 22 * 8
-    CUSTO_HORA = SALARIO_MINIMO / HORAS_MENSAIS
-
-    tot_msgs = c_data.get('total_mensagens', 0)
-    horas_economizadas = round((tot_msgs * 1.5) / 60, 1)
-    valor_economia = horas_economizadas * CUSTO_HORA
-    receita_direta = float(c_data.get('receita_total', 0) or 0)
-
-    k1, k2, k3, k4 = st.columns(4)
-    k1.metric("Receita Direta", f"R$ {receita_direta:,.2f}")
-    k2.metric("Economia Estimada", f"R$ {valor_economia:,.2f}")
-    k3.metric("Atendimentos", c_data.get('total_atendimentos', 0))
-    k4.metric("Status Atual", "Online 🟢" if active else "Offline 🔴")
-    
-    st.markdown("<br>", unsafe_allow_html=True)
-
-    # --- ABAS ---
-    tabs = st.tabs(["💰 Funil", "💬 Inbox", "📢 Disparos", "📊 Analytics", "📦 Produtos", "📅 Agenda", "🧠 Cérebro"])
-
-    # --------------------------------------------------------------------------
-    # TAB 0: FUNIL DE VENDAS (KANBAN DETALHADO + LINK ZAP)
-    # --------------------------------------------------------------------------
-    with tabs[0]:
-        st.subheader("Funil de Vendas")
-        
-        # 1. PREPARAÇÃO: Mapear Nomes dos Produtos
-        try:
-            res_prod = supabase.table('produtos').select('id, nome').eq('cliente_id', c_id).execute()
-            map_produtos = {p['id']: p['nome'] for p in res_prod.data} if res_prod.data else {}
-        except: map_produtos = {}
-
-        # 2. BUSCA DADOS
-        leads_list = []
-        try:
-            # A. Serviços
-            rv = supabase.table('agendamentos').select('id, cliente_final_waid, status, valor_total_registrado, servico_id, data_hora_inicio').eq('cliente_id', c_id).execute()
-            for i in (rv.data or []):
-                # TRUQUE: Se o nome do produto falhar, mostramos o ID pra você saber o que é
-                p_nome = map_produtos.get(i.get('servico_id'), f"Serviço ID {i.get('servico_id')}")
-                # TRUQUE 2: Garante que o telefone apareça
-                telefone = i.get('cliente_final_waid')
-                if not telefone: telefone = "Sem Número"
-                
-                leads_list.append({
-                    'id': i['id'], 'tipo': 'servico', 
-                    'cliente': telefone, # Agora força mostrar o telefone
-                    'produto': p_nome,
-                    'status': i.get('status', 'Pendente'), 
-                    'valor': float(i.get('valor_total_registrado', 0) or 0),
-                    'data': pd.to_datetime(i.get('data_hora_inicio')).strftime('%d/%m %H:%M')
-                })
-
-            # B. Eventos (Salão)
-            re = supabase.table('agendamentos_salao').select('id, cliente_final_waid, status, valor_total_registrado, produto_salao_id, data_reserva').eq('cliente_id', c_id).execute()
-            for i in (re.data or []):
-                p_nome = map_produtos.get(i.get('produto_salao_id'), f"Salão ID {i.get('produto_salao_id')}")
-                telefone = i.get('cliente_final_waid')
-                if not telefone: telefone = "Sem Número"
-
-                leads_list.append({
-                    'id': i['id'], 'tipo': 'salao', 
-                    'cliente': telefone,
-                    'produto': p_nome,
-                    'status': i.get('status', 'Pendente'), 
-                    'valor': float(i.get('valor_total_registrado', 0) or 0),
-                    'data': i.get('data_reserva')
-                })
-        except Exception as e: st.error(f"Erro funil: {e}")
-
-        # 3. RENDERIZAÇÃO
-        if leads_list:
-            cols = st.columns(3)
-            # Mapeamento exato dos status do seu banco para as colunas
-            status_map = {
-                "🟡 Pendentes (A cobrar)": ["Pendente", "Novo", "Aguardando", None, ""],
-                "🟢 Confirmados (Pagos)": ["Confirmado", "Pago", "Agendado"],
-                "🔴 Cancelados": ["Cancelado", "Desistiu"]
-            }
-            colors = ["#FFD700", "#00C851", "#FF4444"] 
-            
-            for idx, (col_name, status_keys) in enumerate(status_map.items()):
-                with cols[idx]:
-                    st.markdown(f"<div style='border-top: 4px solid {colors[idx]}; background: #F8F9FA; padding: 5px; border-radius: 5px; text-align:center;'><b>{col_name}</b></div>", unsafe_allow_html=True)
-                    st.write("") # Espaçamento
-                    
-                    cards = [l for l in leads_list if l['status'] in status_keys]
-                    
-                    for card in cards:
-                        with st.container(border=True):
-                            # Título do Produto
-                            st.markdown(f"**📦 {card['produto']}**")
-                            
-                            # Telefone com Link para WhatsApp
-                            fone_limpo = str(card['cliente']).replace("+", "").replace(" ", "").replace("-", "")
-                            link_wa = f"https://wa.me/{fone_limpo}"
-                            st.markdown(f"👤 [{card['cliente']}]({link_wa})")
-                            
-                            # Data e Valor
-                            c_info1, c_info2 = st.columns(2)
-                            with c_info1: st.caption(f"📅 {card['data']}")
-                            with c_info2: 
-                                if card['valor'] > 0: st.markdown(f"**R$ {card['valor']:.2f}**")
-                                else: st.caption("R$ --")
-
-                            # Botões Lógicos (Só aparecem se não estiver cancelado)
-                            if "Cancelado" not in col_name:
-                                st.divider()
-                                b1, b2 = st.columns(2)
-                                with b1:
-                                    # Botão Aprovar vira dinheiro
-                                    if "Confirmado" not in col_name:
-                                        if st.button("💰 Pagar", key=f"pay_{card['id']}_{card['tipo']}", use_container_width=True, help="Muda status para Confirmado"):
-                                            table = 'agendamentos' if card['tipo'] == 'servico' else 'agendamentos_salao'
-                                            supabase.table(table).update({'status': 'Confirmado'}).eq('id', card['id']).execute()
-                                            st.toast("Confirmado! $$", icon="🤑")
-                                            time.sleep(1); st.rerun()
-                                    else:
-                                        st.success("Pago ✅")
-                                with b2:
-                                    if st.button("❌", key=f"del_{card['id']}_{card['tipo']}", use_container_width=True, help="Cancelar pedido"):
-                                        table = 'agendamentos' if card['tipo'] == 'servico' else 'agendamentos_salao'
-                                        supabase.table(table).update({'status': 'Cancelado'}).eq('id', card['id']).execute()
-                                        st.toast("Cancelado", icon="🗑️")
-                                        time.sleep(1); st.rerun()
-        else:
-            st.info("Funil vazio. Aguardando novos leads do Otti.")
-
-   # --------------------------------------------------------------------------
-    # TAB 1: INBOX COMPLETO (HÍBRIDO + CHAT REAL + CRM BLINDADO)
-    # --------------------------------------------------------------------------
-    with tabs[1]:
-        # Dados do Usuário e Config
-        usuario_atual = st.session_state['usuario_logado'].get('nome_usuario', 'Admin')
-        
-        # Verifica se o Modo Equipe está ligado
-        modo_equipe = False
-        try:
-            raw_cfg = supabase.table('clientes').select('config_fluxo').eq('id', c_id).execute().data[0]['config_fluxo']
-            if isinstance(raw_cfg, str): raw_cfg = json.loads(raw_cfg)
-            modo_equipe = raw_cfg.get('modo_equipe', False)
-        except: modo_equipe = False
-
-        st.subheader(f"💬 Inbox ({'Modo Equipe' if modo_equipe else 'Modo Simples'}) - {usuario_atual}")
-        
-        # Recupera Credenciais
-        z_instancia, z_token, z_client_token = "", "", ""
-        try:
-            d_z = supabase.table('clientes').select('id_instance, zapi_token, client_token').eq('id', c_id).execute().data[0]
-            z_instancia, z_token, z_client_token = d_z.get('id_instance'), d_z.get('zapi_token'), d_z.get('client_token')
-        except: pass
-
-        st.divider()
-        
-        c_list, c_chat, c_crm = st.columns([1.2, 2, 1.3])
-
-        # ======================================================================
-        # COLUNA 1: LISTA (ADAPTÁVEL)
-        # ======================================================================
-        with c_list:
-            # Busca Clientes e Donos
-            try:
-                res_crm = supabase.table('crm_clientes_finais').select('wa_id, atendente_atual, nome').eq('cliente_id', c_id).execute().data
-                map_atendentes = {c['wa_id']: c.get('atendente_atual') for c in res_crm} if res_crm else {}
-                map_nomes = {c['wa_id']: c.get('nome') for c in res_crm} if res_crm else {}
-            except: map_atendentes = {}; map_nomes = {}
-
-            # Monta lista única (Funil + Histórico)
-            try:
-                l_funil = list(set([l['cliente'] for l in leads_list])) if 'leads_list' in locals() and leads_list else []
-                # Busca conversas REAIS do histórico
-                res_h = supabase.table('historico_mensagens').select('wa_id').eq('cliente_id', c_id).execute()
-                l_hist = list(set([m['wa_id'] for m in res_h.data if m.get('wa_id')])) if res_h.data else []
-                
-                lista_base = sorted(list(set(l_funil + l_hist)))
-            except: lista_base = []
-
-            cliente_ativo = None
-
-            # --- LÓGICA CONDICIONAL DE EXIBIÇÃO ---
-            if not modo_equipe:
-                # MODO SIMPLES: Uma lista única
-                st.markdown("##### 📥 Conversas Recentes")
-                if lista_base:
-                    # Formata nome visualmente
-                    opcoes = [f"{cli}" for cli in lista_base]
-                    cliente_ativo = st.radio("Clientes:", lista_base, label_visibility="collapsed", format_func=lambda x: f"{x} {(' - ' + map_nomes[x]) if x in map_nomes and map_nomes[x] else ''}")
-                else:
-                    st.info("Nenhuma conversa.")
-            
-            else:
-                # MODO EQUIPE: Fila vs Meus
-                fila, meus, outros = [], [], []
-                for cli in lista_base:
-                    dono = map_atendentes.get(cli)
-                    if not dono: fila.append(cli)
-                    elif dono == usuario_atual: meus.append(cli)
-                    else: outros.append(f"{cli} ({dono})")
-
-                st.markdown(f"#### 🙋‍♂️ Meus ({len(meus)})")
-                if meus:
-                    cliente_ativo = st.radio("Meus:", meus, label_visibility="collapsed", key="r_meus")
-                
-                st.markdown("---")
-                st.markdown(f"#### ⏳ Fila ({len(fila)})")
-                if fila:
-                    sel_fila = st.radio("Fila:", fila, label_visibility="collapsed", key="r_fila")
-                    if sel_fila: cliente_ativo = sel_fila # Prioriza fila se clicou lá
-
-        # ======================================================================
-        # COLUNA 2: CHAT (COM BOTÃO ASSUMIR + HISTÓRICO REAL)
-        # ======================================================================
-        with c_chat:
-            with st.container(border=True):
-                if cliente_ativo:
-                    dono_atual = map_atendentes.get(cliente_ativo)
-                    nome_display = map_nomes.get(cliente_ativo, cliente_ativo)
-
-                    # HEADER
-                    h1, h2 = st.columns([2,1])
-                    with h1: st.markdown(f"### 👤 {nome_display}")
-                    with h2:
-                        # Se estiver no modo equipe, mostra botões de assumir
-                        if modo_equipe:
-                            if not dono_atual:
-                                if st.button("🙋‍♂️ ASSUMIR", use_container_width=True, type="primary"):
-                                    upsert = {'cliente_id': c_id, 'wa_id': cliente_ativo, 'atendente_atual': usuario_atual}
-                                    # Verifica se existe (Lógica Upsert Manual)
-                                    check = supabase.table('crm_clientes_finais').select('id').eq('cliente_id', c_id).eq('wa_id', cliente_ativo).execute()
-                                    if check.data:
-                                        supabase.table('crm_clientes_finais').update({'atendente_atual': usuario_atual}).eq('id', check.data[0]['id']).execute()
-                                    else:
-                                        supabase.table('crm_clientes_finais').insert(upsert).execute()
-                                    st.rerun()
-                            elif dono_atual == usuario_atual:
-                                if st.button("📤 SOLTAR", use_container_width=True):
-                                    supabase.table('crm_clientes_finais').update({'atendente_atual': None}).eq('wa_id', cliente_ativo).execute()
-                                    st.rerun()
-                            else:
-                                st.caption(f"🔒 {dono_atual}")
-                        
-                        # Botão de Atualizar Chat (Útil para ver msg nova chegando)
-                        if st.button("🔄", key="ref_chat"): st.rerun()
-
-                    st.divider()
-
-                    # CHAT BOX (LENDO DO HISTORICO_MENSAGENS)
-                    chat_c = st.container(height=400)
-                    with chat_c:
-                        try:
-                            # Busca na tabela certa e ordena por data
-                            msgs = supabase.table('historico_mensagens').select('*').eq('wa_id', cliente_ativo).order('created_at').execute().data
-                            if msgs:
-                                for m in msgs:
-                                    # role: 'user' ou 'assistant'
-                                    with st.chat_message(m.get('role', 'user')): 
-                                        st.write(m.get('content', ''))
-                            else: st.caption("Início da conversa.")
-                        except Exception as e: st.error(f"Erro chat: {e}")
-
-                    # INPUT (Regras de bloqueio)
-                    pode_falar = True
-                    if modo_equipe:
-                        if dono_atual and dono_atual != usuario_atual: pode_falar = False # Bloqueado se for de outro
-                        if not dono_atual: pode_falar = False # Bloqueado se estiver na fila (obriga assumir)
-
-                    if pode_falar:
-                        txt = st.chat_input("Mensagem...")
-                        if txt:
-                            # 1. Envio Z-API
-                            if z_instancia and z_token:
-                                try:
-                                    requests.post(
-                                        f"https://api.z-api.io/instances/{z_instancia}/token/{z_token}/send-text",
-                                        json={"phone": cliente_ativo, "message": txt},
-                                        headers={"Client-Token": z_client_token} if z_client_token else {}
-                                    )
-                                    # 2. Salva Banco (TABELA CORRETA)
-                                    supabase.table('historico_mensagens').insert({
-                                        "cliente_id": c_id, 
-                                        "wa_id": cliente_ativo, 
-                                        "role": "assistant", 
-                                        "content": txt
-                                    }).execute()
-                                    
-                                    # Pausa Bot
-                                    supabase.table('clientes').update({'bot_pausado': True}).eq('id', c_id).execute()
-                                    st.rerun()
-                                except Exception as e: st.error(f"Erro envio: {e}")
-                            else: st.error("Z-API Off")
-                    else:
-                        if not dono_atual: st.info("⚠️ Clique em ASSUMIR para responder.")
-                        else: st.error(f"🚫 Atendimento com {dono_atual}")
-
-                else:
-                    st.info("Selecione um cliente.")
-
-        # ======================================================================
-        # COLUNA 3: CRM (BLINDADO CONTRA ERRO DE TAGS)
-        # ======================================================================
-        with c_crm:
-            if cliente_ativo:
-                st.markdown("### 📋 Ficha")
-                
-                # Carrega dados
-                try:
-                    res_crm = supabase.table('crm_clientes_finais').select('*').eq('cliente_id', c_id).eq('wa_id', cliente_ativo).execute()
-                    if res_crm.data:
-                        perfil = res_crm.data[0]
-                        crm_id = perfil['id']
-                        notas = perfil.get('notas','')
-                        tags = perfil.get('tags') or []
-                    else: 
-                        perfil={}; crm_id=None; notas=""; tags=[]
-                except: notas=""; tags=[]; crm_id=None
-
-                with st.form(f"crm_mini_{cliente_ativo}"):
-                    # CORREÇÃO DO ERRO MULTISELECT:
-                    # Garante que as tags do banco estejam nas opções
-                    base_tags = ["VIP", "Novo", "Problema", "Quente", "Frio"]
-                    opcoes_finais = base_tags.copy()
-                    
-                    for t in tags: 
-                        if t not in opcoes_finais: opcoes_finais.append(t)
-                    
-                    nt = st.multiselect("Tags", opcoes_finais, default=tags)
-                    nn = st.text_area("Notas", value=notas, height=150)
-                    
-                    if st.form_submit_button("💾 Salvar"):
-                        dat = {'cliente_id': c_id, 'wa_id': cliente_ativo, 'tags': nt, 'notas': nn}
-                        
-                        if crm_id: 
-                            supabase.table('crm_clientes_finais').update(dat).eq('id', crm_id).execute()
-                        else: 
-                            supabase.table('crm_clientes_finais').insert(dat).execute()
-                            
-                        st.success("Salvo")
-                        time.sleep(0.5)
-                        st.rerun()
-            else:
-                st.info("Selecione para ver detalhes.")
-
-    # --------------------------------------------------------------------------
-    # TAB 2: DISPAROS EM MASSA (MARKETING)
-    # --------------------------------------------------------------------------
-    with tabs[2]:
-        st.subheader("📢 Campanhas & Disparos")
-        
-        # 1. Recupera credenciais Z-API (Localmente para garantir)
-        try:
-            d_zapi = supabase.table('clientes').select('id_instance, zapi_token, client_token').eq('id', c_id).execute().data[0]
-            z_inst, z_tok, z_cli = d_zapi.get('id_instance'), d_zapi.get('zapi_token'), d_zapi.get('client_token')
-        except: z_inst, z_tok, z_cli = None, None, None
-
-        # 2. Configuração do Disparo
-        c_filtros, c_msg = st.columns([1, 2])
-        
-        with c_filtros:
-            st.markdown("##### 1. Quem vai receber?")
-            # Busca todas as Tags usadas no CRM
-            try:
-                todos_clientes = supabase.table('crm_clientes_finais').select('wa_id, nome, tags').eq('cliente_id', c_id).execute().data
-                # Extrai lista única de tags
-                set_tags = set()
-                for cli in todos_clientes:
-                    if cli.get('tags'):
-                        for t in cli['tags']: set_tags.add(t)
-                
-                lista_tags = list(set_tags)
-            except: 
-                todos_clientes = []
-                lista_tags = []
-
-            sel_tags = st.multiselect("Filtrar por Etiquetas:", lista_tags)
-            
-            # Filtra os alvos
-            alvos = []
-            if sel_tags:
-                for cli in todos_clientes:
-                    tags_cli = cli.get('tags') or []
-                    # Se tiver pelo menos uma das tags selecionadas
-                    if any(t in sel_tags for t in tags_cli):
-                        alvos.append(cli)
-            else:
-                st.info("Selecione etiquetas para filtrar.")
-            
-            st.metric("Público Alvo", f"{len(alvos)} clientes")
-            if len(alvos) > 0:
-                with st.expander("Ver lista"):
-                    for a in alvos: st.caption(f"{a.get('nome') or 'Sem Nome'} ({a['wa_id']})")
-
-        with c_msg:
-            with st.container(border=True):
-                st.markdown("##### 2. A Mensagem")
-                txt_msg = st.text_area("Conteúdo", height=150, placeholder="Olá! Temos promoção hoje...")
-                st.caption("Dica: Evite textos muito longos para não ser bloqueado.")
-                
-                if st.button("🚀 Enviar Campanha", type="primary", use_container_width=True):
-                    if not z_inst or not z_tok:
-                        st.error("Z-API não configurada!")
-                    elif len(alvos) == 0:
-                        st.warning("Nenhum cliente selecionado.")
-                    elif not txt_msg:
-                        st.warning("Escreva uma mensagem.")
-                    else:
-                        # BARRA DE PROGRESSO
-                        progresso = st.progress(0, text="Iniciando disparos...")
-                        sucessos = 0
-                        
-                        for i, alvo in enumerate(alvos):
-                            try:
-                                # Envia Z-API
-                                u = f"https://api.z-api.io/instances/{z_inst}/token/{z_tok}/send-text"
-                                h = {"Client-Token": z_cli} if z_cli else {}
-                                requests.post(u, json={"phone": alvo['wa_id'], "message": txt_msg}, headers=h)
-                                sucessos += 1
-                                # Delay de segurança anti-ban
-                                time.sleep(2) 
-                            except: pass
-                            
-                            # Atualiza barra
-                            pct = int(((i + 1) / len(alvos)) * 100)
-                            progresso.progress(pct, text=f"Enviando... {i+1}/{len(alvos)}")
-                        
-                        st.success(f"Disparo finalizado! {sucessos} mensagens enviadas.")
-                        
-                        # Salva Histórico
-                        supabase.table('crm_campanhas').insert({
-                            'cliente_id': c_id,
-                            'titulo_campanha': f"Disparo {datetime.now().strftime('%d/%m')}",
-                            'mensagem_enviada': txt_msg,
-                            'qtd_alvos': sucessos,
-                            'filtros_usados': str(sel_tags)
-                        }).execute()
-    
-    # --------------------------------------------------------------------------
-    # TAB 3: ANALYTICS (GRÁFICOS RESTAURADOS)
-    # --------------------------------------------------------------------------
-    with tabs[3]:
-        try:
-            r_s = supabase.table('agendamentos_salao').select('created_at, valor_sinal_registrado, status, produto_salao_id').eq('cliente_id', c_id).execute().data
-            r_p = supabase.table('agendamentos').select('created_at, valor_sinal_registrado, status, servico_id').eq('cliente_id', c_id).execute().data
-            r_pr = supabase.table('produtos').select('id, nome').eq('cliente_id', c_id).execute().data
-            map_pr = {p['id']: p['nome'] for p in r_pr} if r_pr else {}
-            
-            lista = []
-            if r_s:
-                for i in r_s: lista.append({'dt': i['created_at'], 'v': i.get('valor_sinal_registrado',0), 'st': i['status'], 'p': map_pr.get(i.get('produto_salao_id'), 'Salão')})
-            if r_p:
-                for i in r_p: lista.append({'dt': i['created_at'], 'v': i.get('valor_sinal_registrado',0), 'st': i['status'], 'p': map_pr.get(i.get('servico_id'), 'Serviço')})
-            
-            if lista:
-                df = pd.DataFrame(lista)
-                df['dt_full'] = pd.to_datetime(df['dt'], format='mixed')
-                df['dt'] = df['dt_full'].dt.date
-                df = df[df['st'] != 'Cancelado']
-                
-                min_date = df['dt'].min()
-                max_date = df['dt'].max()
-                if pd.isnull(min_date): min_date = datetime.now().date()
-                if pd.isnull(max_date): max_date = datetime.now().date()
-                
-                with st.container(border=True):
-                    cf1, cf2 = st.columns(2)
-                    with cf1:
-                        d_select = st.date_input("📅 Período", value=(min_date, max_date), min_value=min_date, max_value=max_date)
-                    with cf2:
-                        prods_un = df['p'].unique()
-                        prod_sel = st.multiselect("📦 Filtrar Produtos", prods_un, default=prods_un)
-
-                df_filt = df.copy()
-                if isinstance(d_select, tuple) and len(d_select) == 2:
-                    start_d, end_d = d_select
-                    df_filt = df_filt[(df_filt['dt'] >= start_d) & (df_filt['dt'] <= end_d)]
-                if prod_sel:
-                    df_filt = df_filt[df_filt['p'].isin(prod_sel)]
-
-                st.markdown("<br>", unsafe_allow_html=True)
-
-                # LINHA 1 DE GRÁFICOS
-                c_g1, c_g2 = st.columns(2)
-                with c_g1:
-                    st.markdown("##### 📈 Receita Diária")
-                    df_g = df_filt.groupby('dt')['v'].sum().reset_index()
-                    if not df_g.empty:
-                        fig = px.line(df_g, x='dt', y='v', text='v')
-                        fig.update_traces(line_shape='spline', line_color=C_ACCENT_NEON, line_width=4, textposition="top center", texttemplate='R$%{text:.0f}', mode='lines+text')
-                        fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font={'color': C_TEXT_DARK}, xaxis=dict(showgrid=False, title=None), yaxis=dict(showgrid=False, showticklabels=False, title=None), margin=dict(l=0, r=0, t=20, b=20))
-                        st.plotly_chart(fig, use_container_width=True)
-                    else: st.info("Sem dados.")
-
-                with c_g2:
-                    st.markdown("##### 📊 Volume")
-                    df_vol = df_filt.groupby('dt').size().reset_index(name='qtd')
-                    if not df_vol.empty:
-                        fig_vol = px.bar(df_vol, x='dt', y='qtd', text='qtd')
-                        fig_vol.update_traces(marker_color=C_SIDEBAR_NAVY, textposition='outside')
-                        fig_vol.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font={'color': C_TEXT_DARK}, xaxis=dict(showgrid=False, title=None), yaxis=dict(showgrid=False, showticklabels=False, title=None), margin=dict(l=0, r=0, t=20, b=20))
-                        st.plotly_chart(fig_vol, use_container_width=True)
-                    else: st.info("Sem dados.")
-
-                st.divider()
-
-                # LINHA 2 DE GRÁFICOS (Adicionada de volta!)
-                st.markdown("#### 🚀 Tendências")
-                c_t1, c_t2 = st.columns(2)
-                with c_t1:
-                    st.markdown("##### Faturamento Semanal")
-                    try:
-                        df_trend = df_filt.copy()
-                        df_trend['semana'] = pd.to_datetime(df_trend['dt']).dt.strftime('%Y-W%U')
-                        df_w = df_trend.groupby('semana')['v'].sum().reset_index()
-                        fig3 = px.bar(df_w, x='semana', y='v')
-                        fig3.update_traces(marker_color=C_SIDEBAR_NAVY)
-                        fig3.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font={'color': C_TEXT_DARK}, xaxis=dict(showgrid=False, title=None), yaxis=dict(showgrid=True, gridcolor='#E2E8F0', title=None), margin=dict(l=0, r=0, t=20, b=20))
-                        st.plotly_chart(fig3, use_container_width=True)
-                    except: st.info("Dados insuficientes.")
-                
-                with c_t2:
-                    st.markdown("##### Evolução de Produtos")
-                    try:
-                        df_area = df_filt.groupby(['dt', 'p'])['v'].sum().reset_index()
-                        fig4 = px.area(df_area, x='dt', y='v', color='p')
-                        fig4.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font={'color': C_TEXT_DARK}, xaxis=dict(showgrid=False, title=None), yaxis=dict(showgrid=True, gridcolor='#E2E8F0', showticklabels=False, title=None), margin=dict(l=0, r=0, t=20, b=20), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-                        st.plotly_chart(fig4, use_container_width=True)
-                    except: st.info("Dados insuficientes.")
-
-            else: st.info("Sem dados para exibir.")
-        except Exception as e: st.error(f"Erro Visual: {e}")
-
-    # --------------------------------------------------------------------------
-    # TAB 4: PRODUTOS
-    # --------------------------------------------------------------------------
-    with tabs[4]:
-        rp = supabase.table('produtos').select('id, nome, categoria, regras_preco').eq('cliente_id', c_id).order('nome').execute()
-        lista_produtos = []
-        if rp.data:
-            for item in rp.data:
-                regras = item.get('regras_preco', {})
-                if isinstance(regras, str):
-                    try: regras = json.loads(regras)
-                    except: regras = {}
-                if not isinstance(regras, dict): regras = {}
-                lista_produtos.append({
-                    'id': item['id'], 'Nome': item['nome'], 'Categoria': item['categoria'],
-                    'Preço (R$)': float(regras.get('preco_padrao', 0)),
-                    'Sinal (R$)': float(regras.get('valor_sinal', 0)), 'raw_regras': regras
-                })
-            df_prod = pd.DataFrame(lista_produtos)
-        else: df_prod = pd.DataFrame()
-
-        col_table, col_actions = st.columns([2, 1])
-        with col_table:
-            if not df_prod.empty:
-                st.dataframe(df_prod[['Nome', 'Categoria', 'Preço (R$)', 'Sinal (R$)']], use_container_width=True, hide_index=True)
-            else: st.info("Nenhum produto cadastrado.")
-
-        with col_actions:
-            tab_new, tab_edit = st.tabs(["➕ Novo", "✏️ Editar"])
-            with tab_new:
-                with st.form("form_add_prod"):
-                    n_new = st.text_input("Nome")
-                    c_new = st.selectbox("Categoria", ["Serviço", "Produto", "Serviço Salão"], key="c_n")
-                    cv1, cv2 = st.columns(2)
-                    with cv1: p_new = st.number_input("Preço", min_value=0.0, step=10.0, key="pn")
-                    with cv2: s_new = st.number_input("Sinal", min_value=0.0, step=10.0, key="sn")
-                    if st.form_submit_button("Salvar", type="primary"):
-                        if n_new:
-                            js = {"preco_padrao": p_new, "valor_sinal": s_new, "duracao_minutos": 60}
-                            supabase.table('produtos').insert({"cliente_id": c_id, "nome": n_new, "categoria": c_new, "ativo": True, "regras_preco": js}).execute()
-                            st.success("Criado!"); time.sleep(1); st.rerun()
-
-            with tab_edit:
-                if not df_prod.empty:
-                    map_ids = {row['Nome']: row['id'] for i, row in df_prod.iterrows()}
-                    sel_name = st.selectbox("Editar:", list(map_ids.keys()))
-                    sel_id = map_ids[sel_name]
-                    item_atual = df_prod[df_prod['id'] == sel_id].iloc[0]
-                    with st.form("form_edit_prod"):
-                        n_ed = st.text_input("Nome", value=item_atual['Nome'])
-                        try: idx_c = ["Serviço", "Produto", "Serviço Salão"].index(item_atual['Categoria'])
-                        except: idx_c = 0
-                        c_ed = st.selectbox("Categoria", ["Serviço", "Produto", "Serviço Salão"], index=idx_c)
-                        ce1, ce2 = st.columns(2)
-                        with ce1: p_ed = st.number_input("Preço", value=float(item_atual['Preço (R$)']), step=10.0)
-                        with ce2: s_ed = st.number_input("Sinal", value=float(item_atual['Sinal (R$)']), step=10.0)
-                        
-                        cb1, cb2 = st.columns(2)
-                        with cb1:
-                            if st.form_submit_button("💾 Salvar"):
-                                js = item_atual['raw_regras']
-                                if not isinstance(js, dict): js = {}
-                                js['preco_padrao'] = p_ed; js['valor_sinal'] = s_ed
-                                supabase.table('produtos').update({"nome": n_ed, "categoria": c_ed, "regras_preco": js}).eq('id', sel_id).execute()
-                                st.success("Ok!"); time.sleep(1); st.rerun()
-                        with cb2:
-                            del_chk = st.checkbox("Excluir?")
-                            if st.form_submit_button("🗑️"):
-                                if del_chk:
-                                    supabase.table('produtos').delete().eq('id', sel_id).execute()
-                                    st.success("Tchau!"); time.sleep(1); st.rerun()
-
-    # --------------------------------------------------------------------------
-    # TAB 5: AGENDA EM TABELA + TAREFAS (COM BAIXA DE SERVIÇO)
-    # --------------------------------------------------------------------------
-    with tabs[5]:
-        st.subheader("📅 Agenda Operacional")
-        
-        col_agenda, col_tarefas = st.columns([2, 1]) # Agenda mais larga
-        
-        # ======================================================================
-        # LADO ESQUERDO: AGENDA (TABELA + BAIXA)
-        # ======================================================================
-        with col_agenda:
-            # 1. BUSCAR DADOS
-            lista_agenda_full = []
-            try:
-                # Busca Agendamentos (Serviços)
-                res_ag = supabase.table('agendamentos').select('*').eq('cliente_id', c_id).neq('status', 'Cancelado').order('data_hora_inicio', desc=False).execute()
-                # Busca Eventos (Salão)
-                res_sl = supabase.table('agendamentos_salao').select('*').eq('cliente_id', c_id).neq('status', 'Cancelado').execute()
-                
-                # Mapeia nomes de produtos (para a tabela ficar bonita)
-                prods_db = supabase.table('produtos').select('id, nome').eq('cliente_id', c_id).execute().data
-                map_p = {p['id']: p['nome'] for p in prods_db} if prods_db else {}
-
-                # Processa Serviços
-                if res_ag.data:
-                    for i in res_ag.data:
-                        dt_obj = pd.to_datetime(i['data_hora_inicio'])
-                        lista_agenda_full.append({
-                            "ID": i['id'],
-                            "Tipo": "servico",
-                            "Data": dt_obj.strftime("%d/%m/%Y"),
-                            "Hora": dt_obj.strftime("%H:%M"),
-                            "Cliente": i.get('cliente_final_waid', 'Sem Nome'),
-                            "Serviço": map_p.get(i.get('servico_id'), 'Serviço'),
-                            "Status": i.get('status', 'Pendente'),
-                            "dt_sort": dt_obj # Coluna auxiliar pra ordenar
-                        })
-                
-                # Processa Salão
-                if res_sl.data:
-                    for i in res_sl.data:
-                        lista_agenda_full.append({
-                            "ID": i['id'],
-                            "Tipo": "salao",
-                            "Data": pd.to_datetime(i['data_reserva']).strftime("%d/%m/%Y"),
-                            "Hora": "Dia todo",
-                            "Cliente": i.get('cliente_final_waid', 'Sem Nome'),
-                            "Serviço": map_p.get(i.get('produto_salao_id'), 'Salão'),
-                            "Status": i.get('status', 'Pendente'),
-                            "dt_sort": pd.to_datetime(i['data_reserva'])
-                        })
-                
-                # Ordena por data
-                lista_agenda_full.sort(key=lambda x: x['dt_sort'])
-
-            except Exception as e: 
-                st.error(f"Erro ao carregar agenda: {e}")
-                lista_agenda_full = []
-
-            # 2. EXIBIR TABELA (VISUALIZAÇÃO)
-            if lista_agenda_full:
-                df_agenda = pd.DataFrame(lista_agenda_full)
-                # Remove colunas técnicas da visualização
-                df_visual = df_agenda[["Data", "Hora", "Cliente", "Serviço", "Status"]]
-                
-                st.markdown("##### 📋 Visão Geral")
-                st.dataframe(
-                    df_visual, 
-                    use_container_width=True, 
-                    hide_index=True,
-                    height=300
-                )
-            else:
-                st.info("Agenda vazia.")
-
-            st.divider()
-
-            # 3. ÁREA DE BAIXA (CHECK-OUT)
-            st.markdown("##### 🏁 Confirmar Realização")
-            st.caption("Dê baixa nos serviços que já aconteceram para contabilizar no histórico.")
-            
-            # Filtra apenas o que está "Confirmado" (ainda não foi "Concluído")
-            pendentes_de_baixa = [x for x in lista_agenda_full if x['Status'] == 'Confirmado']
-            
-            if pendentes_de_baixa:
-                for task in pendentes_de_baixa:
-                    with st.container(border=True):
-                        c_info, c_btns = st.columns([3, 2])
-                        with c_info:
-                            st.markdown(f"**{task['Data']} às {task['Hora']}**")
-                            st.write(f"👤 {task['Cliente']} | 📦 {task['Serviço']}")
-                        
-                        with c_btns:
-                            b1, b2 = st.columns(2)
-                            with b1:
-                                if st.button("✅ Feito", key=f"ok_{task['ID']}_{task['Tipo']}", use_container_width=True):
-                                    table = 'agendamentos' if task['Tipo'] == 'servico' else 'agendamentos_salao'
-                                    supabase.table(table).update({'status': 'Concluído'}).eq('id', task['ID']).execute()
-                                    st.toast("Serviço concluído!", icon="✨")
-                                    time.sleep(1); st.rerun()
-                            with b2:
-                                if st.button("🚫 Cancelado", key=f"no_{task['ID']}_{task['Tipo']}", use_container_width=True, help="Cliente faltou"):
-                                    table = 'agendamentos' if task['Tipo'] == 'servico' else 'agendamentos_salao'
-                                    supabase.table(table).update({'status': 'Faltou'}).eq('id', task['ID']).execute()
-                                    st.toast("Falta registrada.", icon="📉")
-                                    time.sleep(1); st.rerun()
-            else:
-                st.success("Tudo em dia! Nenhum serviço pendente de baixa.")
-
-        # ======================================================================
-        # LADO DIREITO: MINHAS TAREFAS (MANTIDO)
-        # ======================================================================
-        with col_tarefas:
-            st.markdown("##### ✅ Minhas Tarefas")
-            
-            # Form de Nova Tarefa
-            with st.form("form_task"):
-                t_titulo = st.text_input("Nova Tarefa", placeholder="Ex: Ligar para João")
-                t_data = st.date_input("Vencimento", value=datetime.now())
-                if st.form_submit_button("Adicionar", use_container_width=True):
-                    supabase.table('crm_tarefas').insert({
-                        "cliente_id": c_id,
-                        "titulo": t_titulo,
-                        "data_vencimento": str(t_data),
-                        "concluido": False
-                    }).execute()
-                    st.rerun()
-            
-            st.markdown("---")
-            
-            # Lista de Tarefas Pendentes
-            try:
-                res_tasks = supabase.table('crm_tarefas').select('*').eq('cliente_id', c_id).eq('concluido', False).order('data_vencimento').execute()
-                tarefas = res_tasks.data if res_tasks.data else []
-                
-                if tarefas:
-                    for t in tarefas:
-                        with st.container(border=True):
-                            check_col, text_col, del_col = st.columns([0.5, 3, 0.5])
-                            with check_col:
-                                if st.button("⭕", key=f"chk_{t['id']}", help="Concluir"):
-                                    supabase.table('crm_tarefas').update({'concluido': True}).eq('id', t['id']).execute()
-                                    st.rerun()
-                            with text_col:
-                                st.markdown(f"**{t['titulo']}**")
-                                st.caption(f"📅 {t['data_vencimento']}")
-                            with del_col:
-                                if st.button("🗑️", key=f"del_t_{t['id']}"):
-                                    supabase.table('crm_tarefas').delete().eq('id', t['id']).execute()
-                                    st.rerun()
-                else:
-                    st.caption("Tudo feito! 🎉")
-            except Exception as e: st.error("Erro tarefas")
-
-    # --------------------------------------------------------------------------
-    # TAB 6: CONFIGURAÇÕES GERAIS (IA + Z-API + EQUIPE)
-    # --------------------------------------------------------------------------
-    with tabs[6]:
-        st.subheader("⚙️ Configurações & Equipe")
-        
-        # 1. CARREGAMENTO DE DADOS (Blindado)
-        try:
-            d = supabase.table('clientes').select('*').eq('id', c_id).execute().data[0]
-            
-            # Config Fluxo (JSON)
-            curr_c = d.get('config_fluxo')
-            if isinstance(curr_c, str): 
-                try: curr_c = json.loads(curr_c)
-                except: curr_c = {}
-            if not isinstance(curr_c, dict): curr_c = {}
-            
-            # Prompt
-            prompt_atual = d.get('prompt_full') or ""
-            
-            # Credenciais Z-API (Raiz)
-            curr_inst = d.get('id_instance', '')
-            curr_token = d.get('zapi_token', '')
-            curr_client = d.get('client_token', '')
-
-        except Exception as e:
-            st.error(f"Erro ao carregar configs: {e}")
-            d = {}; curr_c = {}
-
-        # DIVISÃO DO LAYOUT
-        c_ia, c_ops = st.columns([1.5, 1]) # IA ganha um pouco mais de espaço pro Prompt
-        
-        # ======================================================================
-        # COLUNA ESQUERDA: CÉREBRO (SUA CONFIGURAÇÃO ATUAL PRESERVADA)
-        # ======================================================================
-        with c_ia:
-            with st.container(border=True):
-                st.markdown("##### 🧠 Inteligência Artificial")
-                
-                # Prompt (Grande)
-                new_p = st.text_area("Personalidade & Regras", value=prompt_atual, height=400)
-                
-                st.divider()
-                
-                # Configs de Voz (Do seu código original)
-                c_v1, c_v2 = st.columns(2)
-                with c_v1:
-                    val_audio = bool(curr_c.get('responde_em_audio', False))
-                    aud = st.toggle("Responde Áudio?", value=val_audio)
-                
-                with c_v2:
-                    val_temp = float(curr_c.get('temperature', 0.5))
-                    temp = st.slider("Criatividade", 0.0, 1.0, val_temp, 0.1)
-
-                # Mapa de Vozes (Restaurado)
-                val_voz = curr_c.get('openai_voice', 'alloy')
-                mapa_vozes = {
-                    "alloy": "Alloy (Neutro)", "echo": "Echo (Suave)",
-                    "fable": "Fable (Narrador)", "onyx": "Onyx (Profundo)",
-                    "nova": "Nova (Energético)", "shimmer": "Shimmer (Calmo)"
-                }
-                if val_voz not in mapa_vozes: val_voz = "alloy"
-                
-                voz_desc = st.selectbox("Timbre de Voz", list(mapa_vozes.values()), index=list(mapa_vozes.keys()).index(val_voz))
-                voz_final = [k for k, v in mapa_vozes.items() if v == voz_desc][0]
-
-        # ======================================================================
-        # COLUNA DIREITA: OPERACIONAL & EQUIPE (NOVIDADES)
-        # ======================================================================
-        with c_ops:
-            # 1. Z-API (Edição das credenciais)
-            with st.expander("🔌 Conexão WhatsApp (Z-API)", expanded=False):
-                n_inst = st.text_input("Instance ID", value=curr_inst)
-                n_tok = st.text_input("Instance Token", value=curr_token, type="password")
-                n_cli = st.text_input("Client Token", value=curr_client, type="password")
-
-            # 2. HORÁRIOS (Do seu código original)
-            with st.container(border=True):
-                st.markdown("##### 🕒 Horário de Atendimento")
-                lista_h = [f"{i:02d}:00" for i in range(24)]
-                try: idx_h_i = lista_h.index(curr_c.get('horario_inicio', '09:00'))
-                except: idx_h_i = 9
-                try: idx_h_f = lista_h.index(curr_c.get('horario_fim', '18:00'))
-                except: idx_h_f = 18
-
-                ch1, ch2 = st.columns(2)
-                with ch1: h_ini = st.selectbox("Abre", lista_h, index=idx_h_i)
-                with ch2: h_fim = st.selectbox("Fecha", lista_h, index=idx_h_f)
-
-            # 3. GESTÃO DE EQUIPE (NOVO!)
-            with st.container(border=True):
-                st.markdown("##### 👥 Equipe")
-                
-                # Switch do Modo Equipe
-                modo_atual = curr_c.get('modo_equipe', False)
-                novo_modo = st.toggle("Modo Multi-atendentes", value=modo_atual, help="Separa chats em Fila e Meus.")
-                
-                # Cadastro Rápido
-                with st.expander("➕ Adicionar Usuário"):
-                    with st.form("add_user_form"):
-                        u_nome = st.text_input("Nome")
-                        u_mail = st.text_input("Email/Login")
-                        u_pass = st.text_input("Senha", type="password")
-                        if st.form_submit_button("Criar"):
-                            try:
-                                supabase.table('acesso_painel').insert({
-                                    'cliente_id': c_id, 'nome_usuario': u_nome, 
-                                    'email': u_mail, 'senha': u_pass, 'perfil': 'atendente'
-                                }).execute()
-                                st.toast(f"{u_nome} adicionado!")
-                                time.sleep(1); st.rerun()
-                            except Exception as e: st.error(f"Erro: {e}")
-
-                # Lista de Usuários
-                try:
-                    usrs = supabase.table('acesso_painel').select('id, nome_usuario, email').eq('cliente_id', c_id).execute().data
-                    if usrs:
-                        for u in usrs:
-                            c_u1, c_u2 = st.columns([4, 1])
-                            c_u1.text(f"👤 {u['nome_usuario']}")
-                            if c_u2.button("🗑️", key=f"del_u_{u['id']}"):
-                                supabase.table('acesso_painel').delete().eq('id', u['id']).execute()
-                                st.rerun()
-                except: pass
-
-            # ==================================================================
-            # BOTÃO MESTRE DE SALVAR (SALVA TUDO DE UMA VEZ)
-            # ==================================================================
-            st.markdown("<br>", unsafe_allow_html=True)
-            if st.button("💾 SALVAR TODAS AS CONFIGURAÇÕES", type="primary", use_container_width=True):
-                # Atualiza objeto JSON
-                curr_c['responde_em_audio'] = aud
-                curr_c['temperature'] = temp
-                curr_c['openai_voice'] = voz_final
-                curr_c['horario_inicio'] = h_ini
-                curr_c['horario_fim'] = h_fim
-                curr_c['modo_equipe'] = novo_modo # Salva a config da equipe
-
-                # Atualiza Banco (JSON + Prompt + Colunas Z-API)
-                supabase.table('clientes').update({
-                    'config_fluxo': curr_c,
-                    'prompt_full': new_p,
-                    'id_instance': n_inst,
-                    'zapi_token': n_tok,
-                    'client_token': n_cli
-                }).eq('id', c_id).execute()
-                
-                st.success("Sistema atualizado com sucesso!")
-                time.sleep(1.5)
-                st.rerun()
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import time
+from datetime import datetime, timedelta, time as dt_time
+import numpy as np
+import services
+import bookings
+import campaigns
+import inbox_feed
+import outbox
+import products
+import zapi
+import tenant_config
+import styles
+import metrics
+
+# ==============================================================================
+# 1. SETUP
+# ==============================================================================
+
+st.set_page_config(
+    page_title="Otti Workspace", 
+    layout="wide", 
+    page_icon="🐙", 
+    initial_sidebar_state="expanded" 
+)
+
+# --- CORES OFICIAIS OCTO (styles.py) ---
+from styles import C_BG_OCTO_LIGHT, C_SIDEBAR_NAVY, C_ACCENT_NEON, C_TEXT_DARK, C_CARD_WHITE, C_BTN_DARK
+
+# ==============================================================================
+# 2. CONEXÃO
+# ==============================================================================
+
+# Cliente único (services.py) + escopo de consultas deste rerun
+supabase = services.supabase
+metrics.inicio_rerun()
+services.begin_run()
+campaigns.get_engine()  # sobe (ou retoma) o worker de disparos deste processo
+
+# ==============================================================================
+# 3. CSS (VISUAL)
+# ==============================================================================
+
+# static/app.css: baixado uma vez pelo navegador; aqui vai só a tag <link>
+styles.apply_styling()
+
+# ==============================================================================
+# 4. LOGIN
+# ==============================================================================
+
+if 'usuario_logado' not in st.session_state: st.session_state['usuario_logado'] = None
+
+def render_login_screen():
+    c1, c2, c3 = st.columns([1, 1, 1])
+    with c2:
+        logo = styles.logo_src()
+        if logo:
+            img_html = f'<img src="{logo}" width="120" style="filter: brightness(0) invert(1); display: block; margin: 0 auto;">'
+        else:
+            img_html = '<h1 style="color:white !important; margin:0; font-family:Sora;">OCTO</h1>'
+
+        st.markdown(f"""
+        <div class="login-container">
+            <div class="login-header">
+                {img_html}
+            </div>
+            <div class="login-body">
+                <h4 style="text-align:center; color:#101828; margin-bottom:20px; font-family:Sora;">Acessar Workspace</h4>
+        """, unsafe_allow_html=True)
+
+        with st.form("login_master"):
+            email = st.text_input("E-mail")
+            senha = st.text_input("Senha", type="password")            
+
+            st.markdown("<br>", unsafe_allow_html=True)          
+            submitted = st.form_submit_button("ENTRAR", type="primary", use_container_width=True)          
+
+            if submitted:
+                if not email or not senha: 
+                    st.warning("Preencha todos os campos.")
+                else:
+                    if not supabase: 
+                        st.error("Erro de configuração interna.")
+                    else:
+                        try:
+                            res = supabase.table('acesso_painel').select('*').eq('email', email).eq('senha', senha).execute()
+                            if res.data:
+                                st.session_state['usuario_logado'] = res.data[0]
+                                st.rerun()
+                            else: 
+                                st.error("Dados incorretos.")
+                        except Exception as e:
+                            st.error(f"Erro técnico: {e}")
+
+        st.markdown('</div></div>', unsafe_allow_html=True)
+
+if not st.session_state['usuario_logado']:
+    render_login_screen()
+    metrics.fim_rerun()
+    st.stop()
+
+# ==============================================================================
+# 5. CARREGAMENTO DE DADOS (CRUCIAL: ANTES DA SIDEBAR)
+# ==============================================================================
+
+user = st.session_state['usuario_logado']
+perfil = user.get('perfil', 'user')
+
+# --- CONFIGURAÇÃO DE NAVEGAÇÃO ---
+if 'modo_view' not in st.session_state: 
+    st.session_state['modo_view'] = 'dashboard'
+
+if perfil != 'admin':
+    st.session_state['modo_view'] = 'dashboard'
+
+# --- CARREGA DADOS DO BANCO ---
+# KPIs só do inquilino em tela (services.get_kpis_cliente); o admin recebe
+# apenas a lista de inquilinos para o seletor
+if not supabase: st.stop()
+
+c_data = None
+
+# ==============================================================================
+# 6. SIDEBAR
+# ==============================================================================
+
+def render_sidebar_logo():
+    styles.render_logo(width=120)
+
+with st.sidebar:
+    st.markdown("<br>", unsafe_allow_html=True)
+    render_sidebar_logo()
+    st.markdown("---")
+    st.write(f"Olá, **{user.get('nome_usuario', 'User')}**")
+    st.markdown("---")
+
+    if st.button("SAIR", type="secondary"): 
+        st.session_state['usuario_logado'] = None
+        st.rerun()
+
+    # --- MENU DE ADMIN ---
+    if perfil == 'admin':
+        st.success("🔒 PAINEL ADMIN")
+        
+        # MODO DASHBOARD: Mostra seletor e botão de novo
+        if st.session_state['modo_view'] == 'dashboard':
+            inquilinos = services.get_kpis_lista()
+            if inquilinos:
+                nomes = {r['cliente_id']: r['nome_empresa'] for r in inquilinos}
+                lista = list(nomes)
+                if 'last_cli' not in st.session_state: st.session_state['last_cli'] = lista[0]
+                if st.session_state['last_cli'] not in nomes: st.session_state['last_cli'] = lista[0]
+                
+                idx = lista.index(st.session_state['last_cli'])
+                sel = st.selectbox("Cliente:", lista, index=idx, key="cli_selector", format_func=lambda x: nomes.get(x) or f"ID {x}")
+                st.session_state['last_cli'] = sel
+                
+                c_data = services.get_kpis_cliente(sel)
+            else:
+                st.warning("Sem dados de KPI.")
+                c_data = None
+            
+            st.markdown("---")
+            if st.button("➕ NOVO CLIENTE", type="primary", use_container_width=True):
+                st.session_state['modo_view'] = 'cadastro'
+                st.rerun()
+        
+        # MODO CADASTRO: Mostra botão de voltar
+        else:
+            st.info("Modo de Cadastro")
+            st.markdown("---")
+            if st.button("⬅️ VOLTAR AO PAINEL", type="secondary", use_container_width=True):
+                st.session_state['modo_view'] = 'dashboard'
+                st.rerun()
+
+    # --- MENU DE USUÁRIO COMUM ---
+    else:
+        c_data = services.get_kpis_cliente(user['cliente_id'])
+        if not c_data: 
+            st.error("Cliente não encontrado.")
+            st.stop()
+
+# ==============================================================================
+# 7. ROTEADOR DE TELAS (MAIN CONTENT)
+# ==============================================================================
+
+# --- TELA 1: CADASTRO DE CLIENTE (COMPLETO) ---
+if perfil == 'admin' and st.session_state['modo_view'] == 'cadastro':
+    st.title("🏢 Cadastro de Novo Cliente")
+    st.markdown("Configure a infraestrutura completa do novo inquilino.")
+    
+    with st.container(border=True):
+        with st.form("form_novo_cliente_full"):
+            
+            # --- 1. DADOS CADASTRAIS ---
+            st.markdown("### 1. 🏢 Dados da Empresa e Acesso")
+            c1, c2 = st.columns(2)
+            with c1:
+                empresa_nome = st.text_input("Nome da Empresa")
+                whats_id = st.text_input("WhatsApp ID (Ex: 551199999999)")
+                plano_sel = st.selectbox("Plano", ["full", "basic", "trial"], index=0)
+            with c2:
+                email_login = st.text_input("E-mail de Login")
+                senha_login = st.text_input("Senha Inicial", type="password")
+                humano_ativo = st.toggle("Atendimento Humano Ativo?", value=True)
+
+            st.divider()
+
+            # --- 2. FINANCEIRO (PIX E ADQUIRENTES) ---
+            st.markdown("### 2. 💰 Financeiro & Pagamentos")
+            cf1, cf2, cf3 = st.columns(3)
+            with cf1:
+                sinal_val = st.number_input("Sinal Mínimo (R$)", value=100.0, step=10.0)
+                checkout_auto = st.toggle("Checkout Automático?", value=False)
+            with cf2:
+                pix_key = st.text_input("Chave PIX")
+                gateway_sel = st.selectbox("Adquirente (Cartão)", ["Nenhum", "Mercado Pago", "InfinitePay", "Getnet"])
+            with cf3:
+                # Campo genérico para token, dependendo do gateway escolhido
+                gateway_token = st.text_input("Token/API Key do Adquirente", type="password", help="Cole a credencial de produção aqui")
+
+            st.divider()
+
+            # --- 3. INTELIGÊNCIA E COMPORTAMENTO ---
+            with st.expander("🧠 Configurações do Cérebro (IA)", expanded=False):
+                ci1, ci2 = st.columns(2)
+                with ci1:
+                    voz_ia = st.selectbox("Voz da OpenAI", ["alloy", "echo", "fable", "onyx", "nova", "shimmer"], index=0)
+                    temp_ia = st.slider("Criatividade (Temperatura)", 0.0, 1.0, 0.8)
+                with ci2:
+                    aceita_audio = st.toggle("Entende Áudio do Cliente?", value=True)
+                    responde_audio = st.toggle("Responde em Áudio?", value=False)
+                
+                st.markdown("**Instruções de Visão (Análise de Foto):**")
+                visao_txt = st.text_area("Prompt para fotos", value="FOTO DE REFERÊNCIA/INSPIRAÇÃO: Analise a decoração da foto (cores, tema, balões) e diga se conseguimos fazer algo parecido baseando-se no nosso catálogo.", height=80)
+                
+                btn_txt = st.text_input("Texto do Botão de Pedido", value="📝 Fazer Pedido")
+
+            # --- 4. FOLLOW-UP AUTOMÁTICO (COBRANÇA) ---
+            with st.expander("⏰ Follow-up Automático (Recuperação)", expanded=False):
+                f_ativo = st.checkbox("Ativar Follow-up Automático?", value=True)
+                cf_h1, cf_h2 = st.columns(2)
+                with cf_h1:
+                    fu_ini = st.time_input("Início dos Disparos", value=dt_time(9,0))
+                with cf_h2:
+                    fu_fim = st.time_input("Fim dos Disparos", value=dt_time(21,0))
+                
+                st.caption("As etapas padrão (30min, 60min, 24h) serão carregadas automaticamente. Edite no JSON se precisar mudar a lógica.")
+
+            st.markdown("<br>", unsafe_allow_html=True)
+            
+            # --- SUBMIT ---
+            if st.form_submit_button("✅ CADASTRAR", type="primary", use_container_width=True):
+                if not empresa_nome or not email_login or not senha_login:
+                    st.warning("Preencha Nome, Login e Senha pelo menos.")
+                else:
+                    try:
+                        with st.spinner("Subindo configuração completa..."):
+                            
+                            # 1. MONTAGEM DO JSON DE FOLLOW-UP (Padrão Rico)
+                            followup_structure = {
+                                "ativo": f_ativo,
+                                "horario_inicio": fu_ini.strftime("%H:%M"),
+                                "horario_fim": fu_fim.strftime("%H:%M"),
+                                "ignorar_horario_silencio": False,
+                                "system_prompt_template": "Você é o assistente de cobrança da {nome_empresa}. O cliente parou de responder.\nSua última msg foi: '{ultima_msg_bot}'.\n\nAgora, siga estritamente esta ordem: '{instrucao}'.\n\nREGRAS:\n- MÁXIMO 15 PALAVRAS.\n- NÃO mande links.\n- Se o cliente já fechou/desistiu, responda: CANCELAR_FLUXO",
+                                "etapas": [
+                                    {"nivel": 1, "minutos_apos_ultimo_input": 30, "instrucao_ia": "Seja gentil. O cliente parou de responder. Pergunte se ficou alguma dúvida."},
+                                    {"nivel": 2, "minutos_apos_ultimo_input": 60, "instrucao_ia": "Gere leve urgência. A data solicitada é muito procurada."},
+                                    {"nivel": 3, "minutos_apos_ultimo_input": 1440, "acao_sistema": "cancelar", "instrucao_ia": "Despedida profissional. Avise que o sistema liberou a data."}
+                                ]
+                            }
+
+                            # 2. MONTAGEM DO JSON CONFIG_FLUXO (O Cérebro Completo)
+                            config_completa = {
+                                "plano": plano_sel,
+                                # Horários Gerais (Padrão Loja)
+                                "horario_inicio": "09:00", 
+                                "horario_fim": "18:00",
+                                
+                                # Financeiro
+                                "sinal_minimo_reais": sinal_val,
+                                "chave_pix": pix_key,
+                                "checkout_automatico": checkout_auto,
+                                "adquirente_ativo": gateway_sel,
+                                "adquirente_token": gateway_token, # Cuidado com segurança em prod
+                                
+                                # IA & Voz
+                                "temperature": temp_ia,
+                                "openai_voice": voz_ia,
+                                "aceita_audio": aceita_audio,
+                                "responde_em_audio": responde_audio,
+                                "atendimento_humano_ativo": humano_ativo,
+                                "instrucoes_visao_especificas": visao_txt,
+                                "btn_texto_pedido_kit": btn_txt,
+                                
+                                # Módulo Follow-up
+                                "followup_automatico": followup_structure
+                            }
+
+                            # 3. INSERT NO BANCO
+                            res = supabase.table('clientes').insert({
+                                "nome_empresa": empresa_nome,
+                                "whatsapp_id": whats_id,
+                                "ativo": True,
+                                "bot_pausado": False,
+                                "config_fluxo": config_completa # Payload Gigante aqui
+                            }).execute()
+                            
+                            if res.data:
+                                new_id = res.data[0]['id']
+                                # Cria Login
+                                supabase.table('acesso_painel').insert({
+                                    "cliente_id": new_id,
+                                    "email": email_login,
+                                    "senha": senha_login,
+                                    "nome_usuario": f"Admin {empresa_nome}",
+                                    "perfil": "user"
+                                }).execute()
+                                services.after_write(new_id, 'config', 'kpis')
+                                services.after_write(None, 'kpis')  # novo nome no seletor do admin
+                                
+                                st.toast(f"Cliente {empresa_nome} cadastrado com sucesso!", icon="🚀")
+                                time.sleep(2)
+                                st.session_state['modo_view'] = 'dashboard'
+                                st.rerun()
+                            else:
+                                st.error("Erro ao obter ID do novo cliente.")
+                                
+                    except Exception as e:
+                        st.error(f"Erro técnico no upload: {e}")
+
+# --- TELA 2: DASHBOARD ---
+else:
+    if c_data is None:
+        st.info("Nenhum cliente selecionado ou base de dados vazia.")
+        st.stop()
+
+    c_id = int(c_data['cliente_id'])
+    active = not bool(c_data.get('bot_pausado', False))
+
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        st.title(c_data['nome_empresa'])
+        cap, ref = st.columns([4, 1])
+        cap.caption(f"ID: {c_id}")
+        if ref.button("🔄", key="kpis_refresh", help="Atualizar indicadores"):
+            services.after_write(c_id, 'kpis')
+            st.rerun()
+    with c2:
+        st.markdown("<br>", unsafe_allow_html=True)
+        lbl = "⏸️ PAUSAR SISTEMA" if active else "▶️ ATIVAR SISTEMA"
+        if st.button(lbl, use_container_width=True):
+            supabase.table('clientes').update({'bot_pausado': active}).eq('id', c_id).execute()
+            services.after_write(c_id, 'config', 'kpis')
+            st.rerun()
+
+    st.divider()
+
+    # --- KPIS ---
+    SALARIO_MINIMO = 1518.00
+    HORAS_MENSAIS = 22 * 8
+    CUSTO_HORA = SALARIO_MINIMO / HORAS_MENSAIS
+
+    tot_msgs = c_data.get('total_mensagens', 0)
+    horas_economizadas = round((tot_msgs * 1.5) / 60, 1)
+    valor_economia = horas_economizadas * CUSTO_HORA
+    receita_direta = float(c_data.get('receita_total', 0) or 0)
+
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Receita Direta", f"R$ {receita_direta:,.2f}")
+    k2.metric("Economia Estimada", f"R$ {valor_economia:,.2f}")
+    k3.metric("Atendimentos", c_data.get('total_atendimentos', 0))
+    k4.metric("Status Atual", "Online 🟢" if active else "Offline 🔴")
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    # --- ABAS (NAVEGAÇÃO PREGUIÇOSA) ---
+    # st.tabs executa o corpo das 7 abas a cada rerun. Aqui a seção ativa fica em
+    # session_state e só ela carrega dados e desenha widgets; as outras custam zero.
+    ABAS = ["💰 Funil", "💬 Inbox", "📢 Disparos", "📊 Analytics", "📦 Produtos", "📅 Agenda", "🧠 Cérebro"]
+    if st.session_state.get('aba_ativa') not in ABAS: st.session_state['aba_ativa'] = ABAS[0]
+    aba_ativa = st.radio("Seção", ABAS, horizontal=True, key="aba_ativa", label_visibility="collapsed")
+    metrics.marca_aba(aba_ativa)
+
+    # --- SELEÇÃO EM LOTE (FUNIL E AGENDA) ---
+    # Checkboxes com chave "<prefixo>|<tipo>|<id>": o estado da rodada anterior já
+    # está em session_state, então a barra de ações pode agir antes dos cards.
+    def itens_selecionados(prefixo):
+        return [tuple(k.split('|')[1:]) for k, v in st.session_state.items() if v and isinstance(k, str) and k.startswith(prefixo + '|')]
+
+    def limpa_selecao(prefixo):
+        for k in [k for k in st.session_state if isinstance(k, str) and k.startswith(prefixo + '|')]: del st.session_state[k]
+
+    def aplica_status(prefixo, itens, status, msg, icon):
+        n = services.update_status_em_lote(c_id, [(tipo, int(item_id)) for tipo, item_id in itens], status)
+        limpa_selecao(prefixo)
+        st.toast(f"{msg} ({n})", icon=icon)
+        st.rerun()
+
+    # --------------------------------------------------------------------------
+    # TAB 0: FUNIL DE VENDAS (KANBAN DETALHADO + LINK ZAP)
+    # --------------------------------------------------------------------------
+    if aba_ativa == ABAS[0]:
+        st.subheader("Funil de Vendas")
+        
+        # 1. PREPARAÇÃO: Mapear Nomes dos Produtos
+        map_produtos = services.get_mapa_produtos(c_id)
+
+        # 2. TOTAIS POR COLUNA (agregados no banco, sem baixar o histórico)
+        resumo_funil = services.get_funil_resumo(c_id)
+
+        # 3. AÇÕES EM LOTE (um UPDATE por tabela, sem sleep)
+        modo_lote = st.toggle("☑️ Seleção em lote", key="funil_lote")
+        if modo_lote:
+            sel_funil = itens_selecionados('lote_funil')
+            with st.container(border=True):
+                bl1, bl2, bl3 = st.columns(3)
+                with bl1:
+                    if st.button(f"💰 Pagar selecionados ({len(sel_funil)})", disabled=not sel_funil, use_container_width=True):
+                        aplica_status('lote_funil', sel_funil, 'Confirmado', "Confirmados! $$", "🤑")
+                with bl2:
+                    if st.button(f"❌ Cancelar selecionados ({len(sel_funil)})", disabled=not sel_funil, use_container_width=True):
+                        aplica_status('lote_funil', sel_funil, 'Cancelado', "Cancelados", "🗑️")
+                with bl3:
+                    if st.button("Limpar seleção", disabled=not sel_funil, use_container_width=True):
+                        limpa_selecao('lote_funil'); st.rerun()
+
+                fl1, fl2, fl3 = st.columns(3)
+                with fl1: dias_lote = st.number_input("Pendentes há mais de (dias)", min_value=0, value=7, step=1)
+                corte = (datetime.now() - timedelta(days=int(dias_lote))).isoformat()
+                with fl2:
+                    if st.button("💰 Pagar todos esses", use_container_width=True):
+                        n = services.update_status_por_filtro(c_id, services.FUNIL_COLUNAS['pendente'], 'Confirmado', corte)
+                        st.toast(f"Confirmados! ({n})", icon="🤑"); st.rerun()
+                with fl3:
+                    if st.button("❌ Cancelar todos esses", use_container_width=True):
+                        n = services.update_status_por_filtro(c_id, services.FUNIL_COLUNAS['pendente'], 'Cancelado', corte)
+                        st.toast(f"Cancelados ({n})", icon="🗑️"); st.rerun()
+
+        # 4. RENDERIZAÇÃO (cada coluna pagina por data: custo limitado ao que está na tela)
+        if any(r['qtd'] for r in resumo_funil.values()):
+            cols = st.columns(3)
+            titulos = {
+                'pendente': "🟡 Pendentes (A cobrar)",
+                'confirmado': "🟢 Confirmados (Pagos)",
+                'cancelado': "🔴 Cancelados"
+            }
+            colors = ["#FFD700", "#00C851", "#FF4444"] 
+            
+            for idx, (coluna, col_name) in enumerate(titulos.items()):
+                with cols[idx]:
+                    tot = resumo_funil[coluna]
+                    st.markdown(f"<div style='border-top: 4px solid {colors[idx]}; background: #F8F9FA; padding: 5px; border-radius: 5px; text-align:center;'><b>{col_name}</b><br><small>{tot['qtd']} leads · R$ {tot['valor']:,.2f}</small></div>", unsafe_allow_html=True)
+                    st.write("") # Espaçamento
+                    
+                    lim_key = f"funil_lim_{coluna}"
+                    lim_col = st.session_state.get(lim_key, services.FUNIL_PAGINA)
+                    leads = bookings.from_unified(services.get_funil_pagina(c_id, coluna, limit=lim_col), map_produtos)
+                    cards = leads.assign(data=bookings.fmt_data(leads))[['id', 'tipo', 'cliente', 'produto', 'status', 'valor', 'data']].to_dict('records')
+                    
+                    for card in cards:
+                        with st.container(border=True):
+                            # Título do Produto
+                            if modo_lote and coluna != 'cancelado':
+                                st.checkbox(f"**📦 {card['produto']}**", key=f"lote_funil|{card['tipo']}|{card['id']}")
+                            else:
+                                st.markdown(f"**📦 {card['produto']}**")
+                            
+                            # Telefone com Link para WhatsApp
+                            fone_limpo = str(card['cliente']).replace("+", "").replace(" ", "").replace("-", "")
+                            link_wa = f"https://wa.me/{fone_limpo}"
+                            st.markdown(f"👤 [{card['cliente']}]({link_wa})")
+                            
+                            # Data e Valor
+                            c_info1, c_info2 = st.columns(2)
+                            with c_info1: st.caption(f"📅 {card['data']}")
+                            with c_info2: 
+                                if card['valor'] > 0: st.markdown(f"**R$ {card['valor']:.2f}**")
+                                else: st.caption("R$ --")
+
+                            # Botões Lógicos (Só aparecem se não estiver cancelado nem em modo lote)
+                            if coluna != 'cancelado' and not modo_lote:
+                                st.divider()
+                                b1, b2 = st.columns(2)
+                                with b1:
+                                    # Botão Aprovar vira dinheiro
+                                    if coluna != 'confirmado':
+                                        if st.button("💰 Pagar", key=f"pay_{card['id']}_{card['tipo']}", use_container_width=True, help="Muda status para Confirmado"):
+                                            services.update_status_em_lote(c_id, [(card['tipo'], card['id'])], 'Confirmado')
+                                            st.toast("Confirmado! $$", icon="🤑")
+                                            st.rerun()
+                                    else:
+                                        st.success("Pago ✅")
+                                with b2:
+                                    if st.button("❌", key=f"del_{card['id']}_{card['tipo']}", use_container_width=True, help="Cancelar pedido"):
+                                        services.update_status_em_lote(c_id, [(card['tipo'], card['id'])], 'Cancelado')
+                                        st.toast("Cancelado", icon="🗑️")
+                                        st.rerun()
+
+                    if tot['qtd'] > len(cards):
+                        if st.button(f"⬇️ Mais ({tot['qtd'] - len(cards)})", key=f"mais_{coluna}", use_container_width=True):
+                            st.session_state[lim_key] = lim_col + services.FUNIL_PAGINA
+                            st.rerun()
+        else:
+            st.info("Funil vazio. Aguardando novos leads do Otti.")
+
+   # --------------------------------------------------------------------------
+    # TAB 1: INBOX COMPLETO (HÍBRIDO + CHAT REAL + CRM BLINDADO)
+    # --------------------------------------------------------------------------
+    if aba_ativa == ABAS[1]:
+        # Dados do Usuário e Config
+        usuario_atual = st.session_state['usuario_logado'].get('nome_usuario', 'Admin')
+        
+        # Verifica se o Modo Equipe está ligado
+        cfg = services.get_config(c_id)
+        modo_equipe = cfg.modo_equipe
+
+        st.subheader(f"💬 Inbox ({'Modo Equipe' if modo_equipe else 'Modo Simples'}) - {usuario_atual}")
+        
+        # Recupera Credenciais
+        z_instancia, z_token = cfg.zapi.id_instance, cfg.zapi.zapi_token
+
+        # --- MODO AO VIVO ---
+        # Lista, chat e ficha vivem num fragmento. Com "Ao vivo" ligado ele reroda
+        # sozinho a cada ciclo, mas só vai ao banco quando o feed acusa mensagem
+        # nova desde a última marca; o resto vem do cache da sessão.
+        feed = inbox_feed.get_feed()
+        ao_vivo = st.toggle("🔴 Ao vivo", key="inbox_ao_vivo", help="Atualiza lista e chat sozinho, sem recarregar o painel")
+
+        st.divider()
+
+        # Respostas do atendente saem pela caixa de saída (outbox.py); com alguma ainda
+        # "enviando" o fragmento também se atualiza sozinho até ela ser confirmada
+        caixa = outbox.get_outbox()
+        try: aguardando = any(p['status'] != 'falhou' for p in caixa.pendentes(c_id))
+        except: aguardando = False
+
+        # A lista é ordenada por recência: cada mensagem nova reordena as opções.
+        # A conversa aberta fica guardada pelo wa_id e volta via index= (o atendente
+        # não é jogado para outro contato a cada ciclo do modo ao vivo)
+        def radio_conversa(label, opcoes, key, **kwargs):
+            sel_key = f"{key}_wa_id_{c_id}"
+            atual = st.session_state.get(sel_key)
+            escolha = st.radio(label, opcoes, index=opcoes.index(atual) if atual in opcoes else 0,
+                               key=f"{key}_{c_id}", label_visibility="collapsed", **kwargs)
+            st.session_state[sel_key] = escolha
+            return escolha
+
+        @st.fragment(run_every=inbox_feed.INTERVALO if ao_vivo or aguardando else None)
+        def render_inbox():
+            # Ciclo do fragmento (não um rerun completo): só recarrega o que o feed apontar
+            ciclo = st.session_state.get('_inbox_run') == services.run_id()
+            st.session_state['_inbox_run'] = services.run_id()
+            marca_key = f"inbox_marca_{c_id}"
+            sujos = st.session_state.setdefault(f"inbox_sujos_{c_id}", set())  # conversas com msg nova ainda não lida do banco
+            if ciclo and st.session_state.get(marca_key):
+                try: novas = feed.novidades(c_id, st.session_state[marca_key])
+                except: novas = []
+                if novas:
+                    services.invalidate('conversas_resumo')
+                    sujos.update(n['wa_id'] for n in novas)
+                    st.session_state[marca_key] = max(n['ultima_mensagem_em'] for n in novas)
+
+            c_list, c_chat, c_crm = st.columns([1.2, 2, 1.3])
+
+            # ======================================================================
+            # COLUNA 1: LISTA (ADAPTÁVEL)
+            # ======================================================================
+            with c_list:
+                # Lista vem do índice de conversas (funil + histórico), por recência e paginada
+                POR_PAGINA_INBOX = 30
+                lim_inbox = st.session_state.get('inbox_limite', POR_PAGINA_INBOX)
+                conversas = services.get_conversas(c_id, limit=lim_inbox + 1)
+                tem_mais_inbox = len(conversas) > lim_inbox
+                conversas = conversas[:lim_inbox]
+                lista_base = [cv['wa_id'] for cv in conversas]
+                map_trechos = {cv['wa_id']: cv.get('ultimo_trecho') for cv in conversas}
+
+                # Nomes e donos só dos contatos desta página (uma consulta com in_)
+                fichas_pagina = services.get_crm_contatos(c_id, lista_base)
+                map_atendentes = {w: c.get('atendente_atual') for w, c in fichas_pagina.items()}
+                map_nomes = {w: c.get('nome') for w, c in fichas_pagina.items()}
+                if not st.session_state.get(marca_key):
+                    st.session_state[marca_key] = max([cv['ultima_mensagem_em'] for cv in conversas], default=inbox_feed.agora())
+
+                cliente_ativo = None
+
+                # --- LÓGICA CONDICIONAL DE EXIBIÇÃO ---
+                if not modo_equipe:
+                    # MODO SIMPLES: Uma lista única
+                    st.markdown("##### 📥 Conversas Recentes")
+                    if lista_base:
+                        # Formata nome visualmente
+                        opcoes = [f"{cli}" for cli in lista_base]
+                        cliente_ativo = radio_conversa("Clientes:", lista_base, "r_inbox", format_func=lambda x: f"{x} {(' - ' + map_nomes[x]) if x in map_nomes and map_nomes[x] else ''}", captions=[(map_trechos.get(x) or '')[:40] for x in lista_base])
+                    else:
+                        st.info("Nenhuma conversa.")
+            
+                else:
+                    # MODO EQUIPE: Fila vs Meus
+                    fila, meus, outros = [], [], []
+                    for cli in lista_base:
+                        dono = map_atendentes.get(cli)
+                        if not dono: fila.append(cli)
+                        elif dono == usuario_atual: meus.append(cli)
+                        else: outros.append(f"{cli} ({dono})")
+
+                    st.markdown(f"#### 🙋‍♂️ Meus ({len(meus)})")
+                    if meus:
+                        cliente_ativo = radio_conversa("Meus:", meus, "r_meus")
+                
+                    st.markdown("---")
+                    st.markdown(f"#### ⏳ Fila ({len(fila)})")
+                    if fila:
+                        sel_fila = radio_conversa("Fila:", fila, "r_fila")
+                        if sel_fila: cliente_ativo = sel_fila # Prioriza fila se clicou lá
+
+                if tem_mais_inbox and st.button("⬇️ Carregar mais", key="inbox_mais", use_container_width=True):
+                    st.session_state['inbox_limite'] = lim_inbox + POR_PAGINA_INBOX
+                    st.rerun()
+
+            # ======================================================================
+            # COLUNA 2: CHAT (COM BOTÃO ASSUMIR + HISTÓRICO REAL)
+            # ======================================================================
+            with c_chat:
+                with st.container(border=True):
+                    if cliente_ativo:
+                        dono_atual = map_atendentes.get(cliente_ativo)
+                        nome_display = map_nomes.get(cliente_ativo, cliente_ativo)
+
+                        # HEADER
+                        h1, h2 = st.columns([2,1])
+                        with h1: st.markdown(f"### 👤 {nome_display}")
+                        with h2:
+                            # Se estiver no modo equipe, mostra botões de assumir
+                            if modo_equipe:
+                                if not dono_atual:
+                                    if st.button("🙋‍♂️ ASSUMIR", use_container_width=True, type="primary"):
+                                        upsert = {'cliente_id': c_id, 'wa_id': cliente_ativo, 'atendente_atual': usuario_atual}
+                                        # Verifica se existe (Lógica Upsert Manual)
+                                        check = services.get_ficha_crm(c_id, cliente_ativo)
+                                        if check:
+                                            supabase.table('crm_clientes_finais').update({'atendente_atual': usuario_atual}).eq('id', check['id']).execute()
+                                        else:
+                                            supabase.table('crm_clientes_finais').insert(upsert).execute()
+                                        services.after_write(c_id, 'crm')
+                                        st.rerun()
+                                elif dono_atual == usuario_atual:
+                                    if st.button("📤 SOLTAR", use_container_width=True):
+                                        supabase.table('crm_clientes_finais').update({'atendente_atual': None}).eq('cliente_id', c_id).eq('wa_id', cliente_ativo).execute()
+                                        services.after_write(c_id, 'crm')
+                                        st.rerun()
+                                else:
+                                    st.caption(f"🔒 {dono_atual}")
+                        
+                            # Botão de Atualizar Chat (Útil para ver msg nova chegando)
+                            if st.button("🔄", key="ref_chat"): st.rerun(scope="fragment")
+
+                        st.divider()
+
+                        # CHAT BOX (LENDO DO HISTORICO_MENSAGENS)
+                        chat_c = st.container(height=400)
+                        with chat_c:
+                            # Saiu da caixa de saída desde o último ciclo: já está no histórico, relê a conversa
+                            pend = caixa.pendentes(c_id, cliente_ativo)
+                            vistos_key = f"outbox_vistos_{c_id}_{cliente_ativo}"
+                            if st.session_state.get(vistos_key, set()) - {p['id'] for p in pend}: sujos.add(cliente_ativo)
+                            st.session_state[vistos_key] = {p['id'] for p in pend}
+                            try:
+                                # Cache da conversa + só o que chegou desde a última mensagem
+                                chat = services.load_chat(c_id, cliente_ativo, refresh=not ciclo or cliente_ativo in sujos)
+                                sujos.discard(cliente_ativo)
+                                if chat['tem_anteriores'] and st.button("⬆️ Mensagens anteriores", key=f"older_{cliente_ativo}", use_container_width=True):
+                                    chat = services.load_chat_older(c_id, cliente_ativo)
+                                msgs = chat['msgs']
+                                if msgs:
+                                    for m in msgs:
+                                        # role: 'user' ou 'assistant'
+                                        with st.chat_message(m.get('role', 'user')): 
+                                            st.write(m.get('content', ''))
+                                elif not pend: st.caption("Início da conversa.")
+                            except Exception as e: st.error(f"Erro chat: {e}")
+
+                            for p in pend:
+                                with st.chat_message('assistant'):
+                                    st.write(p['texto'])
+                                    if p['status'] == 'falhou':
+                                        st.caption(f"⚠️ Não enviada: {p['erro'] or 'erro desconhecido'}")
+                                        b1, b2 = st.columns(2)
+                                        if b1.button("Reenviar", key=f"ob_re_{p['id']}", use_container_width=True):
+                                            caixa.reenviar(p['id'])
+                                            st.rerun()
+                                        if b2.button("Descartar", key=f"ob_del_{p['id']}", use_container_width=True):
+                                            caixa.descartar(p['id'])
+                                            st.rerun(scope="fragment")
+                                    elif p['status'] == 'enviado': st.caption("✓ Enviada")
+                                    else: st.caption("⏳ Enviando..." + (f" (tentativa {p['tentativas'] + 1})" if p['tentativas'] else ""))
+
+                        # INPUT (Regras de bloqueio)
+                        pode_falar = True
+                        if modo_equipe:
+                            if dono_atual and dono_atual != usuario_atual: pode_falar = False # Bloqueado se for de outro
+                            if not dono_atual: pode_falar = False # Bloqueado se estiver na fila (obriga assumir)
+
+                        if pode_falar:
+                            txt = st.chat_input("Mensagem...")
+                            if txt:
+                                # Vai para a caixa de saída e aparece como "enviando": Z-API, histórico
+                                # e pausa do bot ficam com a thread de entrega (outbox.py)
+                                if z_instancia and z_token:
+                                    try:
+                                        caixa.enqueue(c_id, cliente_ativo, txt, autor=usuario_atual)
+                                        st.rerun()
+                                    except Exception as e: st.error(f"Erro envio: {e}")
+                                else: st.error("Z-API Off")
+                        else:
+                            if not dono_atual: st.info("⚠️ Clique em ASSUMIR para responder.")
+                            else: st.error(f"🚫 Atendimento com {dono_atual}")
+
+                    else:
+                        st.info("Selecione um cliente.")
+
+            # ======================================================================
+            # COLUNA 3: CRM (BLINDADO CONTRA ERRO DE TAGS)
+            # ======================================================================
+            with c_crm:
+                if cliente_ativo:
+                    st.markdown("### 📋 Ficha")
+                
+                    # Carrega dados
+                    ficha = services.get_ficha_crm(c_id, cliente_ativo)
+                    if ficha:
+                        crm_id = ficha['id']
+                        notas = ficha.get('notas') or ''
+                        tags = ficha.get('tags') or []
+                    else:
+                        crm_id=None; notas=""; tags=[]
+
+                    with st.form(f"crm_mini_{cliente_ativo}"):
+                        # CORREÇÃO DO ERRO MULTISELECT:
+                        # Garante que as tags do banco estejam nas opções
+                        base_tags = ["VIP", "Novo", "Problema", "Quente", "Frio"]
+                        opcoes_finais = base_tags.copy()
+                    
+                        for t in tags: 
+                            if t not in opcoes_finais: opcoes_finais.append(t)
+                    
+                        nt = st.multiselect("Tags", opcoes_finais, default=tags)
+                        nn = st.text_area("Notas", value=notas, height=150)
+                    
+                        if st.form_submit_button("💾 Salvar"):
+                            dat = {'cliente_id': c_id, 'wa_id': cliente_ativo, 'tags': nt, 'notas': nn}
+                        
+                            if crm_id: 
+                                supabase.table('crm_clientes_finais').update(dat).eq('id', crm_id).execute()
+                            else: 
+                                supabase.table('crm_clientes_finais').insert(dat).execute()
+                            services.after_write(c_id, 'crm')
+                            
+                            st.success("Salvo")
+                            time.sleep(0.5)
+                            st.rerun()
+                else:
+                    st.info("Selecione para ver detalhes.")
+
+        render_inbox()
+
+    # --------------------------------------------------------------------------
+    # TAB 2: DISPAROS EM MASSA (MARKETING)
+    # --------------------------------------------------------------------------
+    if aba_ativa == ABAS[2]:
+        st.subheader("📢 Campanhas & Disparos")
+        
+        # 1. Recupera credenciais Z-API (Localmente para garantir)
+        zapi_ok = services.get_config(c_id).zapi.ok
+
+        # 2. Configuração do Disparo
+        c_filtros, c_msg = st.columns([1, 2])
+        
+        with c_filtros:
+            st.markdown("##### 1. Quem vai receber?")
+            # Etiquetas e público vêm agregados do banco (sql/006): o CRM não é baixado
+            tags_qtd = services.get_tags_contagem(c_id)
+            sel_tags = st.multiselect("Filtrar por Etiquetas:", list(tags_qtd), format_func=lambda t: f"{t} ({tags_qtd.get(t, 0)})")
+
+            total_alvos = 0
+            if sel_tags:
+                # Quem tiver pelo menos uma das etiquetas selecionadas
+                total_alvos, _ = services.get_publico(c_id, sel_tags)
+            else:
+                st.info("Selecione etiquetas para filtrar.")
+            
+            st.metric("Público Alvo", f"{total_alvos} clientes")
+            # LISTA DE DESTINATÁRIOS: uma tabela paginada no banco; buscar/ordenar/paginar só reroda este bloco
+            @st.fragment
+            def render_publico(tags):
+                cb1, cb2, cb3 = st.columns([2, 1, 1])
+                with cb1: busca = st.text_input("Buscar", key="pub_busca", placeholder="Nome ou telefone")
+                with cb2: ordem = st.selectbox("Ordenar por", list(services.PUBLICO_ORDENS), format_func=services.PUBLICO_ORDENS.get, key="pub_ordem")
+                with cb3: desc = st.toggle("Decrescente", key="pub_desc")
+
+                # Mudou o filtro: volta para a primeira página
+                assinatura = (tuple(sorted(tags)), busca, ordem, desc)
+                if st.session_state.get('pub_assinatura') != assinatura:
+                    st.session_state['pub_assinatura'] = assinatura
+                    st.session_state['pub_pagina'] = 1
+
+                por_pagina = services.PUBLICO_PAGINA
+                pag = st.session_state.get('pub_pagina', 1)
+                total, linhas = services.get_publico(c_id, tags, offset=(pag - 1) * por_pagina, busca=busca, ordem=ordem, desc=desc)
+                paginas = max(1, -(-total // por_pagina))
+                if pag > paginas:
+                    pag = paginas
+                    total, linhas = services.get_publico(c_id, tags, offset=(pag - 1) * por_pagina, busca=busca, ordem=ordem, desc=desc)
+                st.session_state['pub_pagina'] = pag
+
+                df_pub = pd.DataFrame([{'Nome': a.get('nome') or 'Sem Nome', 'Telefone': a['wa_id'], 'Etiquetas': a.get('tags') or []} for a in linhas],
+                                      columns=['Nome', 'Telefone', 'Etiquetas'])
+                st.dataframe(df_pub, hide_index=True, use_container_width=True, height=300,
+                             column_config={'Etiquetas': st.column_config.ListColumn("Etiquetas")})
+
+                cp1, cp2 = st.columns([1, 2])
+                with cp1: st.number_input("Página", min_value=1, max_value=paginas, step=1, key="pub_pagina")
+                with cp2: st.caption(f"{total} contatos · página {pag} de {paginas}")
+
+            if total_alvos > 0:
+                with st.expander("Ver lista"):
+                    render_publico(sel_tags)
+
+        with c_msg:
+            with st.container(border=True):
+                st.markdown("##### 2. A Mensagem")
+                txt_msg = st.text_area("Conteúdo", height=150, placeholder="Olá! Temos promoção hoje...")
+                st.caption("Dica: Evite textos muito longos para não ser bloqueado.")
+                
+                cr1, cr2 = st.columns(2)
+                with cr1: taxa_min = st.number_input("Mensagens por minuto", min_value=1, max_value=campaigns.TAXA_MAXIMA, value=campaigns.TAXA_PADRAO, help="Limite anti-ban por instância")
+                with cr2: conc_env = st.number_input("Envios simultâneos", min_value=1, max_value=campaigns.CONCORRENCIA_MAXIMA, value=campaigns.CONCORRENCIA_PADRAO)
+                if total_alvos > 0:
+                    st.caption(f"⏱️ Duração estimada: {campaigns.formata_duracao(campaigns.duracao_estimada(total_alvos, taxa_min))} para {total_alvos} contatos a {taxa_min} msg/min")
+
+                if st.button("🚀 Enviar Campanha", type="primary", use_container_width=True):
+                    if not zapi_ok:
+                        st.error("Z-API não configurada!")
+                    elif total_alvos == 0:
+                        st.warning("Nenhum cliente selecionado.")
+                    elif not txt_msg:
+                        st.warning("Escreva uma mensagem.")
+                    else:
+                        # Só enfileira: o envio roda no worker (campaigns.py), fora desta sessão
+                        try:
+                            _, qtd = campaigns.enqueue_por_tags(
+                                c_id, f"Disparo {datetime.now().strftime('%d/%m')}", txt_msg,
+                                sel_tags, taxa=taxa_min, concorrencia=conc_env
+                            )
+                            if qtd: st.toast(f"Campanha na fila ({qtd} contatos)! Pode continuar usando o painel.", icon="🚀")
+                            else: st.warning("Nenhum contato com essas etiquetas.")
+                        except Exception as e: st.error(f"Erro ao enfileirar: {e}")
+
+            # PROGRESSO (POLLING LEVE: SÓ ESTE BLOCO RERODA)
+            @st.fragment(run_every=3)
+            def render_progresso_campanhas():
+                try: ativas = campaigns.get_active(c_id)
+                except: ativas = []
+                for camp in ativas:
+                    with st.container(border=True):
+                        feitos = (camp.get('qtd_enviados') or 0) + (camp.get('qtd_erros') or 0)
+                        total = camp.get('qtd_alvos') or 0
+                        pct = int(feitos / total * 100) if total else 0
+                        st.progress(pct, text=f"{camp['titulo_campanha']} · {camp['status']} · {feitos}/{total} ({camp.get('qtd_erros') or 0} erros)")
+                        if st.button("⏹️ Cancelar", key=f"cancel_camp_{camp['id']}"):
+                            campaigns.cancel(camp['id'])
+                            st.rerun(scope="fragment")
+
+            # Sem campanha ativa não há polling algum
+            try: tem_ativa = bool(campaigns.get_active(c_id))
+            except: tem_ativa = False
+            if tem_ativa: render_progresso_campanhas()
+    
+    # --------------------------------------------------------------------------
+    # TAB 3: ANALYTICS (GRÁFICOS RESTAURADOS)
+    # --------------------------------------------------------------------------
+    if aba_ativa == ABAS[3]:
+        try:
+            # FILTROS PRIMEIRO: viram gte/lte/in_ na consulta (janela padrão: últimos 90 dias)
+            hoje = datetime.now().date()
+            map_pr = services.get_mapa_produtos(c_id)
+            rotulos_pr = {}
+            for pid, nome in map_pr.items(): rotulos_pr.setdefault(nome, set()).add(pid)
+            rotulos_pr.setdefault('Serviço', set()).add(0); rotulos_pr.setdefault('Salão', set()).add(0)  # sem produto vinculado
+
+            with st.container(border=True):
+                cf1, cf2 = st.columns(2)
+                with cf1:
+                    d_select = st.date_input("📅 Período", value=(hoje - timedelta(days=services.ANALYTICS_JANELA_DIAS), hoje), max_value=hoje)
+                with cf2:
+                    prod_sel = st.multiselect("📦 Filtrar Produtos", list(rotulos_pr), placeholder="Todos os produtos")
+
+            if isinstance(d_select, tuple) and len(d_select) == 2: start_d, end_d = d_select
+            elif isinstance(d_select, tuple) and d_select: start_d = end_d = d_select[0]  # range ainda sendo escolhido
+            else: start_d = end_d = hoje
+            ids_sel = set().union(*(rotulos_pr[l] for l in prod_sel)) if prod_sel else None
+            if prod_sel and set(prod_sel) & set(bookings.ROTULO_SEM_PRODUTO.values()):
+                ids_sel = None  # "Serviço"/"Salão" inclui produtos apagados, cujo id não está no mapa: filtra só pelo rótulo
+
+            # Rollup diário (receita_diaria), só do período/produtos pedidos e com cache incremental
+            r_d = services.get_receita_periodo(c_id, start_d, end_d, ids_sel)
+            
+            if r_d:
+                df = bookings.from_unified(r_d, map_pr, data_col='dia')
+                df = df[df['status'] != 'Cancelado']
+
+                df_filt = df
+                if prod_sel:
+                    df_filt = df_filt[df_filt['produto'].isin(prod_sel)]  # separa "Serviço" de "Salão" no produto_id 0
+
+                st.markdown("<br>", unsafe_allow_html=True)
+
+                # LINHA 1 DE GRÁFICOS
+                c_g1, c_g2 = st.columns(2)
+                with c_g1:
+                    st.markdown("##### 📈 Receita Diária")
+                    df_g = df_filt.groupby('dia')['valor'].sum().reset_index()
+                    if not df_g.empty:
+                        fig = px.line(df_g, x='dia', y='valor', text='valor')
+                        fig.update_traces(line_shape='spline', line_color=C_ACCENT_NEON, line_width=4, textposition="top center", texttemplate='R$%{text:.0f}', mode='lines+text')
+                        fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font={'color': C_TEXT_DARK}, xaxis=dict(showgrid=False, title=None), yaxis=dict(showgrid=False, showticklabels=False, title=None), margin=dict(l=0, r=0, t=20, b=20))
+                        st.plotly_chart(fig, use_container_width=True)
+                    else: st.info("Sem dados.")
+
+                with c_g2:
+                    st.markdown("##### 📊 Volume")
+                    df_vol = df_filt.groupby('dia')['qtd'].sum().reset_index(name='qtd')
+                    if not df_vol.empty:
+                        fig_vol = px.bar(df_vol, x='dia', y='qtd', text='qtd')
+                        fig_vol.update_traces(marker_color=C_SIDEBAR_NAVY, textposition='outside')
+                        fig_vol.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font={'color': C_TEXT_DARK}, xaxis=dict(showgrid=False, title=None), yaxis=dict(showgrid=False, showticklabels=False, title=None), margin=dict(l=0, r=0, t=20, b=20))
+                        st.plotly_chart(fig_vol, use_container_width=True)
+                    else: st.info("Sem dados.")
+
+                st.divider()
+
+                # LINHA 2 DE GRÁFICOS (Adicionada de volta!)
+                st.markdown("#### 🚀 Tendências")
+                c_t1, c_t2 = st.columns(2)
+                with c_t1:
+                    st.markdown("##### Faturamento Semanal")
+                    try:
+                        df_trend = df_filt.copy()
+                        df_trend['semana'] = df_trend['data'].dt.strftime('%Y-W%U')
+                        df_w = df_trend.groupby('semana')['valor'].sum().reset_index()
+                        fig3 = px.bar(df_w, x='semana', y='valor')
+                        fig3.update_traces(marker_color=C_SIDEBAR_NAVY)
+                        fig3.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font={'color': C_TEXT_DARK}, xaxis=dict(showgrid=False, title=None), yaxis=dict(showgrid=True, gridcolor='#E2E8F0', title=None), margin=dict(l=0, r=0, t=20, b=20))
+                        st.plotly_chart(fig3, use_container_width=True)
+                    except: st.info("Dados insuficientes.")
+                
+                with c_t2:
+                    st.markdown("##### Evolução de Produtos")
+                    try:
+                        df_area = df_filt.groupby(['dia', 'produto'], observed=True)['valor'].sum().reset_index()
+                        fig4 = px.area(df_area, x='dia', y='valor', color='produto')
+                        fig4.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font={'color': C_TEXT_DARK}, xaxis=dict(showgrid=False, title=None), yaxis=dict(showgrid=True, gridcolor='#E2E8F0', showticklabels=False, title=None), margin=dict(l=0, r=0, t=20, b=20), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+                        st.plotly_chart(fig4, use_container_width=True)
+                    except: st.info("Dados insuficientes.")
+
+            else: st.info("Sem dados para exibir.")
+        except Exception as e: st.error(f"Erro Visual: {e}")
+
+    # --------------------------------------------------------------------------
+    # TAB 4: PRODUTOS
+    # --------------------------------------------------------------------------
+    if aba_ativa == ABAS[4]:
+        rp = services.get_produtos(c_id)
+        por_id_prod = {item['id']: item for item in rp}
+        lista_produtos = []
+        for item in rp:
+            regras = products.parse_regras(item.get('regras_preco'))
+            lista_produtos.append({
+                'id': item['id'], 'Nome': item['nome'], 'Categoria': item['categoria'],
+                'Preço (R$)': float(regras.get('preco_padrao') or 0),
+                'Sinal (R$)': float(regras.get('valor_sinal') or 0)
+            })
+        df_prod = pd.DataFrame(lista_produtos)
+        k_export = f"prod_export_{c_id}"
+
+        col_table, col_actions = st.columns([2, 1])
+        with col_table:
+            if not df_prod.empty:
+                st.dataframe(df_prod[['Nome', 'Categoria', 'Preço (R$)', 'Sinal (R$)']], use_container_width=True, hide_index=True)
+            else: st.info("Nenhum produto cadastrado.")
+
+        with col_actions:
+            tab_new, tab_edit, tab_imp, tab_exp = st.tabs(["➕ Novo", "✏️ Editar", "📥 Importar", "📤 Exportar"])
+            with tab_new:
+                with st.form("form_add_prod"):
+                    n_new = st.text_input("Nome")
+                    c_new = st.selectbox("Categoria", products.CATEGORIAS, key="c_n")
+                    cv1, cv2 = st.columns(2)
+                    with cv1: p_new = st.number_input("Preço", min_value=0.0, step=10.0, key="pn")
+                    with cv2: s_new = st.number_input("Sinal", min_value=0.0, step=10.0, key="sn")
+                    if st.form_submit_button("Salvar", type="primary"):
+                        if n_new and services.create_product(c_id, n_new, c_new, p_new, s_new):
+                            st.session_state.pop(k_export, None)
+                            st.toast("Criado!", icon="✅"); st.rerun()
+
+            with tab_edit:
+                if not df_prod.empty:
+                    map_ids = {row['Nome']: row['id'] for i, row in df_prod.iterrows()}
+                    sel_name = st.selectbox("Editar:", list(map_ids.keys()))
+                    sel_id = map_ids[sel_name]
+                    item_atual = df_prod[df_prod['id'] == sel_id].iloc[0]
+                    with st.form("form_edit_prod"):
+                        n_ed = st.text_input("Nome", value=item_atual['Nome'])
+                        try: idx_c = products.CATEGORIAS.index(item_atual['Categoria'])
+                        except: idx_c = 0
+                        c_ed = st.selectbox("Categoria", products.CATEGORIAS, index=idx_c)
+                        ce1, ce2 = st.columns(2)
+                        with ce1: p_ed = st.number_input("Preço", value=float(item_atual['Preço (R$)']), step=10.0)
+                        with ce2: s_ed = st.number_input("Sinal", value=float(item_atual['Sinal (R$)']), step=10.0)
+                        
+                        cb1, cb2 = st.columns(2)
+                        with cb1:
+                            if st.form_submit_button("💾 Salvar"):
+                                services.update_product(c_id, por_id_prod[sel_id], n_ed, c_ed, p_ed, s_ed)
+                                st.session_state.pop(k_export, None)
+                                st.toast("Ok!", icon="💾"); st.rerun()
+                        with cb2:
+                            del_chk = st.checkbox("Excluir?")
+                            if st.form_submit_button("🗑️"):
+                                if del_chk:
+                                    supabase.table('produtos').delete().eq('id', sel_id).execute()
+                                    services.after_write(c_id, 'products')
+                                    st.session_state.pop(k_export, None)
+                                    st.toast("Tchau!", icon="🗑️"); st.rerun()
+
+            # Importação: valida o arquivo inteiro antes (uma vez por upload) e grava em lotes
+            with tab_imp:
+                st.caption("CSV (; ou ,) ou XLSX com as colunas **nome**, categoria, preco, sinal, duracao_minutos e ativo. "
+                           "Linhas com `id` ou com o nome de um produto existente atualizam o cadastro.")
+                st.download_button("Baixar modelo", products.modelo_csv(), "modelo_produtos.csv", "text/csv", key="dl_modelo_prod")
+                k_up = f"prod_upload_{c_id}"
+                versao_up = st.session_state.get(k_up, 0)
+                arq = st.file_uploader("Arquivo", type=["csv", "xlsx"], key=f"{k_up}_{versao_up}")
+                if arq is not None:
+                    k_val = f"prod_validacao_{c_id}"
+                    validacao = st.session_state.get(k_val)
+                    if not validacao or validacao[0] != arq.file_id:
+                        try: validacao = (arq.file_id, *products.valida(products.le_arquivo(arq.name, arq.getvalue()), rp))
+                        except Exception as e: validacao = (arq.file_id, None, None, str(e))
+                        st.session_state[k_val] = validacao
+                    _, novos, atualizacoes, erros = validacao
+                    if novos is None: st.error(f"Não foi possível ler o arquivo: {erros}")
+                    else:
+                        st.caption(f"{len(novos)} novos · {len(atualizacoes)} atualizações · {len(erros)} com erro")
+                        if erros:
+                            with st.expander(f"⚠️ {len(erros)} linhas com erro (ficam de fora)"):
+                                st.dataframe(pd.DataFrame(erros, columns=['Linha', 'Erro']), use_container_width=True, hide_index=True)
+                        if st.button("📥 Importar", type="primary", disabled=not (novos or atualizacoes), key="btn_importar_prod"):
+                            barra = st.progress(0.0)
+                            try: ins, upd = services.importa_produtos(c_id, novos, atualizacoes, progresso=barra.progress)
+                            except Exception as e: st.error(f"Erro na importação: {e}")
+                            else:
+                                st.session_state[k_up] = versao_up + 1  # uploader novo e vazio
+                                st.session_state.pop(k_val, None); st.session_state.pop(k_export, None)
+                                st.toast(f"Catálogo importado: {ins} novos, {upd} atualizados", icon="📥"); st.rerun()
+
+            # Exportação: o CSV só é montado quando pedido (download_button exige o conteúdo pronto)
+            with tab_exp:
+                st.caption(f"{len(rp)} produtos no catálogo.")
+                if st.button("Gerar CSV", key="btn_exportar_prod", disabled=not rp):
+                    st.session_state[k_export] = (b''.join(products.iter_csv(rp)), datetime.now().strftime("%H:%M"))
+                if k_export in st.session_state:
+                    dados, gerado = st.session_state[k_export]
+                    st.download_button(f"📤 Baixar (gerado às {gerado})", dados, f"produtos_{c_id}.csv", "text/csv", key="dl_export_prod")
+
+    # --------------------------------------------------------------------------
+    # TAB 5: AGENDA EM TABELA + TAREFAS (COM BAIXA DE SERVIÇO)
+    # --------------------------------------------------------------------------
+    if aba_ativa == ABAS[5]:
+        st.subheader("📅 Agenda Operacional")
+        
+        col_agenda, col_tarefas = st.columns([2, 1]) # Agenda mais larga
+        
+        # ======================================================================
+        # LADO ESQUERDO: AGENDA (TABELA + BAIXA)
+        # ======================================================================
+        with col_agenda:
+            # 1. BUSCAR DADOS (janela operacional, não o histórico; cancelados saem aqui)
+            try:
+                df_ag = services.get_bookings_df(c_id)
+                if (df_ag['tipo'].value_counts() >= services.AGENDA_MAX_LINHAS).any():
+                    st.caption(f"Janela cheia: até {services.AGENDA_MAX_LINHAS} agendamentos de cada lado de hoje, por tipo.")
+                df_ag = df_ag[df_ag['status'] != 'Cancelado'].sort_values('data', kind='stable')
+                df_agenda = pd.DataFrame({
+                    "ID": df_ag['id'],
+                    "Tipo": df_ag['tipo'].astype(str),
+                    "Data": df_ag['data'].dt.strftime("%d/%m/%Y"),
+                    "Hora": np.where(df_ag['tipo'] == 'servico', df_ag['data'].dt.strftime("%H:%M"), "Dia todo"),
+                    "Cliente": df_ag['cliente'],
+                    "Serviço": df_ag['produto'].astype(str),
+                    "Status": df_ag['status'].astype(str),
+                })
+            except Exception as e: 
+                st.error(f"Erro ao carregar agenda: {e}")
+                df_agenda = pd.DataFrame()
+
+            # 2. EXIBIR TABELA (VISUALIZAÇÃO)
+            if not df_agenda.empty:
+                # Remove colunas técnicas da visualização
+                df_visual = df_agenda[["Data", "Hora", "Cliente", "Serviço", "Status"]]
+                
+                st.markdown("##### 📋 Visão Geral")
+                st.dataframe(
+                    df_visual, 
+                    use_container_width=True, 
+                    hide_index=True,
+                    height=300
+                )
+            else:
+                st.info("Agenda vazia.")
+
+            st.divider()
+
+            # 3. ÁREA DE BAIXA (CHECK-OUT)
+            st.markdown("##### 🏁 Confirmar Realização")
+            st.caption(f"Dê baixa nos serviços que já aconteceram para contabilizar no histórico. "
+                       f"Janela: últimos {services.AGENDA_DIAS_PASSADOS} dias e próximos {services.AGENDA_DIAS_FUTUROS}; "
+                       f"confirmados mais antigos saem pela baixa em lote.")
+            
+            # Filtra apenas o que está "Confirmado" (ainda não foi "Concluído")
+            pendentes_de_baixa = df_agenda[df_agenda['Status'] == 'Confirmado'].to_dict('records') if not df_agenda.empty else []
+            
+            if pendentes_de_baixa:
+                # Baixa em lote: selecionados ou tudo que já passou (um UPDATE por tabela)
+                lote_agenda = st.toggle("☑️ Baixa em lote", key="agenda_lote")
+                if lote_agenda:
+                    sel_agenda = itens_selecionados('lote_agenda')
+                    with st.container(border=True):
+                        ba1, ba2 = st.columns(2)
+                        with ba1:
+                            if st.button(f"✅ Concluir selecionados ({len(sel_agenda)})", disabled=not sel_agenda, use_container_width=True):
+                                aplica_status('lote_agenda', sel_agenda, 'Concluído', "Serviços concluídos!", "✨")
+                        with ba2:
+                            if st.button(f"🚫 Falta nos selecionados ({len(sel_agenda)})", disabled=not sel_agenda, use_container_width=True):
+                                aplica_status('lote_agenda', sel_agenda, 'Faltou', "Faltas registradas.", "📉")
+                        if st.button("✅ Concluir todos os confirmados até ontem", use_container_width=True):
+                            hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+                            n = services.update_status_por_filtro(c_id, ['Confirmado'], 'Concluído', hoje)
+                            st.toast(f"Serviços concluídos! ({n})", icon="✨"); st.rerun()
+
+                lim_agenda = st.session_state.get('agenda_lim', services.AGENDA_PAGINA)
+                for task in pendentes_de_baixa[:lim_agenda]:
+                    with st.container(border=True):
+                        c_info, c_btns = st.columns([3, 2])
+                        with c_info:
+                            if lote_agenda:
+                                st.checkbox(f"**{task['Data']} às {task['Hora']}**", key=f"lote_agenda|{task['Tipo']}|{task['ID']}")
+                            else:
+                                st.markdown(f"**{task['Data']} às {task['Hora']}**")
+                            st.write(f"👤 {task['Cliente']} | 📦 {task['Serviço']}")
+                        
+                        if lote_agenda: continue
+                        with c_btns:
+                            b1, b2 = st.columns(2)
+                            with b1:
+                                if st.button("✅ Feito", key=f"ok_{task['ID']}_{task['Tipo']}", use_container_width=True):
+                                    services.update_status_em_lote(c_id, [(task['Tipo'], task['ID'])], 'Concluído')
+                                    st.toast("Serviço concluído!", icon="✨")
+                                    st.rerun()
+                            with b2:
+                                if st.button("🚫 Cancelado", key=f"no_{task['ID']}_{task['Tipo']}", use_container_width=True, help="Cliente faltou"):
+                                    services.update_status_em_lote(c_id, [(task['Tipo'], task['ID'])], 'Faltou')
+                                    st.toast("Falta registrada.", icon="📉")
+                                    st.rerun()
+
+                if len(pendentes_de_baixa) > lim_agenda:
+                    if st.button(f"⬇️ Mais ({len(pendentes_de_baixa) - lim_agenda})", key="agenda_mais", use_container_width=True):
+                        st.session_state['agenda_lim'] = lim_agenda + services.AGENDA_PAGINA
+                        st.rerun()
+            else:
+                st.success("Tudo em dia! Nenhum serviço pendente de baixa.")
+
+        # ======================================================================
+        # LADO DIREITO: MINHAS TAREFAS (MANTIDO)
+        # ======================================================================
+        with col_tarefas:
+            st.markdown("##### ✅ Minhas Tarefas")
+            
+            # Form de Nova Tarefa
+            with st.form("form_task"):
+                t_titulo = st.text_input("Nova Tarefa", placeholder="Ex: Ligar para João")
+                t_data = st.date_input("Vencimento", value=datetime.now())
+                if st.form_submit_button("Adicionar", use_container_width=True):
+                    supabase.table('crm_tarefas').insert({
+                        "cliente_id": c_id,
+                        "titulo": t_titulo,
+                        "data_vencimento": str(t_data),
+                        "concluido": False
+                    }).execute()
+                    st.rerun()
+            
+            st.markdown("---")
+            
+            # Lista de Tarefas Pendentes
+            try:
+                tarefas = services.get_tarefas(c_id)
+                
+                if tarefas:
+                    for t in tarefas:
+                        with st.container(border=True):
+                            check_col, text_col, del_col = st.columns([0.5, 3, 0.5])
+                            with check_col:
+                                if st.button("⭕", key=f"chk_{t['id']}", help="Concluir"):
+                                    supabase.table('crm_tarefas').update({'concluido': True}).eq('id', t['id']).execute()
+                                    st.rerun()
+                            with text_col:
+                                st.markdown(f"**{t['titulo']}**")
+                                st.caption(f"📅 {t['data_vencimento']}")
+                            with del_col:
+                                if st.button("🗑️", key=f"del_t_{t['id']}"):
+                                    supabase.table('crm_tarefas').delete().eq('id', t['id']).execute()
+                                    st.rerun()
+                else:
+                    st.caption("Tudo feito! 🎉")
+            except Exception as e: st.error("Erro tarefas")
+
+    # --------------------------------------------------------------------------
+    # TAB 6: CONFIGURAÇÕES GERAIS (IA + Z-API + EQUIPE)
+    # --------------------------------------------------------------------------
+    if aba_ativa == ABAS[6]:
+        st.subheader("⚙️ Configurações & Equipe")
+        
+        # 1. CARREGAMENTO DE DADOS (TenantConfig: já interpretado e cacheado por versão)
+        cfg = services.get_config(c_id)
+        curr_c = cfg.fluxo()  # cópia editável, com as chaves que o painel não edita
+        # Versão que estava na tela antes deste rerun: se mudou, o "Salvar" abaixo veio de um formulário velho
+        versao_key = f"cfg_versao_tela_{c_id}"
+        versao_tela = st.session_state.get(versao_key, cfg.versao)
+        st.session_state[versao_key] = cfg.versao
+        prompt_atual = cfg.prompt
+        curr_inst, curr_token, curr_client = cfg.zapi.id_instance, cfg.zapi.zapi_token, cfg.zapi.client_token
+
+        # DIVISÃO DO LAYOUT
+        c_ia, c_ops = st.columns([1.5, 1]) # IA ganha um pouco mais de espaço pro Prompt
+        
+        # ======================================================================
+        # COLUNA ESQUERDA: CÉREBRO (SUA CONFIGURAÇÃO ATUAL PRESERVADA)
+        # ======================================================================
+        with c_ia:
+            with st.container(border=True):
+                st.markdown("##### 🧠 Inteligência Artificial")
+                
+                # Prompt (Grande)
+                new_p = st.text_area("Personalidade & Regras", value=prompt_atual, height=400)
+                
+                st.divider()
+                
+                # Configs de Voz (Do seu código original)
+                c_v1, c_v2 = st.columns(2)
+                with c_v1:
+                    aud = st.toggle("Responde Áudio?", value=cfg.responde_em_audio)
+                
+                with c_v2:
+                    temp = st.slider("Criatividade", 0.0, 1.0, cfg.temperatura, 0.1)
+
+                # Mapa de Vozes (Restaurado)
+                val_voz = cfg.voz
+                mapa_vozes = {
+                    "alloy": "Alloy (Neutro)", "echo": "Echo (Suave)",
+                    "fable": "Fable (Narrador)", "onyx": "Onyx (Profundo)",
+                    "nova": "Nova (Energético)", "shimmer": "Shimmer (Calmo)"
+                }
+                
+                voz_desc = st.selectbox("Timbre de Voz", list(mapa_vozes.values()), index=list(mapa_vozes.keys()).index(val_voz))
+                voz_final = [k for k, v in mapa_vozes.items() if v == voz_desc][0]
+
+        # ======================================================================
+        # COLUNA DIREITA: OPERACIONAL & EQUIPE (NOVIDADES)
+        # ======================================================================
+        with c_ops:
+            # 1. Z-API (Edição das credenciais)
+            with st.expander("🔌 Conexão WhatsApp (Z-API)", expanded=False):
+                n_inst = st.text_input("Instance ID", value=curr_inst)
+                n_tok = st.text_input("Instance Token", value=curr_token, type="password")
+                n_cli = st.text_input("Client Token", value=curr_client, type="password")
+
+            # 2. HORÁRIOS (Do seu código original)
+            with st.container(border=True):
+                st.markdown("##### 🕒 Horário de Atendimento")
+                lista_h = [f"{i:02d}:00" for i in range(24)]
+                try: idx_h_i = lista_h.index(cfg.horario_inicio)
+                except: idx_h_i = 9
+                try: idx_h_f = lista_h.index(cfg.horario_fim)
+                except: idx_h_f = 18
+
+                ch1, ch2 = st.columns(2)
+                with ch1: h_ini = st.selectbox("Abre", lista_h, index=idx_h_i)
+                with ch2: h_fim = st.selectbox("Fecha", lista_h, index=idx_h_f)
+
+            # 3. GESTÃO DE EQUIPE (NOVO!)
+            with st.container(border=True):
+                st.markdown("##### 👥 Equipe")
+                
+                # Switch do Modo Equipe
+                novo_modo = st.toggle("Modo Multi-atendentes", value=cfg.modo_equipe, help="Separa chats em Fila e Meus.")
+                
+                # Cadastro Rápido
+                with st.expander("➕ Adicionar Usuário"):
+                    with st.form("add_user_form"):
+                        u_nome = st.text_input("Nome")
+                        u_mail = st.text_input("Email/Login")
+                        u_pass = st.text_input("Senha", type="password")
+                        if st.form_submit_button("Criar"):
+                            try:
+                                supabase.table('acesso_painel').insert({
+                                    'cliente_id': c_id, 'nome_usuario': u_nome, 
+                                    'email': u_mail, 'senha': u_pass, 'perfil': 'atendente'
+                                }).execute()
+                                st.toast(f"{u_nome} adicionado!")
+                                time.sleep(1); st.rerun()
+                            except Exception as e: st.error(f"Erro: {e}")
+
+                # Lista de Usuários
+                try:
+                    usrs = services.get_usuarios(c_id)
+                    if usrs:
+                        for u in usrs:
+                            c_u1, c_u2 = st.columns([4, 1])
+                            c_u1.text(f"👤 {u['nome_usuario']}")
+                            if c_u2.button("🗑️", key=f"del_u_{u['id']}"):
+                                supabase.table('acesso_painel').delete().eq('id', u['id']).execute()
+                                st.rerun()
+                except: pass
+
+            # ==================================================================
+            # BOTÃO MESTRE DE SALVAR (SALVA TUDO DE UMA VEZ)
+            # ==================================================================
+            st.markdown("<br>", unsafe_allow_html=True)
+            if st.button("💾 SALVAR TODAS AS CONFIGURAÇÕES", type="primary", use_container_width=True):
+                # Atualiza objeto JSON
+                curr_c['responde_em_audio'] = aud
+                curr_c['temperature'] = temp
+                curr_c['openai_voice'] = voz_final
+                curr_c['horario_inicio'] = h_ini
+                curr_c['horario_fim'] = h_fim
+                curr_c['modo_equipe'] = novo_modo # Salva a config da equipe
+
+                # Só o que mudou (caminhos do JSON + colunas), condicionado à versão editada
+                salvo = False
+                try:
+                    if versao_tela != cfg.versao: raise tenant_config.ConfigConflito()
+                    services.salvar_config(cfg, curr_c, prompt_full=new_p, id_instance=n_inst, zapi_token=n_tok, client_token=n_cli)
+                    salvo = True
+                except tenant_config.ConfigConflito:
+                    st.error("Outra pessoa salvou as configurações enquanto você editava. Confira os valores atuais e refaça sua alteração.")
+                
+                if salvo:
+                    st.success("Sistema atualizado com sucesso!")
+                    time.sleep(1.5)
+                    st.rerun()
+
+
+# ==============================================================================
+# 8. DIAGNÓSTICO (ADMIN)
+# ==============================================================================
+
+def render_diagnostico():
+    """Tempo do último rerun, consultas dele e agregados do processo"""
+    with st.expander("🩺 Diagnóstico"):
+        ult = metrics.ultimo_rerun()
+        if ult:
+            st.caption(f"Último rerun: {ult['total_ms']:.0f} ms" + (f" · aba {ult['aba']}: {ult['aba_ms']:.0f} ms" if ult['aba'] else ""))
+            if ult['chamadas']:
+                df_ult = pd.DataFrame(ult['chamadas'])
+                st.caption(f"{len(df_ult)} chamadas · {df_ult['ms'].sum():.0f} ms · {df_ult['bytes'].sum() / 1024:.1f} KB")
+                st.dataframe(df_ult[['tipo', 'alvo', 'op', 'ms', 'linhas', 'bytes', 'detalhe']], hide_index=True, use_container_width=True)
+
+        registro = metrics.get_registro()
+        resumo = registro.resumo()
+        if resumo:
+            st.caption("Processo (desde o início ou último reset)")
+            st.dataframe(pd.DataFrame(resumo), hide_index=True, use_container_width=True)
+
+        fila = outbox.get_outbox().stats()
+        if fila: st.caption("Caixa de saída da Inbox: " + " · ".join(f"{k} {v}" for k, v in sorted(fila.items())))
+
+        baldes = zapi.get_client().limitador.stats()
+        if baldes:
+            st.caption("Z-API: orçamento e taxa por instância (msg/min)")
+            st.dataframe(pd.DataFrame.from_dict(baldes, orient='index'), use_container_width=True)
+
+        d1, d2, d3 = st.columns(3)
+        d1.download_button("Prometheus", registro.prometheus(), file_name="otti_metrics.prom", mime="text/plain", use_container_width=True)
+        d2.download_button("JSONL", registro.jsonl(), file_name="otti_metrics.jsonl", mime="application/jsonl", use_container_width=True)
+        if d3.button("Zerar", use_container_width=True):
+            registro.reset()
+            st.rerun()
+
+# Fecha a medição antes do painel (o painel não entra no tempo do rerun)
+metrics.fim_rerun()
+if perfil == 'admin':
+    with st.sidebar: render_diagnostico()
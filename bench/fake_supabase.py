@@ -0,0 +1,577 @@
+import re
+import json
+import time
+import copy
+import threading
+from datetime import datetime, timezone
+
+# ==============================================================================
+# SUPABASE EM MEMÓRIA (BENCHMARK)
+# ------------------------------------------------------------------------------
+# Imita o suficiente do supabase-py/postgrest-py para rodar app.py e services.py:
+#   client.table(t).select(cols, count=).eq/neq/gt/gte/lt/lte/in_/is_/like/
+#   ilike/contains/overlaps/or_/not_.*/order/limit/range/single().execute()
+#   insert/update/upsert/delete, client.rpc(fn, params).execute()
+# Os objetos de sql/ têm equivalentes aqui: triggers de conversas_resumo,
+# receita_diaria e config_versao (mantidas a cada escrita), views funil_leads e
+# view_dashboard_kpis (recalculadas quando a tabela de origem muda) e as RPCs
+# funil_resumo, crm_tags_contagem, campanha_publico, clientes_config_patch e
+# zapi_ficha/zapi_ficha_resultado.
+# Índice por cliente_id em toda tabela, para que o custo medido seja o do app e
+# não uma varredura em Python.
+# latencia= soma um atraso fixo (segundos) por requisição, como a rede.
+# ==============================================================================
+
+def agora_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+class APIResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class FakeError(Exception):
+    pass
+
+# --- BANCO ---
+class FakeDB:
+    """Tabelas (listas de dicts) com ids sequenciais, índice por inquilino, triggers e views"""
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.lock = threading.RLock()
+        self.tabelas = {}
+        self._seq = {}
+        self._indice = {}      # tabela -> (lista base, {cliente_id: [rows]})
+        self._versao = {}      # tabela -> contador de escritas (invalida views)
+        self._views = {}       # nome -> (origens, fn(db, cliente_id) -> rows)
+        self._view_cache = {}  # (nome, cliente_id) -> (versões das origens, rows)
+        self._triggers = {}    # tabela -> [fn(db, op, old, new)]
+        self._rpcs = {}
+        self.requisicoes = 0
+        self.tempo = 0.0        # segundos gastos dentro do fake (para descontar do app)
+
+    # --- ESQUEMA ---
+    def view(self, nome, origens, fn):
+        """fn(db, cliente_id) -> rows; cliente_id None = todos os inquilinos"""
+        self._views[nome] = (tuple(origens), fn)
+
+    def trigger(self, tabela, fn):
+        self._triggers.setdefault(tabela, []).append(fn)
+
+    def rpc_fn(self, nome, fn):
+        self._rpcs[nome] = fn
+
+    # --- ACESSO ---
+    def rows(self, tabela, cliente_id=None):
+        """Linhas da tabela/view; com cliente_id usa o índice (ou a view só daquele inquilino)"""
+        if tabela in self._views: return self._view_rows(tabela, None if cliente_id is None else _norm(cliente_id))
+        base = self.tabelas.setdefault(tabela, [])
+        if cliente_id is None: return base
+        return self._idx(tabela, base).get(_norm(cliente_id), [])
+
+    def _idx(self, tabela, base):
+        hit = self._indice.get(tabela)
+        if hit is None or hit[0] is not base:  # delete troca a lista: reconstrói
+            mapa = {}
+            for r in base: mapa.setdefault(_norm(r.get('cliente_id')), []).append(r)
+            hit = self._indice[tabela] = (base, mapa)
+        return hit[1]
+
+    def _view_rows(self, nome, cliente_id):
+        origens, fn = self._views[nome]
+        versoes = tuple(self._versao.get(o, 0) for o in origens)
+        hit = self._view_cache.get((nome, cliente_id))
+        if hit and hit[0] == versoes: return hit[1]
+        rows = fn(self, cliente_id)
+        self._view_cache[(nome, cliente_id)] = (versoes, rows)
+        return rows
+
+    def _bump(self, tabela):
+        self._versao[tabela] = self._versao.get(tabela, 0) + 1
+
+    def next_id(self, tabela):
+        self._seq[tabela] = self._seq.get(tabela, 0) + 1
+        return self._seq[tabela]
+
+    # --- ESCRITA ---
+    def insert(self, tabela, rows, dispara=True):
+        base = self.tabelas.setdefault(tabela, [])
+        hit = self._indice.get(tabela)
+        out = []
+        for r in rows:
+            r = dict(r)
+            if 'id' not in r: r['id'] = self.next_id(tabela)
+            elif isinstance(r['id'], int): self._seq[tabela] = max(self._seq.get(tabela, 0), r['id'])
+            r.setdefault('created_at', agora_iso())
+            base.append(r)
+            if hit is not None and hit[0] is base: hit[1].setdefault(_norm(r.get('cliente_id')), []).append(r)
+            out.append(r)
+        self._bump(tabela)
+        if dispara:
+            for r in out:
+                for fn in self._triggers.get(tabela, ()): fn(self, 'INSERT', None, r)
+        return out
+
+    def update(self, tabela, alvo, valores):
+        out = []
+        for r in alvo:
+            old = dict(r)
+            r.update(valores)
+            out.append(r)
+            for fn in self._triggers.get(tabela, ()): fn(self, 'UPDATE', old, r)
+        if out: self._bump(tabela)
+        if out and 'cliente_id' in valores: self._indice.pop(tabela, None)
+        return out
+
+    def delete(self, tabela, alvo):
+        ids = {id(r) for r in alvo}
+        self.tabelas[tabela] = [r for r in self.tabelas.get(tabela, []) if id(r) not in ids]
+        for r in alvo:
+            for fn in self._triggers.get(tabela, ()): fn(self, 'DELETE', r, None)
+        if alvo: self._bump(tabela)
+        return list(alvo)
+
+def _norm(v):
+    """cliente_id chega como int ou str dependendo de quem chama"""
+    try: return int(v)
+    except (TypeError, ValueError): return v
+
+# --- FILTROS ---
+def _coage(atual, valor):
+    """Converte o valor do filtro (texto no or_) para o tipo da coluna"""
+    if isinstance(valor, str) and isinstance(atual, bool):
+        return valor.lower() == 'true'
+    if isinstance(valor, str) and isinstance(atual, (int, float)):
+        try: return type(atual)(float(valor)) if isinstance(atual, float) else int(valor)
+        except ValueError: return valor
+    if isinstance(atual, str) and not isinstance(valor, str) and valor is not None:
+        return str(valor)
+    return valor
+
+def _cmp(op, atual, valor):
+    if op == 'is':
+        v = str(valor).lower()
+        if v == 'null': return atual is None
+        if v == 'true': return atual is True
+        if v == 'false': return atual is False
+        return False
+    if op == 'in':
+        return any(_cmp('eq', atual, v) for v in valor)
+    if op == 'contains':
+        return atual is not None and set(valor) <= set(atual)
+    if op in ('overlaps', 'ov'):
+        return atual is not None and bool(set(valor) & set(atual))
+    if atual is None: return False
+    valor = _coage(atual, valor)
+    try:
+        if op == 'eq': return atual == valor
+        if op == 'neq': return atual != valor
+        if op == 'gt': return atual > valor
+        if op == 'gte': return atual >= valor
+        if op == 'lt': return atual < valor
+        if op == 'lte': return atual <= valor
+        if op in ('like', 'ilike'):
+            rx = '^' + re.escape(str(valor)).replace('%', '.*').replace('_', '.') + '$'
+            return re.match(rx, str(atual), re.I if op == 'ilike' else 0) is not None
+    except TypeError:
+        return False
+    raise FakeError(f"operador não suportado: {op}")
+
+def _split(texto):
+    """Divide por vírgula no nível de topo (respeita parênteses e aspas)"""
+    partes, buf, prof, aspas = [], '', 0, False
+    for ch in texto:
+        if ch == '"': aspas = not aspas
+        elif not aspas and ch == '(': prof += 1
+        elif not aspas and ch == ')': prof -= 1
+        if ch == ',' and prof == 0 and not aspas:
+            partes.append(buf); buf = ''
+        else: buf += ch
+    if buf: partes.append(buf)
+    return [p.strip() for p in partes]
+
+def _valor(texto):
+    texto = texto.strip()
+    if len(texto) >= 2 and texto[0] == texto[-1] == '"': return texto[1:-1]
+    return texto
+
+def _parse_or(texto):
+    """'a.lt."x",and(a.eq."x",id.lt.5)' -> árvore ('or'|'and', [termos]) / (col, op, valor, neg)"""
+    termos = []
+    for parte in _split(texto):
+        for grupo in ('and', 'or'):
+            if parte.startswith(grupo + '(') and parte.endswith(')'):
+                termos.append((grupo, _parse_or(parte[len(grupo) + 1:-1])[1]))
+                break
+        else:
+            col, resto = parte.split('.', 1)
+            neg = resto.startswith('not.')
+            if neg: resto = resto[4:]
+            op, val = resto.split('.', 1)
+            if op == 'in': val = [_valor(v) for v in _split(val.strip()[1:-1])]
+            else: val = _valor(val)
+            termos.append((col, op, val, neg))
+    return ('or', termos)
+
+def _avalia(arvore, row):
+    grupo, termos = arvore
+    res = (_avalia(t, row) if t[0] in ('and', 'or') and len(t) == 2 else (_cmp(t[1], row.get(t[0]), t[2]) != t[3]) for t in termos)
+    return any(res) if grupo == 'or' else all(res)
+
+# --- PROJEÇÃO ---
+_EMBED = re.compile(r'^(?:(\w+):)?(\w+)\((.*)\)$')
+
+def _parse_select(cols):
+    if cols is None or cols.strip() == '*': return None
+    out = []
+    for c in _split(cols):
+        m = _EMBED.match(c)
+        if m: out.append(('embed', m.group(1) or m.group(2), m.group(2), _parse_select(m.group(3))))
+        else: out.append(('col', c.strip()))
+    return out
+
+def _projeta(db, row, campos):
+    if campos is None: return dict(row)
+    out = {}
+    for c in campos:
+        if c[0] == 'col':
+            if c[1] == '*': out.update(row)
+            else: out[c[1]] = row.get(c[1])
+        else:
+            _, alias, fk, sub = c
+            alvo = next((r for r in db.rows(alias) if r.get('id') == row.get(fk)), None) if row.get(fk) is not None else None
+            out[alias] = _projeta(db, alvo, sub) if alvo else None
+    return out
+
+# --- CONSULTA ---
+class _Not:
+    def __init__(self, q): self._q = q
+    def __getattr__(self, nome):
+        fn = getattr(self._q, nome)
+        def neg(*args, **kwargs):
+            self._q._negar = True
+            return fn(*args, **kwargs)
+        return neg
+
+class FakeQuery:
+    def __init__(self, db, tabela):
+        self.db, self.tabela = db, tabela
+        self.acao, self.payload, self.campos, self.count = 'select', None, None, None
+        self.filtros, self.ordem = [], []
+        self.ini, self.fim = 0, None
+        self.unico = False
+        self.on_conflict = None
+        self._negar = False
+
+    # --- AÇÕES ---
+    def select(self, cols='*', count=None, **_):
+        self.campos, self.count = _parse_select(cols), count
+        return self
+
+    def insert(self, rows, **_):
+        self.acao, self.payload = 'insert', rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict=None, **_):
+        self.acao, self.payload = 'upsert', rows if isinstance(rows, list) else [rows]
+        self.on_conflict = [c.strip() for c in on_conflict.split(',')] if on_conflict else ['id']
+        return self
+
+    def update(self, valores, **_):
+        self.acao, self.payload = 'update', dict(valores)
+        return self
+
+    def delete(self, **_):
+        self.acao = 'delete'
+        return self
+
+    # --- FILTROS ---
+    def _f(self, op, col, val):
+        self.filtros.append((col, op, val, self._negar))
+        self._negar = False
+        return self
+
+    def eq(self, col, val): return self._f('eq', col, val)
+    def neq(self, col, val): return self._f('neq', col, val)
+    def gt(self, col, val): return self._f('gt', col, val)
+    def gte(self, col, val): return self._f('gte', col, val)
+    def lt(self, col, val): return self._f('lt', col, val)
+    def lte(self, col, val): return self._f('lte', col, val)
+    def like(self, col, val): return self._f('like', col, val)
+    def ilike(self, col, val): return self._f('ilike', col, val)
+    def is_(self, col, val): return self._f('is', col, val)
+    def in_(self, col, vals): return self._f('in', col, list(vals))
+    def contains(self, col, vals): return self._f('contains', col, list(vals))
+    def overlaps(self, col, vals): return self._f('overlaps', col, list(vals))
+
+    def or_(self, texto, **_):
+        self.filtros.append(('__or__', _parse_or(texto), None, self._negar))
+        self._negar = False
+        return self
+
+    @property
+    def not_(self):
+        return _Not(self)
+
+    # --- MODIFICADORES ---
+    def order(self, col, desc=False, **_):
+        self.ordem.append((col, desc))
+        return self
+
+    def limit(self, n, **_):
+        self.fim = self.ini + n - 1
+        return self
+
+    def range(self, ini, fim):
+        self.ini, self.fim = ini, fim
+        return self
+
+    def single(self):
+        self.unico = True
+        return self
+
+    maybe_single = single
+
+    # --- EXECUÇÃO ---
+    def _alvo(self):
+        cid = next((v for c, op, v, neg in self.filtros if c == 'cliente_id' and op == 'eq' and not neg), None)
+        base = self.db.rows(self.tabela, cid) if cid is not None else self.db.rows(self.tabela)
+        out = []
+        for r in base:
+            ok = True
+            for c, op, v, neg in self.filtros:
+                hit = _avalia(op, r) if c == '__or__' else _cmp(op, r.get(c), v)
+                if hit == neg: ok = False; break
+            if ok: out.append(r)
+        return out
+
+    def execute(self):
+        if self.db.latencia: time.sleep(self.db.latencia)
+        with self.db.lock:
+            inicio = time.perf_counter()
+            try: return self._executa()
+            finally:
+                self.db.requisicoes += 1
+                self.db.tempo += time.perf_counter() - inicio
+
+    def _executa(self):
+        if self.acao == 'insert':
+            return APIResponse([dict(r) for r in self.db.insert(self.tabela, self.payload)])
+        if self.acao == 'upsert':
+            return APIResponse([dict(r) for r in self._upsert()])
+        if self.acao == 'update':
+            return APIResponse([dict(r) for r in self.db.update(self.tabela, self._alvo(), self.payload)])
+        if self.acao == 'delete':
+            return APIResponse([dict(r) for r in self.db.delete(self.tabela, self._alvo())])
+
+        rows = self._alvo()
+        total = len(rows)
+        for col, desc in reversed(self.ordem):
+            rows = sorted(rows, key=lambda r: (r.get(col) is None, r.get(col)), reverse=desc)
+        rows = rows[self.ini:None if self.fim is None else self.fim + 1]
+        data = [copy.deepcopy(_projeta(self.db, r, self.campos)) for r in rows]
+        if self.unico: data = data[0] if data else None
+        return APIResponse(data, total if self.count else None)
+
+    def _upsert(self):
+        out, novos = [], []
+        for r in self.payload:
+            chave = tuple(r.get(c) for c in self.on_conflict)
+            alvo = next((x for x in self.db.rows(self.tabela, r.get('cliente_id')) if tuple(x.get(c) for c in self.on_conflict) == chave), None) \
+                if 'cliente_id' in r else next((x for x in self.db.rows(self.tabela) if tuple(x.get(c) for c in self.on_conflict) == chave), None)
+            if alvo is not None: out += self.db.update(self.tabela, [alvo], r)
+            else: novos.append(r)
+        return out + self.db.insert(self.tabela, novos)
+
+class FakeRPC:
+    def __init__(self, db, nome, params):
+        self.db, self.nome, self.params = db, nome, params or {}
+
+    def execute(self):
+        if self.db.latencia: time.sleep(self.db.latencia)
+        fn = self.db._rpcs.get(self.nome)
+        if fn is None: raise FakeError(f"rpc inexistente: {self.nome}")
+        with self.db.lock:
+            inicio = time.perf_counter()
+            try: return APIResponse(fn(self.db, **self.params))
+            finally:
+                self.db.requisicoes += 1
+                self.db.tempo += time.perf_counter() - inicio
+
+class FakeClient:
+    """Substituto de supabase.Client para services.supabase"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def table(self, nome):
+        return FakeQuery(self.db, nome)
+
+    from_ = table
+
+    def rpc(self, nome, params=None, **_):
+        return FakeRPC(self.db, nome, params)
+
+# ==============================================================================
+# OBJETOS DE sql/ (TRIGGERS, VIEWS, RPC)
+# ==============================================================================
+
+FUNIL_COLUNA = {}
+for _s in (None, 'Pendente', 'Novo', 'Aguardando', ''): FUNIL_COLUNA[_s] = 'pendente'
+for _s in ('Confirmado', 'Pago', 'Agendado'): FUNIL_COLUNA[_s] = 'confirmado'
+for _s in ('Cancelado', 'Desistiu'): FUNIL_COLUNA[_s] = 'cancelado'
+
+def _conversa_on_mensagem(db, op, old, new):
+    if op != 'INSERT' or new.get('cliente_id') is None or not new.get('wa_id'): return
+    ts = new.get('created_at') or agora_iso()
+    atual = next((c for c in db.rows('conversas_resumo', new['cliente_id']) if c['wa_id'] == new['wa_id']), None)
+    if atual is None:
+        db.insert('conversas_resumo', [{'id': db.next_id('conversas_resumo'), 'cliente_id': new['cliente_id'], 'wa_id': new['wa_id'],
+                                        'ultima_mensagem_em': ts, 'ultimo_trecho': (new.get('content') or '')[:120],
+                                        'ultimo_role': new.get('role'), 'qtd_mensagens': 1}], dispara=False)
+        return
+    novos = {'qtd_mensagens': atual['qtd_mensagens'] + 1}
+    if ts >= atual['ultima_mensagem_em']:
+        novos.update(ultima_mensagem_em=ts, ultimo_trecho=(new.get('content') or '')[:120], ultimo_role=new.get('role'))
+    db.update('conversas_resumo', [atual], novos)
+
+def _conversa_on_agendamento(db, op, old, new):
+    if op != 'INSERT' or new.get('cliente_id') is None or not new.get('cliente_final_waid'): return
+    if any(c['wa_id'] == new['cliente_final_waid'] for c in db.rows('conversas_resumo', new['cliente_id'])): return
+    db.insert('conversas_resumo', [{'id': db.next_id('conversas_resumo'), 'cliente_id': new['cliente_id'], 'wa_id': new['cliente_final_waid'],
+                                    'ultima_mensagem_em': new.get('created_at') or agora_iso(), 'ultimo_trecho': None,
+                                    'ultimo_role': None, 'qtd_mensagens': 0}], dispara=False)
+
+def _receita_trigger(col_produto, tipo):
+    def aplica(db, row, sinal):
+        if row.get('cliente_id') is None or not row.get('created_at'): return
+        chave = (str(row['created_at'])[:10], tipo, row.get(col_produto) or 0, row.get('status') or '')
+        atual = next((r for r in db.rows('receita_diaria', row['cliente_id'])
+                      if (r['dia'], r['tipo'], r['produto_id'], r['status']) == chave), None)
+        valor = float(row.get('valor_sinal_registrado') or 0) * sinal
+        if atual is None:
+            db.insert('receita_diaria', [{'cliente_id': row['cliente_id'], 'dia': chave[0], 'tipo': tipo, 'produto_id': chave[2],
+                                          'status': chave[3], 'qtd': sinal, 'valor': valor}], dispara=False)
+        else:
+            db.update('receita_diaria', [atual], {'qtd': atual['qtd'] + sinal, 'valor': atual['valor'] + valor})
+
+    def trigger(db, op, old, new):
+        if old is not None: aplica(db, old, -1)
+        if new is not None: aplica(db, new, 1)
+    return trigger
+
+def _view_funil_leads(db, cliente_id):
+    out = []
+    for tabela, tipo, col_prod, col_data in (('agendamentos', 'servico', 'servico_id', 'data_hora_inicio'),
+                                             ('agendamentos_salao', 'salao', 'produto_salao_id', 'data_reserva')):
+        for r in db.rows(tabela, cliente_id):
+            out.append({'id': r['id'], 'tipo': tipo, 'cliente_id': r.get('cliente_id'), 'cliente_final_waid': r.get('cliente_final_waid'),
+                        'status': r.get('status'), 'valor': r.get('valor_total_registrado') or 0, 'produto_id': r.get(col_prod),
+                        'data': r.get(col_data), 'coluna': FUNIL_COLUNA.get(r.get('status'))})
+    return out
+
+def _view_kpis(db, cliente_id):
+    out = []
+    for c in db.rows('clientes'):
+        if cliente_id is not None and c['id'] != cliente_id: continue
+        receita = sum(float(r.get('valor_total_registrado') or 0)
+                      for t in ('agendamentos', 'agendamentos_salao') for r in db.rows(t, c['id'])
+                      if FUNIL_COLUNA.get(r.get('status')) == 'confirmado')
+        out.append({'cliente_id': c['id'], 'nome_empresa': c.get('nome_empresa'), 'bot_pausado': c.get('bot_pausado', False),
+                    'total_mensagens': len(db.rows('historico_mensagens', c['id'])),
+                    'total_atendimentos': len(db.rows('conversas_resumo', c['id'])), 'receita_total': receita})
+    return out
+
+def _rpc_funil_resumo(db, p_cliente_id):
+    tot = {}
+    for r in db.rows('funil_leads', p_cliente_id):
+        if r['coluna'] is None: continue
+        t = tot.setdefault(r['coluna'], {'coluna': r['coluna'], 'qtd': 0, 'valor': 0.0})
+        t['qtd'] += 1
+        t['valor'] += float(r['valor'] or 0)
+    return list(tot.values())
+
+def _rpc_crm_tags_contagem(db, p_cliente_id):
+    tot = {}
+    for c in db.rows('crm_clientes_finais', p_cliente_id):
+        for t in c.get('tags') or (): tot[t] = tot.get(t, 0) + 1
+    return [{'tag': t, 'qtd': n} for t, n in sorted(tot.items(), key=lambda kv: (-kv[1], kv[0]))]
+
+def _rpc_campanha_publico(db, p_campanha_id, p_cliente_id, p_tags):
+    alvo, vistos = set(p_tags), set()
+    for c in db.rows('crm_clientes_finais', p_cliente_id):
+        if c.get('wa_id') and alvo & set(c.get('tags') or ()): vistos.add(c['wa_id'])
+    db.insert('crm_campanhas_envios', [{'campanha_id': p_campanha_id, 'cliente_id': p_cliente_id, 'wa_id': w,
+                                        'status': 'pendente', 'tentativas': 0} for w in sorted(vistos)])
+    camp = [c for c in db.rows('crm_campanhas', p_cliente_id) if c['id'] == p_campanha_id and c.get('status') == 'preparando']
+    db.update('crm_campanhas', camp, {'qtd_alvos': len(vistos), 'status': 'na_fila' if vistos else 'concluida'})
+    return len(vistos)
+
+_CONFIG_VERSIONADA = ('config_fluxo', 'prompt_full', 'id_instance', 'zapi_token', 'client_token', 'nome_empresa')
+
+def _clientes_config_versao(db, op, old, new):
+    if op == 'UPDATE' and any(old.get(c) != new.get(c) for c in _CONFIG_VERSIONADA):
+        new['config_versao'] = (old.get('config_versao') or 1) + 1
+
+def _rpc_clientes_config_patch(db, p_cliente_id, p_versao, p_definir=(), p_remover=(), p_colunas=None):
+    alvo = [c for c in db.rows('clientes') if c['id'] == p_cliente_id and (c.get('config_versao') or 1) == p_versao]
+    if not alvo: return None
+    cfg = copy.deepcopy(alvo[0].get('config_fluxo') or {})
+    if isinstance(cfg, str): cfg = json.loads(cfg)
+    for caminho in p_remover or ():
+        pai = cfg
+        for k in caminho[:-1]: pai = pai.get(k) if isinstance(pai, dict) else None
+        if isinstance(pai, dict): pai.pop(caminho[-1], None)
+    for item in p_definir or ():
+        pai = cfg
+        for k in item['caminho'][:-1]: pai = pai.setdefault(k, {})
+        pai[item['caminho'][-1]] = copy.deepcopy(item['valor'])
+    novos = {'config_fluxo': cfg}
+    novos.update({c: v for c, v in (p_colunas or {}).items() if c in ('prompt_full', 'id_instance', 'zapi_token', 'client_token')})
+    db.update('clientes', alvo, novos)
+    return alvo[0].get('config_versao') or 1
+
+def _rpc_zapi_ficha(db, p_id_instance, p_por_minuto, p_rajada, p_minimo):
+    b = db.zapi_fichas.get(p_id_instance)
+    agora, teto = time.time(), max(0.01, p_por_minuto / 60.0)
+    if b is None:
+        b = db.zapi_fichas[p_id_instance] = {'taxa': teto, 'fichas': max(1.0, p_rajada), 'em': agora, 'pausa_ate': 0.0}
+    b['taxa'], b['teto'], cap = min(b['taxa'], teto), teto, max(1.0, p_rajada)
+    b['fichas'] = min(cap, b['fichas'] + (agora - b['em']) * b['taxa'])
+    b['em'] = agora
+    if agora >= b['pausa_ate'] and b['fichas'] >= p_minimo:
+        b['fichas'] -= 1.0
+        espera = 0.0
+    else: espera = max(b['pausa_ate'] - agora, (p_minimo - b['fichas']) / b['taxa'])
+    return [{'espera': espera, 'taxa_min': b['taxa'] * 60, 'fichas': b['fichas']}]
+
+def _rpc_zapi_ficha_resultado(db, p_id_instance, p_ok, p_status=None, p_retry_after=None, p_recuperacao=0.05,
+                              p_piso=0.1, p_corte_429=0.5, p_corte_erro=0.8):
+    b = db.zapi_fichas.get(p_id_instance)
+    if b is None: return None
+    if p_ok: b['taxa'] = min(b['teto'], b['taxa'] + b['teto'] * p_recuperacao)
+    else: b['taxa'] = max(b['teto'] * p_piso, b['taxa'] * (p_corte_429 if p_status == 429 else p_corte_erro))
+    if not p_ok and p_status == 429:
+        b['pausa_ate'] = max(b['pausa_ate'], time.time() + (p_retry_after if p_retry_after is not None else 1.0 / b['taxa']))
+        b['fichas'] = min(b['fichas'], 0.0)
+    return b['taxa'] * 60
+
+def instala_esquema(db):
+    """Equivalentes em memória de sql/002, 004 a 009 e da view de KPIs"""
+    db.trigger('clientes', _clientes_config_versao)
+    db.trigger('historico_mensagens', _conversa_on_mensagem)
+    db.trigger('agendamentos', _conversa_on_agendamento)
+    db.trigger('agendamentos_salao', _conversa_on_agendamento)
+    db.trigger('agendamentos', _receita_trigger('servico_id', 'servico'))
+    db.trigger('agendamentos_salao', _receita_trigger('produto_salao_id', 'salao'))
+    db.view('funil_leads', ('agendamentos', 'agendamentos_salao'), _view_funil_leads)
+    db.view('view_dashboard_kpis', ('clientes', 'historico_mensagens', 'conversas_resumo', 'agendamentos', 'agendamentos_salao'), _view_kpis)
+    db.rpc_fn('funil_resumo', _rpc_funil_resumo)
+    db.rpc_fn('crm_tags_contagem', _rpc_crm_tags_contagem)
+    db.rpc_fn('campanha_publico', _rpc_campanha_publico)
+    db.rpc_fn('clientes_config_patch', _rpc_clientes_config_patch)
+    db.zapi_fichas = {}  # sql/009: estado do balde fora das tabelas (não entra no índice por inquilino)
+    db.rpc_fn('zapi_ficha', _rpc_zapi_ficha)
+    db.rpc_fn('zapi_ficha_resultado', _rpc_zapi_ficha_resultado)
+    return db
@@ -0,0 +1,55 @@
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==============================================================================
+# Z-API FALSA (HTTP LOCAL)
+# ------------------------------------------------------------------------------
+# Responde POST /instances/<id>/token/<tok>/send-text com 200 e um messageId,
+# depois de `latencia` segundos. falhas= fração de respostas 503 (exercita o
+# backoff do zapi.py). Aponte ZAPI_BASE_URL para url() antes de importar zapi.
+# ==============================================================================
+
+class FakeZapi:
+    def __init__(self, latencia=0.05, falhas=0.0, seed=7):
+        self.latencia, self.falhas = latencia, falhas
+        self.enviados = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        zapi = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                tamanho = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(tamanho)
+                time.sleep(zapi.latencia)
+                with zapi._lock:
+                    falha = zapi._rng.random() < zapi.falhas
+                    if not falha: zapi.enviados += 1
+                corpo = json.dumps({'error': 'indisponivel'} if falha else {'messageId': f"bench-{zapi.enviados}"}).encode()
+                self.send_response(503 if falha else 200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-zapi', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def url(self):
+        host, porta = self.server.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()  # fecha o socket: envio atrasado falha na hora em vez de esperar o timeout de leitura
@@ -0,0 +1,154 @@
+"""Teste de carga: M sessões simultâneas em N inquilinos num único processo.
+
+    python bench/load.py --sessoes 20 --inquilinos 4 --duracao 60
+    python bench/load.py --sessoes 50 --latencia 0.03 --saida bench/carga.json
+
+Cada sessão é um AppTest em sua própria thread, logado como atendente de um
+inquilino (distribuição round-robin), que repete o ciclo de um atendente:
+na maior parte do tempo a Inbox (o polling), às vezes Funil/Agenda/Analytics,
+com um intervalo de "pensar" entre ações. Como todas dividem o mesmo processo
+(caches, GIL, pool do banco), o p95/p99 mostra onde as threads de script
+começam a disputar a CPU. Reporta vazão, p50/p95/p99 por ação e memória
+(RSS) por sessão.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import statistics
+from datetime import datetime
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH)
+
+from run import prepara_ambiente, nova_sessao, login, vai_para, rerun, ABAS
+from seed import email_de
+
+# Mistura de ações de um atendente (peso relativo)
+MISTURA = [
+    ('inbox', 70),
+    ('funil', 10),
+    ('agenda', 10),
+    ('analytics', 5),
+    ('troca_aba', 5),
+]
+ACOES = {
+    'inbox': lambda at, rng: vai_para(ABAS[1])(at) if at.radio(key="aba_ativa").value != ABAS[1] else rerun(at),
+    'funil': lambda at, rng: vai_para(ABAS[0])(at),
+    'agenda': lambda at, rng: vai_para(ABAS[5])(at),
+    'analytics': lambda at, rng: vai_para(ABAS[3])(at),
+    'troca_aba': lambda at, rng: vai_para(rng.choice(ABAS))(at),
+}
+
+def rss_mb():
+    """RSS atual do processo (Linux: /proc; outros: pico via resource)"""
+    try:
+        with open('/proc/self/statm') as f: return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 2**20 if sys.platform == 'darwin' else pico / 1024
+
+def percentil(valores, q):
+    if not valores: return 0.0
+    ordenado = sorted(valores)
+    return ordenado[min(len(ordenado) - 1, int(q * len(ordenado)))]
+
+class Sessao(threading.Thread):
+    def __init__(self, idx, c_id, fim, pensar, registro, lock, seed):
+        super().__init__(name=f"sessao-{idx}", daemon=True)
+        self.idx, self.c_id, self.fim, self.pensar = idx, c_id, fim, pensar
+        self.registro, self.lock = registro, lock
+        self.rng = random.Random(seed)
+        self.at = None
+        self.pronta = threading.Event()
+
+    def _mede(self, nome, acao):
+        inicio = time.perf_counter()
+        erro = None
+        try: acao(self.at)
+        except Exception as e: erro = f"{type(e).__name__}: {e}"
+        if erro is None and len(self.at.exception): erro = self.at.exception[0].message
+        with self.lock:
+            self.registro.append({'sessao': self.idx, 'cliente_id': self.c_id, 'acao': nome,
+                                  'ms': (time.perf_counter() - inicio) * 1000, 'erro': erro, 't': time.time()})
+
+    def run(self):
+        try:
+            self.at = nova_sessao()
+            self._mede('abrir', rerun)
+            self._mede('login', login(email_de(self.c_id)))
+        finally:
+            self.pronta.set()
+        nomes, pesos = zip(*MISTURA)
+        while time.time() < self.fim:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.pensar)
+            nome = self.rng.choices(nomes, pesos)[0]
+            self._mede(nome, lambda at: ACOES[nome](at, self.rng))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--sessoes', type=int, default=20, help="M sessões simultâneas")
+    ap.add_argument('--inquilinos', type=int, default=4, help="N inquilinos")
+    ap.add_argument('--tamanho', default='10k', help="tamanho de cada inquilino (1k, 10k, 100k ou número)")
+    ap.add_argument('--duracao', type=float, default=60, help="segundos de carga após o login de todos")
+    ap.add_argument('--pensar', type=float, default=3.0, help="intervalo médio entre ações (s), ~ ciclo da Inbox")
+    ap.add_argument('--latencia', type=float, default=0.02, help="latência por consulta no banco falso (s)")
+    ap.add_argument('--rampa', type=float, default=0.2, help="intervalo entre o início de duas sessões (s)")
+    ap.add_argument('--saida', default=os.path.join(BENCH, 'carga.json'))
+    args = ap.parse_args(argv)
+
+    tamanho = args.tamanho if args.tamanho in ('1k', '10k', '100k') else int(args.tamanho)
+    rss_inicial = rss_mb()
+    client, inquilinos, zapi_fake = prepara_ambiente(tuple([tamanho] * args.inquilinos), args.latencia)
+    ids = list(inquilinos.values())
+    rss_base = rss_mb()
+
+    registro, lock = [], threading.Lock()
+    fim_previsto = time.time() + args.sessoes * args.rampa + args.duracao
+    sessoes = [Sessao(i, ids[i % len(ids)], fim_previsto, args.pensar, registro, lock, seed=i) for i in range(args.sessoes)]
+    for s in sessoes:
+        s.start()
+        time.sleep(args.rampa)
+    for s in sessoes: s.pronta.wait()
+    rss_logado = rss_mb()
+    inicio_carga = time.time()
+    for s in sessoes: s.join()
+    duracao = time.time() - inicio_carga
+    rss_final = rss_mb()
+    zapi_fake.stop()
+
+    carga = [r for r in registro if r['acao'] not in ('abrir', 'login') and r['t'] >= inicio_carga]
+    por_acao = {}
+    for r in registro: por_acao.setdefault(r['acao'], []).append(r['ms'])
+    resumo = {
+        acao: {'n': len(ms), 'p50_ms': round(percentil(ms, .50), 1), 'p95_ms': round(percentil(ms, .95), 1),
+               'p99_ms': round(percentil(ms, .99), 1), 'media_ms': round(statistics.mean(ms), 1)}
+        for acao, ms in sorted(por_acao.items())
+    }
+    todos = [r['ms'] for r in carga]
+    saida = {
+        'meta': {'quando': datetime.now().isoformat(timespec='seconds'), 'sessoes': args.sessoes, 'inquilinos': len(ids),
+                 'tamanho': str(tamanho), 'duracao_s': round(duracao, 1), 'pensar_s': args.pensar, 'latencia_db_s': args.latencia},
+        'vazao_reruns_s': round(len(carga) / duracao, 2) if duracao else 0,
+        'rerun_ms': {'p50': round(percentil(todos, .50), 1), 'p95': round(percentil(todos, .95), 1), 'p99': round(percentil(todos, .99), 1)},
+        'por_acao': resumo,
+        'erros': sum(1 for r in registro if r['erro']),
+        'exemplos_erro': sorted({r['erro'] for r in registro if r['erro']})[:10],
+        'memoria_mb': {'inicial': round(rss_inicial, 1), 'apos_seed': round(rss_base, 1), 'apos_login': round(rss_logado, 1),
+                       'final': round(rss_final, 1), 'por_sessao': round((rss_final - rss_base) / max(1, args.sessoes), 2)},
+        'consultas_db': client.db.requisicoes,
+    }
+    with open(args.saida, 'w', encoding='utf-8') as f: json.dump(saida, f, ensure_ascii=False, indent=1)
+
+    print(f"{args.sessoes} sessões · {len(ids)} inquilinos · {duracao:.0f}s")
+    print(f"vazão {saida['vazao_reruns_s']} reruns/s · p50 {saida['rerun_ms']['p50']} ms · p95 {saida['rerun_ms']['p95']} ms · p99 {saida['rerun_ms']['p99']} ms")
+    print(f"memória por sessão ≈ {saida['memoria_mb']['por_sessao']} MB · erros {saida['erros']}")
+    print(f"→ {args.saida}")
+    return saida
+
+if __name__ == '__main__':
+    main()
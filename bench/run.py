@@ -0,0 +1,222 @@
+"""Benchmark do painel: app.py via AppTest contra o Supabase em memória.
+
+    python bench/run.py                          # 1k, 10k e 100k, 3 repetições
+    python bench/run.py --tamanhos 1k,10k --saida bench/base.json
+    python bench/run.py --comparar bench/base.json
+
+Mede a latência de rerun por aba (cache frio e quente) e por ação (login,
+troca de inquilino, pagar card, enviar mensagem, disparar campanha) e grava
+JSON. db_ms é o tempo gasto dentro do banco falso: rerun_ms - db_ms é o custo
+do app em si.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import statistics
+from datetime import datetime
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(BENCH)
+APP = os.path.join(RAIZ, 'app.py')
+sys.path[:0] = [BENCH, RAIZ]
+
+from seed import novo_banco, email_de, SENHA
+from fake_zapi import FakeZapi
+
+ABAS = ["💰 Funil", "💬 Inbox", "📢 Disparos", "📊 Analytics", "📦 Produtos", "📅 Agenda", "🧠 Cérebro"]
+TIMEOUT = 120
+
+# ==============================================================================
+# AMBIENTE
+# ==============================================================================
+
+def prepara_ambiente(tamanhos, latencia=0.0, zapi_latencia=0.05):
+    """Sobe a Z-API falsa, semeia o banco e injeta o cliente em services.supabase"""
+    zapi_fake = FakeZapi(latencia=zapi_latencia).start()
+    os.environ['ZAPI_BASE_URL'] = zapi_fake.url()  # antes de importar zapi
+    os.environ.setdefault('CAMPANHA_TAXA_POR_MINUTO', '120')
+    os.environ.setdefault('OUTBOX_ARQUIVO', os.path.join(tempfile.mkdtemp(prefix='otti-bench-'), 'outbox.sqlite3'))
+    os.chdir(RAIZ)
+
+    client, inquilinos = novo_banco(tamanhos, latencia=latencia)
+    import services, metrics
+    services.supabase = metrics.instrument(client)
+    return client, inquilinos, zapi_fake
+
+def nova_sessao():
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(APP, default_timeout=TIMEOUT)
+
+def limpa_cache(c_id):
+    """Cache frio: descarta tudo do inquilino no cache do processo"""
+    import cache
+    cache.invalidate(c_id)
+
+# ==============================================================================
+# MEDIÇÃO
+# ==============================================================================
+
+class Medidor:
+    def __init__(self, client):
+        self.client = client
+        self.resultados = []
+
+    def mede(self, at, cenario, acao, **meta):
+        """Executa acao(at) (que termina em .run()) e registra tempo, db e erros"""
+        db = self.client.db
+        req0, t_db0 = db.requisicoes, db.tempo
+        inicio = time.perf_counter()
+        erro = None
+        try: acao(at)
+        except Exception as e: erro = f"{type(e).__name__}: {e}"
+        ms = (time.perf_counter() - inicio) * 1000
+        if erro is None and len(at.exception): erro = at.exception[0].message
+        r = dict(meta, cenario=cenario, rerun_ms=round(ms, 1), db_ms=round((db.tempo - t_db0) * 1000, 1),
+                 consultas=db.requisicoes - req0, erro=erro)
+        self.resultados.append(r)
+        return r
+
+def login(email):
+    def acao(at):
+        at.text_input[0].input(email)
+        at.text_input[1].input(SENHA)
+        at.button[0].click().run()
+    return acao
+
+def vai_para(aba):
+    return lambda at: at.radio(key="aba_ativa").set_value(aba).run()
+
+def rerun(at):
+    at.run()
+
+def _botao(at, prefixo=None, rotulo=None):
+    for b in at.button:
+        if prefixo and (b.key or '').startswith(prefixo): return b
+        if rotulo and rotulo in (b.label or ''): return b
+    raise LookupError(prefixo or rotulo)
+
+def paga_card(at):
+    _botao(at, prefixo='pay_').click().run()
+
+def envia_mensagem(at):
+    at.chat_input[0].set_value("Mensagem do benchmark").run()
+
+def dispara_campanha(at):
+    at.multiselect[0].set_value(['vip']).run()
+    at.text_area[0].input("Promoção do benchmark")
+    _botao(at, rotulo="Enviar Campanha").click().run()
+
+# ==============================================================================
+# CENÁRIOS
+# ==============================================================================
+
+def roda_inquilino(med, rotulo, c_id, repeticoes):
+    meta = {'inquilino': rotulo, 'cliente_id': c_id}
+    at = nova_sessao()
+    med.mede(at, 'abrir', rerun, **meta)
+    limpa_cache(c_id)
+    med.mede(at, 'login', login(email_de(c_id)), **meta)
+
+    for aba in ABAS:
+        limpa_cache(c_id)
+        med.mede(at, f"aba:{aba}:frio", vai_para(aba), **meta)
+        for _ in range(repeticoes): med.mede(at, f"aba:{aba}:quente", rerun, **meta)
+
+    med.mede(at, 'aba:💰 Funil', vai_para(ABAS[0]), **meta)
+    med.mede(at, 'acao:pagar_card', paga_card, **meta)
+    med.mede(at, 'aba:💬 Inbox', vai_para(ABAS[1]), **meta)
+    med.mede(at, 'acao:enviar_mensagem', envia_mensagem, **meta)
+    med.mede(at, 'aba:📢 Disparos', vai_para(ABAS[2]), **meta)
+    med.mede(at, 'acao:disparar_campanha', dispara_campanha, **meta)
+    _cancela_campanhas(c_id)
+
+def roda_admin(med, inquilinos, repeticoes):
+    at = nova_sessao()
+    at.run()
+    med.mede(at, 'login_admin', login('admin@bench.local'), inquilino='admin')
+    for _ in range(repeticoes):
+        for rotulo, c_id in inquilinos.items():
+            med.mede(at, 'acao:trocar_inquilino', lambda a, c=c_id: a.selectbox(key="cli_selector").set_value(c).run(),
+                     inquilino=rotulo, cliente_id=c_id)
+
+def para_disparos(timeout=120):
+    """Para o DispatchEngine e espera o lote em andamento com a Z-API falsa ainda de pé;
+    sem isso o pool de envio segura o processo (e a taxa cai ao piso com a Z-API fora)"""
+    import campaigns
+    engine = campaigns.get_engine()
+    engine.stop()
+    for t in list(engine._jobs.values()): t.join(timeout)
+
+def _cancela_campanhas(c_id):
+    """O benchmark mede o enfileiramento; o worker não deve seguir enviando entre cenários"""
+    import campaigns
+    for camp in campaigns.get_active(c_id): campaigns.cancel(camp['id'])
+
+# ==============================================================================
+# RELATÓRIO
+# ==============================================================================
+
+def agrega(resultados):
+    grupos = {}
+    for r in resultados: grupos.setdefault((r['inquilino'], r['cenario']), []).append(r)
+    out = []
+    for (inq, cen), rs in grupos.items():
+        ms = [r['rerun_ms'] for r in rs]
+        out.append({'inquilino': inq, 'cenario': cen, 'n': len(rs), 'p50_ms': round(statistics.median(ms), 1),
+                    'max_ms': round(max(ms), 1), 'db_ms': round(statistics.median(r['db_ms'] for r in rs), 1),
+                    'consultas': round(statistics.median(r['consultas'] for r in rs), 1),
+                    'erros': [r['erro'] for r in rs if r['erro']]})
+    return out
+
+def compara(atual, anterior, limiar=0.15):
+    """Imprime p50 lado a lado; marca regressões acima de `limiar`"""
+    base = {(r['inquilino'], r['cenario']): r for r in anterior.get('resumo', [])}
+    print(f"{'inquilino':<8} {'cenário':<32} {'antes':>9} {'agora':>9} {'Δ':>7}")
+    for r in atual['resumo']:
+        b = base.get((r['inquilino'], r['cenario']))
+        if not b: continue
+        delta = (r['p50_ms'] - b['p50_ms']) / b['p50_ms'] if b['p50_ms'] else 0
+        marca = '  ⚠️' if delta > limiar else ''
+        print(f"{r['inquilino']:<8} {r['cenario']:<32} {b['p50_ms']:>9.1f} {r['p50_ms']:>9.1f} {delta:>+6.0%}{marca}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--tamanhos', default='1k,10k,100k')
+    ap.add_argument('--repeticoes', type=int, default=3)
+    ap.add_argument('--latencia', type=float, default=0.0, help="atraso por consulta no banco falso (s)")
+    ap.add_argument('--saida', default=os.path.join(BENCH, 'resultados.json'))
+    ap.add_argument('--comparar', help="JSON de uma rodada anterior")
+    args = ap.parse_args(argv)
+
+    tamanhos = tuple(t.strip() for t in args.tamanhos.split(',') if t.strip())
+    client, inquilinos, zapi_fake = prepara_ambiente(tamanhos, args.latencia)
+    med = Medidor(client)
+    try:
+        for rotulo, c_id in inquilinos.items():
+            print(f"· inquilino {rotulo} (id {c_id})", flush=True)
+            roda_inquilino(med, rotulo, c_id, args.repeticoes)
+        print("· admin", flush=True)
+        roda_admin(med, inquilinos, args.repeticoes)
+    finally:
+        para_disparos()
+        zapi_fake.stop()
+
+    saida = {
+        'meta': {'quando': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'tamanhos': tamanhos, 'repeticoes': args.repeticoes, 'latencia_db_s': args.latencia},
+        'resumo': agrega(med.resultados),
+        'medicoes': med.resultados,
+    }
+    with open(args.saida, 'w', encoding='utf-8') as f: json.dump(saida, f, ensure_ascii=False, indent=1)
+    print(f"→ {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f: compara(saida, json.load(f))
+    return saida
+
+if __name__ == '__main__':
+    main()
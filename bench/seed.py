@@ -0,0 +1,125 @@
+import random
+from datetime import datetime, timedelta, timezone
+from fake_supabase import FakeDB, FakeClient, instala_esquema
+
+# ==============================================================================
+# INQUILINOS SINTÉTICOS
+# ------------------------------------------------------------------------------
+# Cada inquilino recebe `tamanho` agendamentos (metade serviço, metade salão) e
+# `tamanho` mensagens, espalhados por ~1 contato a cada 10 linhas e pelos
+# últimos DIAS dias. Semente fixa: a mesma chamada gera o mesmo banco, então
+# duas rodadas do benchmark medem o mesmo trabalho.
+# As tabelas derivadas (conversas_resumo, receita_diaria) são montadas no fim,
+# como a carga inicial das migrações, em vez de linha a linha pelos triggers.
+# ==============================================================================
+
+TAMANHOS = {'1k': 1_000, '10k': 10_000, '100k': 100_000}
+DIAS = 180
+PRODUTOS_POR_INQUILINO = 20
+SENHA = 'bench'
+
+STATUS = ['Pendente', 'Confirmado', 'Cancelado', 'Concluído', 'Faltou', None]
+PESOS_STATUS = [30, 35, 15, 12, 3, 5]
+TAGS = ['vip', 'lead', 'recorrente', 'inativo', 'aniversario', 'promo']
+
+def email_de(c_id):
+    return f"inquilino{c_id}@bench.local"
+
+def _ts(base, rng):
+    return (base - timedelta(seconds=rng.randint(0, DIAS * 86400))).isoformat()
+
+def seed(db, tamanhos=('1k', '10k', '100k'), seed=42):
+    """Cria um inquilino por tamanho + um admin; devolve {rotulo: cliente_id}"""
+    rng = random.Random(seed)
+    agora = datetime.now(timezone.utc)
+    inquilinos = {}
+
+    db.insert('acesso_painel', [{'email': 'admin@bench.local', 'senha': SENHA, 'nome_usuario': 'Admin Bench', 'perfil': 'admin', 'cliente_id': None}], dispara=False)
+
+    for rotulo in tamanhos:
+        n = TAMANHOS[rotulo] if rotulo in TAMANHOS else int(rotulo)
+        rotulo = str(rotulo)
+        if rotulo in inquilinos: rotulo = f"{rotulo}-{len(inquilinos) + 1}"  # vários do mesmo tamanho (bench/load.py)
+        c_id = db.insert('clientes', [{
+            'nome_empresa': f"Bench {rotulo}", 'whatsapp_id': f"55119{rng.randint(10**7, 10**8 - 1)}",
+            'ativo': True, 'bot_pausado': False, 'prompt_full': 'Você é a Otti.',
+            'id_instance': f"inst-{rotulo}", 'zapi_token': f"tok-{rotulo}", 'client_token': f"cli-{rotulo}",
+            'config_fluxo': {'modo_equipe': False, 'temperature': 0.5, 'horario_inicio': '08:00', 'horario_fim': '18:00'},
+            'config_versao': 1,
+        }], dispara=False)[0]['id']
+        inquilinos[rotulo] = c_id
+
+        db.insert('acesso_painel', [{'email': email_de(c_id), 'senha': SENHA, 'nome_usuario': f"Atendente {rotulo}", 'perfil': 'user', 'cliente_id': c_id}], dispara=False)
+
+        produtos = db.insert('produtos', [{
+            'cliente_id': c_id, 'nome': f"Produto {i + 1:02d}", 'categoria': rng.choice(['Kit', 'Serviço', 'Salão']), 'ativo': True,
+            'regras_preco': {'preco_padrao': rng.choice([90, 150, 250, 400]), 'valor_sinal': rng.choice([0, 30, 50])},
+        } for i in range(PRODUTOS_POR_INQUILINO)], dispara=False)
+        ids_prod = [p['id'] for p in produtos]
+
+        contatos = [f"55{rng.randint(11, 99)}9{rng.randint(10**7, 10**8 - 1)}" for _ in range(max(10, n // 10))]
+
+        for tabela, col_prod, col_data in (('agendamentos', 'servico_id', 'data_hora_inicio'), ('agendamentos_salao', 'produto_salao_id', 'data_reserva')):
+            rows = []
+            for _ in range(n // 2):
+                criado = _ts(agora, rng)
+                valor = float(rng.choice([90, 150, 250, 400]))
+                rows.append({
+                    'cliente_id': c_id, 'created_at': criado, 'cliente_final_waid': rng.choice(contatos),
+                    'status': rng.choices(STATUS, PESOS_STATUS)[0], 'valor_total_registrado': valor,
+                    'valor_sinal_registrado': valor * 0.3, col_prod: rng.choice(ids_prod + [None]),
+                    col_data: (datetime.fromisoformat(criado) + timedelta(days=rng.randint(0, 30))).isoformat() if col_data == 'data_hora_inicio'
+                              else (datetime.fromisoformat(criado) + timedelta(days=rng.randint(0, 30))).date().isoformat(),
+                })
+            db.insert(tabela, rows, dispara=False)
+
+        mensagens = []
+        for _ in range(n):
+            mensagens.append({'cliente_id': c_id, 'wa_id': rng.choice(contatos), 'role': rng.choice(['user', 'assistant']),
+                              'content': rng.choice(['Oi, tudo bem?', 'Quero um orçamento', 'Qual o valor do kit?', 'Pode ser sábado?', 'Obrigado!']),
+                              'created_at': _ts(agora, rng)})
+        db.insert('historico_mensagens', mensagens, dispara=False)
+
+        db.insert('crm_clientes_finais', [{
+            'cliente_id': c_id, 'wa_id': wa, 'nome': f"Contato {i}" if i % 3 else None, 'atendente_atual': None,
+            'tags': rng.sample(TAGS, rng.randint(0, 3)), 'notas': '',
+        } for i, wa in enumerate(contatos)], dispara=False)
+
+        db.insert('crm_tarefas', [{
+            'cliente_id': c_id, 'titulo': f"Retornar contato {i}", 'concluido': False,
+            'data_vencimento': (agora + timedelta(days=i)).date().isoformat(),
+        } for i in range(5)], dispara=False)
+
+    carga_inicial(db)
+    return inquilinos
+
+def carga_inicial(db):
+    """conversas_resumo e receita_diaria a partir das tabelas base (sql/002 e sql/005)"""
+    conversas = {}
+    for m in sorted(db.rows('historico_mensagens'), key=lambda m: m['created_at']):
+        c = conversas.setdefault((m['cliente_id'], m['wa_id']), {'cliente_id': m['cliente_id'], 'wa_id': m['wa_id'], 'qtd_mensagens': 0})
+        c.update(ultima_mensagem_em=m['created_at'], ultimo_trecho=(m.get('content') or '')[:120], ultimo_role=m.get('role'))
+        c['qtd_mensagens'] += 1
+    for tabela in ('agendamentos', 'agendamentos_salao'):
+        for r in db.rows(tabela):
+            k = (r['cliente_id'], r['cliente_final_waid'])
+            if k not in conversas:
+                conversas[k] = {'cliente_id': k[0], 'wa_id': k[1], 'ultima_mensagem_em': r['created_at'], 'ultimo_trecho': None, 'ultimo_role': None, 'qtd_mensagens': 0}
+            elif conversas[k]['qtd_mensagens'] == 0:
+                conversas[k]['ultima_mensagem_em'] = max(conversas[k]['ultima_mensagem_em'], r['created_at'])
+    db.insert('conversas_resumo', list(conversas.values()), dispara=False)
+
+    receita = {}
+    for tabela, tipo, col_prod in (('agendamentos', 'servico', 'servico_id'), ('agendamentos_salao', 'salao', 'produto_salao_id')):
+        for r in db.rows(tabela):
+            k = (r['cliente_id'], r['created_at'][:10], tipo, r.get(col_prod) or 0, r.get('status') or '')
+            t = receita.setdefault(k, {'cliente_id': k[0], 'dia': k[1], 'tipo': tipo, 'produto_id': k[3], 'status': k[4], 'qtd': 0, 'valor': 0.0})
+            t['qtd'] += 1
+            t['valor'] += float(r.get('valor_sinal_registrado') or 0)
+    db.insert('receita_diaria', list(receita.values()), dispara=False)
+
+def novo_banco(tamanhos=('1k', '10k', '100k'), latencia=0.0, seed_=42):
+    """(FakeClient, {rotulo: cliente_id}) prontos para services.supabase"""
+    db = instala_esquema(FakeDB(latencia=latencia))
+    inquilinos = seed(db, tamanhos, seed_)
+    return FakeClient(db), inquilinos
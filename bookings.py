@@ -0,0 +1,74 @@
+import pandas as pd
+import numpy as np
+
+# ==============================================================================
+# NORMALIZAÇÃO DE AGENDAMENTOS (FUNIL, ANALYTICS E AGENDA)
+# ------------------------------------------------------------------------------
+# agendamentos (serviço) e agendamentos_salao (salão) chegam com nomes de coluna
+# diferentes. Tudo passa por aqui e sai num DataFrame tipado único, montado de
+# forma vetorizada (nada de to_datetime/strftime/dict.get linha a linha):
+#   id, tipo, cliente, status, valor, qtd, produto_id, produto, data, dia
+# tipo/status/produto são categóricos; data é datetime (UTC, sem fuso); dia é a
+# data do calendário usada por todas as abas.
+# ==============================================================================
+
+COLUNAS = ['id', 'tipo', 'cliente', 'status', 'valor', 'qtd', 'produto_id', 'produto', 'data', 'dia']
+
+# Renomeação de cada tabela para o esquema comum
+_RENOMEIA = {
+    'servico': {'servico_id': 'produto_id', 'data_hora_inicio': 'data', 'cliente_final_waid': 'cliente', 'valor_total_registrado': 'valor'},
+    'salao': {'produto_salao_id': 'produto_id', 'data_reserva': 'data', 'cliente_final_waid': 'cliente', 'valor_total_registrado': 'valor'},
+}
+ROTULO_SEM_PRODUTO = {'servico': 'Serviço', 'salao': 'Salão'}
+
+def vazio():
+    return _tipar(pd.DataFrame(columns=COLUNAS), {})
+
+def from_tables(rows_servico, rows_salao, map_produtos, valor_col='valor_total_registrado'):
+    """Linhas cruas das duas tabelas -> DataFrame normalizado"""
+    partes = []
+    for tipo, rows in (('servico', rows_servico), ('salao', rows_salao)):
+        if not rows: continue
+        ren = dict(_RENOMEIA[tipo])
+        if valor_col != 'valor_total_registrado':
+            ren.pop('valor_total_registrado'); ren[valor_col] = 'valor'
+        df = pd.DataFrame.from_records(rows).rename(columns=ren)
+        df['tipo'] = tipo
+        partes.append(df)
+    if not partes: return vazio()
+    return _tipar(pd.concat(partes, ignore_index=True), map_produtos)
+
+def from_unified(rows, map_produtos, data_col='data'):
+    """Linhas já no esquema comum (view funil_leads, rollup receita_diaria)"""
+    if not rows: return vazio()
+    df = pd.DataFrame.from_records(rows)
+    if data_col != 'data': df = df.rename(columns={data_col: 'data'})
+    if 'cliente_final_waid' in df: df = df.rename(columns={'cliente_final_waid': 'cliente'})
+    return _tipar(df, map_produtos)
+
+def _tipar(df, map_produtos):
+    for col in COLUNAS:
+        if col not in df: df[col] = np.nan
+
+    df['tipo'] = df['tipo'].astype('category')
+    df['status'] = df['status'].fillna('Pendente').astype('category')
+    df['cliente'] = df['cliente'].fillna('Sem Número').replace('', 'Sem Número')
+    df['valor'] = pd.to_numeric(df['valor'], errors='coerce').fillna(0.0).astype(float)
+    df['qtd'] = pd.to_numeric(df['qtd'], errors='coerce').fillna(1).astype(int)
+    df['produto_id'] = pd.to_numeric(df['produto_id'], errors='coerce').astype('Int64')
+
+    # Nome do produto: map vetorizado, com rótulo por tipo quando não há vínculo.
+    # Produto apagado (id fora do mapa) vira produto_id 0, como em receita_diaria:
+    # rótulo e id dizem a mesma coisa para quem filtra por um ou por outro
+    nomes = df['produto_id'].map(map_produtos) if map_produtos else pd.Series(np.nan, index=df.index, dtype=object)
+    df['produto_id'] = df['produto_id'].mask(nomes.isna(), 0)
+    df['produto'] = nomes.fillna(df['tipo'].astype(str).map(ROTULO_SEM_PRODUTO)).astype('category')
+
+    df['data'] = pd.to_datetime(df['data'], format='mixed', utc=True, errors='coerce').dt.tz_localize(None)
+    df['dia'] = df['data'].dt.date
+    return df[COLUNAS + [c for c in df.columns if c not in COLUNAS]]
+
+def fmt_data(df, servico='%d/%m %H:%M', salao='%d/%m/%Y'):
+    """Data de exibição: serviço com hora, salão só o dia"""
+    if df.empty: return pd.Series([], dtype=object)
+    return pd.Series(np.where(df['tipo'] == 'servico', df['data'].dt.strftime(servico), df['data'].dt.strftime(salao)), index=df.index).fillna('--')
@@ -0,0 +1,130 @@
+import streamlit as st
+import time
+import threading
+import functools
+import pandas as pd
+from collections import OrderedDict
+
+# ==============================================================================
+# CACHE POR INQUILINO E DOMÍNIO
+# ------------------------------------------------------------------------------
+# Substitui st.cache_data (cujo clear() apaga tudo de todos os inquilinos) por
+# entradas com chave (cliente_id, domínio, função+args). Cada escrita invalida só
+# o par (cliente_id, domínio) que afetou. Uma carga por chave de cada vez
+# (single-flight): sessões simultâneas esperam a mesma ida ao banco em vez de
+# dispararem N consultas iguais com o cache frio. O processo vive muito: o total
+# de entradas é limitado (MAX_ENTRADAS, LRU) e as vencidas não ficam para trás.
+# A mesma entrada atende todas as sessões do inquilino: quem lê recebe uma cópia
+# do que é mutável (DataFrame, list, dict), nunca o objeto guardado.
+# cliente_id None = dados globais (ex.: lista de inquilinos do admin).
+# ==============================================================================
+
+DOMINIOS = ('kpis', 'bookings', 'products', 'config', 'crm')
+
+TTL = {
+    'kpis': 60,
+    'bookings': 30,
+    'products': 300,
+    'config': 300,
+    'crm': 30,
+}
+
+MAX_ENTRADAS = 2000  # por processo; acima disso sai a usada há mais tempo (LRU)
+PODA_A_CADA = 200    # gravações entre varreduras de entradas vencidas
+
+class TenantCache:
+    """TTL por (cliente_id, domínio); invalidação cirúrgica; uma carga por chave;
+    tamanho limitado (vencidas saem na leitura e em varreduras, o resto por LRU)"""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS, relogio=time.monotonic):
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # (c_id, dominio, chave) -> (expira_em, valor), da menos para a mais usada
+        self._loading = {}   # (c_id, dominio, chave) -> threading.Event
+        self._gen = {}       # (c_id, dominio) -> geração (descarta carga que cruzou uma invalidação)
+        self.max_entradas = max_entradas
+        self._relogio = relogio
+        self._gravacoes = 0
+
+    def get_or_load(self, c_id, dominio, chave, loader, ttl=None):
+        ns = (c_id, dominio)
+        k = ns + (chave,)
+        while True:
+            with self._lock:
+                hit = self._data.get(k)
+                if hit:
+                    if hit[0] > self._relogio():
+                        self._data.move_to_end(k)
+                        return _copia(hit[1])
+                    del self._data[k]
+                flight = self._loading.get(k)
+                if flight is None:
+                    flight = self._loading[k] = threading.Event()
+                    gen = self._gen.get(ns, 0)
+                    break
+            flight.wait(30)  # outra sessão está carregando esta chave
+
+        try:
+            valor = loader()
+            with self._lock:
+                if self._gen.get(ns, 0) == gen:
+                    self._data[k] = (self._relogio() + (ttl or TTL.get(dominio, 60)), valor)
+                    self._data.move_to_end(k)
+                    self._poda()
+            return _copia(valor)
+        finally:
+            with self._lock: self._loading.pop(k, None)
+            flight.set()
+
+    def _poda(self):
+        """Com o lock: tira as vencidas de tempos em tempos e corta pelo LRU"""
+        self._gravacoes += 1
+        if self._gravacoes >= PODA_A_CADA or len(self._data) > self.max_entradas:
+            self._gravacoes = 0
+            agora = self._relogio()
+            for k in [k for k, (expira, _) in self._data.items() if expira <= agora]: del self._data[k]
+        while len(self._data) > self.max_entradas: self._data.popitem(last=False)
+
+    def invalidate(self, c_id, *dominios):
+        """Sem domínios: tudo do inquilino"""
+        with self._lock:
+            alvos = [k for k in self._data if k[0] == c_id and (not dominios or k[1] in dominios)]
+            for d in (dominios or DOMINIOS): self._gen[(c_id, d)] = self._gen.get((c_id, d), 0) + 1
+            for k in alvos: del self._data[k]
+
+    def stats(self):
+        with self._lock:
+            out = {}
+            for c, d, _ in self._data: out[f"{c}:{d}"] = out.get(f"{c}:{d}", 0) + 1
+            return out
+
+_MUTAVEIS = (dict, list, tuple, set, pd.DataFrame, pd.Series)
+
+def _copia(valor):
+    """Cópia do que é mutável; str, números e dataclasses frozen (TenantConfig) voltam como estão"""
+    if isinstance(valor, (pd.DataFrame, pd.Series)): return valor.copy()
+    if isinstance(valor, dict): return {k: _copia(v) if isinstance(v, _MUTAVEIS) else v for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        out = [_copia(v) if isinstance(v, _MUTAVEIS) else v for v in valor]
+        return out if isinstance(valor, list) else tuple(out)
+    if isinstance(valor, set): return set(valor)
+    return valor
+
+@st.cache_resource
+def get_cache():
+    """Um cache por processo, compartilhado entre sessões"""
+    return TenantCache()
+
+def tenant_cached(dominio, ttl=None):
+    """Decora funções cujo primeiro argumento é o cliente_id"""
+    def deco(func):
+        @functools.wraps(func)
+        def wrapper(c_id, *args, **kwargs):
+            chave = (func.__name__, args, tuple(sorted(kwargs.items())))
+            return get_cache().get_or_load(c_id, dominio, chave, lambda: func(c_id, *args, **kwargs), ttl)
+        return wrapper
+    return deco
+
+def invalidate(c_id, *dominios):
+    """Invalida (cliente_id, domínio). Os globais (None) só saem quando pedidos
+    explicitamente: a escrita de um inquilino não derruba o cache dos outros"""
+    get_cache().invalidate(c_id, *dominios)
@@ -0,0 +1,276 @@
+import streamlit as st
+import os
+import time
+import uuid
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import services
+import zapi
+import settings
+
+# ==============================================================================
+# MOTOR DE DISPAROS EM SEGUNDO PLANO
+# ------------------------------------------------------------------------------
+# A aba Disparos só enfileira: cria a campanha ('preparando' até o público estar
+# gravado, depois 'na_fila') e uma linha por destinatário em crm_campanhas_envios.
+# Um worker por processo reivindica jobs com lease, envia com taxa/concorrência
+# configuráveis e grava o status de cada destinatário. Se o processo cair, o
+# lease expira e o job é retomado a partir dos destinatários ainda 'pendente'
+# (entrega "pelo menos uma vez").
+# ==============================================================================
+
+TAXA_PADRAO = int(settings.secret("CAMPANHA_TAXA_POR_MINUTO", 30))
+CONCORRENCIA_PADRAO = int(settings.secret("CAMPANHA_CONCORRENCIA", 2))
+TAXA_MAXIMA = 120
+CONCORRENCIA_MAXIMA = 8
+
+STATUS_ATIVOS = ['na_fila', 'enviando']
+LEASE_SEGUNDOS = 120
+LOTE_MAXIMO = 50        # destinatários por rodada (e por update em lote)
+
+def _agora():
+    return datetime.now(timezone.utc)
+
+def zapi_send_text(creds, phone, message):
+    """Envia um texto pela Z-API; levanta zapi.ZapiError em falha"""
+    return zapi.get_client().send_text(creds, phone, message)
+
+class _Pacer:
+    """Espaça envios de um job para respeitar a taxa por minuto entre todas as threads"""
+    def __init__(self, per_minute):
+        self.interval = 60.0 / max(1, per_minute)
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        if at > now: time.sleep(at - now)
+
+class DispatchEngine:
+    """Worker de campanhas: um supervisor + uma thread por job ativo"""
+
+    def __init__(self, client, sender=zapi_send_text, poll_interval=5.0):
+        self.client = client
+        self.sender = sender
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # --- CICLO DE VIDA ---
+    def start(self):
+        if self._thread and self._thread.is_alive(): return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="otti-campanhas", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set(); self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                for job in self._claimable_jobs():
+                    self._spawn(job)
+            except Exception:
+                pass  # banco fora do ar: tenta de novo no próximo ciclo
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    # --- REIVINDICAÇÃO (LEASE) ---
+    def _claimable_jobs(self):
+        now = _agora().isoformat()
+        res = self.client.table('crm_campanhas').select('id, cliente_id, mensagem_enviada, taxa_por_minuto, concorrencia, status, lease_ate') \
+            .in_('status', STATUS_ATIVOS).or_(f"lease_ate.is.null,lease_ate.lt.{now}").order('id').limit(20).execute()
+        with self._lock:
+            return [j for j in (res.data or []) if j['id'] not in self._jobs]
+
+    def _claim(self, job):
+        """Update condicional: só um worker vence a corrida pelo lease"""
+        now = _agora()
+        q = self.client.table('crm_campanhas').update({
+            'status': 'enviando', 'worker': self.worker_id,
+            'lease_ate': (now + timedelta(seconds=LEASE_SEGUNDOS)).isoformat()
+        }).eq('id', job['id']).in_('status', STATUS_ATIVOS)
+        if job.get('lease_ate'): q = q.eq('lease_ate', job['lease_ate'])
+        else: q = q.is_('lease_ate', 'null')
+        return bool(q.execute().data)
+
+    def _spawn(self, job):
+        if not self._claim(job): return
+        t = threading.Thread(target=self._run_job, args=(job,), name=f"otti-campanha-{job['id']}", daemon=True)
+        with self._lock: self._jobs[job['id']] = t
+        t.start()
+
+    # --- EXECUÇÃO DE UM JOB ---
+    def _run_job(self, job):
+        job_id = job['id']
+        try:
+            creds = self.client.table('clientes').select('id_instance, zapi_token, client_token').eq('id', job['cliente_id']).execute().data
+            creds = creds[0] if creds else {}
+            enviados, erros = self._count(job_id, 'enviado'), self._count(job_id, 'erro')
+
+            if not creds.get('id_instance') or not creds.get('zapi_token'):
+                falhas = self.client.table('crm_campanhas_envios').update({'status': 'erro', 'erro': 'Z-API não configurada'}) \
+                    .eq('campanha_id', job_id).eq('status', 'pendente').execute().data or []
+                self._finish(job_id, 'concluida', enviados, erros + len(falhas))
+                return
+
+            taxa = min(int(job.get('taxa_por_minuto') or TAXA_PADRAO), TAXA_MAXIMA)
+            conc = min(int(job.get('concorrencia') or CONCORRENCIA_PADRAO), CONCORRENCIA_MAXIMA)
+            pacer = _Pacer(taxa)  # teto da campanha; o da instância (todos os nós, sql/009) fica no zapi.Limitador
+            limitador = zapi.get_client().limitador
+
+            with ThreadPoolExecutor(max_workers=conc, thread_name_prefix=f"otti-envio-{job_id}") as pool:
+                while not self._stop.is_set():
+                    if self._cancelled(job_id): return
+                    # Cada rodada cabe em meio lease, mesmo com a instância desacelerada por 429
+                    efetiva = min(taxa, limitador.taxa_por_minuto(creds['id_instance']))
+                    lote_max = max(1, min(LOTE_MAXIMO, int(efetiva * LEASE_SEGUNDOS // 120)))
+                    lote = self.client.table('crm_campanhas_envios').select('id, wa_id, tentativas') \
+                        .eq('campanha_id', job_id).eq('status', 'pendente').order('id').limit(lote_max).execute().data
+                    if not lote: break
+
+                    resultados = list(pool.map(lambda d: self._send_one(creds, job['mensagem_enviada'], d, pacer), lote))
+                    enviados, erros, dono = self._persist(job_id, lote, resultados, enviados, erros)
+                    if not dono: return  # lease perdido (ou campanha cancelada): outro worker segue sem duplicar
+                else:
+                    return  # parada do processo: lease expira e outro worker retoma
+
+            self._finish(job_id, 'concluida', enviados, erros)
+        except Exception:
+            pass  # lease expira e o job é retomado no próximo ciclo
+        finally:
+            with self._lock: self._jobs.pop(job_id, None)
+
+    def _send_one(self, creds, message, dest, pacer):
+        """Devolve (None, tentativas) em sucesso ou (erro, tentativas); o backoff fica no cliente Z-API"""
+        pacer.wait()
+        try:
+            self.sender(creds, dest['wa_id'], message)
+            return None, 1
+        except zapi.ZapiError as e:
+            return str(e)[:300], e.tentativas
+        except Exception as e:
+            return str(e)[:300], 1
+
+    def _persist(self, job_id, lote, resultados, enviados, erros):
+        """Um update em lote para os enviados + um por mensagem de erro distinta.
+        Devolve (enviados, erros, dono): dono=False se o lease não foi renovado"""
+        ok_ids = [d['id'] for d, (err, _) in zip(lote, resultados) if err is None]
+        falhas = {}
+        for d, (err, tentativas) in zip(lote, resultados):
+            if err is not None: falhas.setdefault((err, tentativas), []).append(d['id'])
+
+        if ok_ids:
+            self.client.table('crm_campanhas_envios').update({'status': 'enviado', 'enviado_em': _agora().isoformat()}).in_('id', ok_ids).execute()
+        for (err, tentativas), ids in falhas.items():
+            self.client.table('crm_campanhas_envios').update({'status': 'erro', 'erro': err, 'tentativas': tentativas}).in_('id', ids).execute()
+
+        enviados += len(ok_ids)
+        erros += sum(len(ids) for ids in falhas.values())
+        renovado = self.client.table('crm_campanhas').update({
+            'qtd_enviados': enviados, 'qtd_erros': erros,
+            'lease_ate': (_agora() + timedelta(seconds=LEASE_SEGUNDOS)).isoformat()
+        }).eq('id', job_id).eq('worker', self.worker_id).in_('status', STATUS_ATIVOS).execute().data
+        return enviados, erros, bool(renovado)
+
+    def _count(self, job_id, status):
+        res = self.client.table('crm_campanhas_envios').select('id', count='exact').eq('campanha_id', job_id).eq('status', status).limit(1).execute()
+        return res.count or 0
+
+    def _cancelled(self, job_id):
+        res = self.client.table('crm_campanhas').select('status').eq('id', job_id).execute().data
+        return not res or res[0]['status'] == 'cancelada'
+
+    def _finish(self, job_id, status, enviados, erros):
+        self.client.table('crm_campanhas').update({
+            'status': status, 'qtd_enviados': enviados, 'qtd_erros': erros,
+            'lease_ate': None, 'finalizada_em': _agora().isoformat()
+        }).eq('id', job_id).eq('worker', self.worker_id).in_('status', STATUS_ATIVOS).execute()
+
+@st.cache_resource
+def get_engine():
+    """Um motor por processo; ao subir, retoma jobs órfãos de um restart"""
+    if not services.supabase: return None
+    return DispatchEngine(services.supabase).start()
+
+# --- API USADA PELA ABA DISPAROS ---
+
+def _cria_campanha(c_id, titulo, mensagem, qtd_alvos, filtros, status, taxa, concorrencia):
+    res = services.supabase.table('crm_campanhas').insert({
+        'cliente_id': c_id,
+        'titulo_campanha': titulo,
+        'mensagem_enviada': mensagem,
+        'qtd_alvos': qtd_alvos,
+        'filtros_usados': str(filtros),
+        'status': status,
+        'taxa_por_minuto': min(int(taxa), TAXA_MAXIMA),
+        'concorrencia': min(int(concorrencia), CONCORRENCIA_MAXIMA)
+    }).execute()
+    return res.data[0]['id']
+
+def _acorda():
+    engine = get_engine()
+    if engine: engine.wake()
+
+def enqueue(c_id, titulo, mensagem, wa_ids, filtros, taxa=TAXA_PADRAO, concorrencia=CONCORRENCIA_PADRAO):
+    """Persiste a campanha e seus destinatários e acorda o worker; devolve o id"""
+    unicos = list(dict.fromkeys(wa_ids))
+    camp_id = _cria_campanha(c_id, titulo, mensagem, len(unicos), filtros, 'preparando', taxa, concorrencia)
+    for i in range(0, len(unicos), 500):
+        services.supabase.table('crm_campanhas_envios').insert([
+            {'campanha_id': camp_id, 'cliente_id': c_id, 'wa_id': w} for w in unicos[i:i + 500]
+        ]).execute()
+    # Só vira 'na_fila' com todos os destinatários gravados: o worker nunca pega a campanha pela metade
+    services.supabase.table('crm_campanhas').update({'status': 'na_fila'}).eq('id', camp_id).eq('status', 'preparando').execute()
+    _acorda()
+    return camp_id
+
+def enqueue_por_tags(c_id, titulo, mensagem, tags, taxa=TAXA_PADRAO, concorrencia=CONCORRENCIA_PADRAO):
+    """Campanha para quem tem qualquer uma das etiquetas: o público é montado no
+    banco (campanha_publico, sql/006). Devolve (id, qtd de destinatários)"""
+    camp_id = _cria_campanha(c_id, titulo, mensagem, 0, list(tags), 'preparando', taxa, concorrencia)
+    qtd = services.supabase.rpc('campanha_publico', {
+        'p_campanha_id': camp_id, 'p_cliente_id': c_id, 'p_tags': list(tags)
+    }).execute().data
+    if qtd: _acorda()
+    return camp_id, int(qtd or 0)
+
+def duracao_estimada(qtd, taxa):
+    """Segundos para enviar qtd mensagens à taxa por minuto (sem contar falhas)"""
+    return qtd * 60.0 / max(1, min(int(taxa), TAXA_MAXIMA))
+
+def formata_duracao(segundos):
+    """'~45 s', '~12 min', '~3 h 20 min'"""
+    if segundos < 60: return f"~{int(round(segundos))} s"
+    minutos = int(round(segundos / 60))
+    if minutos < 60: return f"~{minutos} min"
+    return f"~{minutos // 60} h {minutos % 60:02d} min"
+
+def cancel(camp_id):
+    """Interrompe a campanha no próximo lote"""
+    services.supabase.table('crm_campanhas').update({'status': 'cancelada', 'lease_ate': None}).eq('id', camp_id).in_('status', STATUS_ATIVOS).execute()
+
+def get_progress(camp_id):
+    """Linha de progresso (status + contadores) para o polling da aba"""
+    res = services.supabase.table('crm_campanhas').select('id, titulo_campanha, status, qtd_alvos, qtd_enviados, qtd_erros, taxa_por_minuto') \
+        .eq('id', camp_id).execute().data
+    return res[0] if res else None
+
+def get_active(c_id):
+    """Campanhas do inquilino ainda na fila ou enviando (sobrevive a reload da página)"""
+    return services.supabase.table('crm_campanhas').select('id, titulo_campanha, status, qtd_alvos, qtd_enviados, qtd_erros, taxa_por_minuto') \
+        .eq('cliente_id', c_id).in_('status', STATUS_ATIVOS).order('id', desc=True).limit(5).execute().data or []
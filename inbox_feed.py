@@ -0,0 +1,61 @@
+import streamlit as st
+import threading
+from collections import deque
+from datetime import datetime, timezone
+import services
+import settings
+
+# ==============================================================================
+# FEED DE MENSAGENS NOVAS (INBOX AO VIVO)
+# ------------------------------------------------------------------------------
+# A Inbox pergunta ao feed "chegou algo para este inquilino desde <marca>?".
+# - PollingFeed: delta em conversas_resumo (mantida por trigger), uma consulta
+#   curta de índice por ciclo em vez de rerun completo do app.
+# - LocalPublisher: pub/sub em memória, para testes e desenvolvimento sem banco.
+# As duas devolvem [{'wa_id', 'ultima_mensagem_em'}] com marcas ISO-8601 (UTC).
+# ==============================================================================
+
+BACKEND = settings.secret("INBOX_LIVE_BACKEND", "poll")  # poll | local
+INTERVALO = float(settings.secret("INBOX_LIVE_INTERVALO", 3))  # segundos entre ciclos
+
+def agora():
+    return datetime.now(timezone.utc).isoformat()
+
+def _ts(value):
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+class PollingFeed:
+    """Delta no índice de conversas"""
+
+    def novidades(self, c_id, desde):
+        if not services.supabase: return []
+        return services.supabase.table('conversas_resumo').select('wa_id, ultima_mensagem_em') \
+            .eq('cliente_id', c_id).gt('ultima_mensagem_em', desde) \
+            .order('ultima_mensagem_em', desc=True).limit(50).execute().data or []
+
+    def publish(self, c_id, wa_id, ts=None):
+        pass  # o trigger de historico_mensagens já atualiza o índice
+
+class LocalPublisher:
+    """Publicador em memória (um por processo): publish() de um lado, novidades() do outro"""
+
+    def __init__(self, maxlen=1000):
+        self._lock = threading.Lock()
+        self._eventos = {}
+        self._maxlen = maxlen
+
+    def publish(self, c_id, wa_id, ts=None):
+        with self._lock:
+            fila = self._eventos.setdefault(c_id, deque(maxlen=self._maxlen))
+            fila.append({'wa_id': wa_id, 'ultima_mensagem_em': ts or agora()})
+
+    def novidades(self, c_id, desde):
+        limite = _ts(desde)
+        with self._lock:
+            eventos = list(self._eventos.get(c_id, ()))
+        return [e for e in reversed(eventos) if _ts(e['ultima_mensagem_em']) > limite]
+
+@st.cache_resource
+def get_feed():
+    """Feed do processo, escolhido por INBOX_LIVE_BACKEND"""
+    return LocalPublisher() if BACKEND == "local" else PollingFeed()
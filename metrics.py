@@ -0,0 +1,281 @@
+import streamlit as st
+import os
+import json
+import time
+import atexit
+import threading
+from collections import deque
+import settings
+
+# ==============================================================================
+# INSTRUMENTAÇÃO (BANCO, Z-API E RERUNS)
+# ------------------------------------------------------------------------------
+# - instrument(client) embrulha o cliente Supabase: toda cadeia
+#   table()/rpc()...execute() é cronometrada com tabela, operação, filtros
+#   (só nomes de coluna, nunca valores), linhas e bytes da resposta.
+# - zapi.py reporta cada tentativa de envio aqui.
+# - app.py chama inicio_rerun() / marca_aba() / fim_rerun() para o tempo total
+#   do rerun e da aba desenhada.
+# Tudo vai para um registro por processo (contadores + histogramas), exportável
+# em texto Prometheus e JSON lines; opcionalmente gravado em arquivo
+# (METRICAS_PROM_ARQUIVO, METRICAS_JSONL_ARQUIVO) p/ o coletor raspar, por uma
+# thread a cada METRICAS_FLUSH_SEGUNDOS: o worker de disparos, a Outbox e os
+# envios Z-API observam sem nenhum navegador fazendo rerun.
+# ==============================================================================
+
+ATIVO = str(settings.secret("METRICAS_ATIVAS", "1")) not in ("0", "false", "False")
+PROM_ARQUIVO = settings.secret("METRICAS_PROM_ARQUIVO", None)    # textfile collector do node_exporter
+JSONL_ARQUIVO = settings.secret("METRICAS_JSONL_ARQUIVO", None)
+FLUSH_SEGUNDOS = float(settings.secret("METRICAS_FLUSH_SEGUNDOS", 10))
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AMOSTRAS = 500          # latências guardadas por série (p50/p95 do painel)
+EVENTOS_MAX = 10000     # eventos recentes (download JSONL / pendentes de gravação)
+
+_RERUN_KEY = '_metricas_rerun'
+_ULTIMO_KEY = '_metricas_ultimo'
+
+OPERACOES = ('select', 'insert', 'update', 'upsert', 'delete')
+FILTROS = ('eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'like', 'ilike', 'is_', 'in_', 'contains',
+           'overlaps', 'or_', 'order', 'limit', 'range', 'not_')
+
+# --- REGISTRO DO PROCESSO ---
+class Registro:
+    """Séries (tipo, alvo, op) com contadores, histograma e amostras recentes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._eventos = deque(maxlen=EVENTOS_MAX)
+        self._ultimo_flush = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- GRAVAÇÃO EM SEGUNDO PLANO ---
+    def start(self):
+        """Sobe a thread que grava os arquivos; sem arquivo configurado não há o que fazer"""
+        if not (PROM_ARQUIVO or JSONL_ARQUIVO): return self
+        if self._thread and self._thread.is_alive(): return self
+        if self._thread is None: atexit.register(self.flush, forcar=True)  # o que chegou depois da última volta
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="otti-metricas", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(FLUSH_SEGUNDOS):
+            self.flush(forcar=True)
+
+    def observa(self, tipo, alvo, op, segundos, ok=True, linhas=0, bytes_=0, detalhe=None):
+        with self._lock:
+            s = self._series.get((tipo, alvo, op))
+            if s is None:
+                s = self._series[(tipo, alvo, op)] = {'n': 0, 'erros': 0, 'linhas': 0, 'bytes': 0, 'soma': 0.0,
+                                                      'buckets': [0] * len(BUCKETS), 'amostras': deque(maxlen=AMOSTRAS)}
+            s['n'] += 1
+            if not ok: s['erros'] += 1
+            s['linhas'] += linhas
+            s['bytes'] += bytes_
+            s['soma'] += segundos
+            for i, le in enumerate(BUCKETS):
+                if segundos <= le: s['buckets'][i] += 1
+            s['amostras'].append(segundos)
+            self._eventos.append({'ts': round(time.time(), 3), 'tipo': tipo, 'alvo': alvo, 'op': op,
+                                  'ms': round(segundos * 1000, 2), 'ok': ok, 'linhas': linhas,
+                                  'bytes': bytes_, 'detalhe': detalhe})
+
+    def resumo(self):
+        """[{tipo, alvo, op, chamadas, erros, linhas, bytes, p50_ms, p95_ms, total_ms}] por tempo total"""
+        with self._lock:
+            out = []
+            for (tipo, alvo, op), s in self._series.items():
+                lat = sorted(s['amostras'])
+                out.append({'tipo': tipo, 'alvo': alvo, 'op': op, 'chamadas': s['n'], 'erros': s['erros'],
+                            'linhas': s['linhas'], 'bytes': s['bytes'],
+                            'p50_ms': round(percentil(lat, 0.50) * 1000, 1),
+                            'p95_ms': round(percentil(lat, 0.95) * 1000, 1),
+                            'total_ms': round(s['soma'] * 1000, 1)})
+        return sorted(out, key=lambda r: -r['total_ms'])
+
+    def prometheus(self):
+        """Exposição em texto (formato 0.0.4): cada família com HELP/TYPE e todas as suas amostras juntas"""
+        with self._lock: series = {k: dict(v, buckets=list(v['buckets'])) for k, v in self._series.items()}
+        familias = {}  # nome -> (tipo prometheus, ajuda, [amostras])
+
+        def amostra(nome, tipo_prom, ajuda, linha):
+            familias.setdefault(nome, (tipo_prom, ajuda, []))[2].append(linha)
+
+        for (tipo, alvo, op), s in sorted(series.items()):
+            base = f'otti_{tipo}'
+            lbl = f'alvo="{_esc(alvo)}",op="{_esc(op)}"'
+            amostra(f'{base}_requests_total', 'counter', f'Chamadas ({tipo})', f'{base}_requests_total{{{lbl}}} {s["n"]}')
+            amostra(f'{base}_errors_total', 'counter', f'Chamadas com erro ({tipo})', f'{base}_errors_total{{{lbl}}} {s["erros"]}')
+            amostra(f'{base}_rows_total', 'counter', f'Linhas devolvidas ({tipo})', f'{base}_rows_total{{{lbl}}} {s["linhas"]}')
+            amostra(f'{base}_bytes_total', 'counter', f'Bytes de resposta ({tipo})', f'{base}_bytes_total{{{lbl}}} {s["bytes"]}')
+            hist, ajuda = f'{base}_duration_seconds', f'Duração em segundos ({tipo})'
+            for le, n in zip(BUCKETS, s['buckets']):
+                amostra(hist, 'histogram', ajuda, f'{hist}_bucket{{{lbl},le="{le}"}} {n}')
+            amostra(hist, 'histogram', ajuda, f'{hist}_bucket{{{lbl},le="+Inf"}} {s["n"]}')
+            amostra(hist, 'histogram', ajuda, f'{hist}_sum{{{lbl}}} {s["soma"]:.6f}')
+            amostra(hist, 'histogram', ajuda, f'{hist}_count{{{lbl}}} {s["n"]}')
+
+        linhas = []
+        for nome, (tipo_prom, ajuda, amostras) in sorted(familias.items()):
+            linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} {tipo_prom}'] + amostras
+        return '\n'.join(linhas) + '\n'
+
+    def jsonl(self, drenar=False):
+        """Eventos pendentes, um JSON por linha"""
+        with self._lock:
+            eventos = list(self._eventos)
+            if drenar: self._eventos.clear()
+        return ''.join(json.dumps(e, ensure_ascii=False, default=str) + '\n' for e in eventos)
+
+    def flush(self, forcar=False):
+        """Grava os arquivos configurados, no máximo a cada FLUSH_SEGUNDOS"""
+        if not (PROM_ARQUIVO or JSONL_ARQUIVO): return
+        with self._lock:
+            if not forcar and time.monotonic() - self._ultimo_flush < FLUSH_SEGUNDOS: return
+            self._ultimo_flush = time.monotonic()
+        try:
+            if PROM_ARQUIVO:
+                tmp = PROM_ARQUIVO + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f: f.write(self.prometheus())
+                os.replace(tmp, PROM_ARQUIVO)  # o coletor nunca lê arquivo pela metade
+            if JSONL_ARQUIVO:
+                eventos = self.jsonl(drenar=True)
+                if eventos:
+                    with open(JSONL_ARQUIVO, 'a', encoding='utf-8') as f: f.write(eventos)
+        except OSError: pass
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._eventos.clear()
+
+def percentil(ordenado, q):
+    """Valor no quantil q de uma lista já ordenada (0.0 se vazia)"""
+    if not ordenado: return 0.0
+    return ordenado[min(len(ordenado) - 1, int(q * len(ordenado)))]
+
+def _esc(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+@st.cache_resource
+def get_registro():
+    """Um registro por processo, compartilhado entre sessões e threads"""
+    return Registro().start()
+
+def observa(tipo, alvo, op, segundos, ok=True, linhas=0, bytes_=0, detalhe=None):
+    """Registra no processo e, se estiver num rerun de script, na lista do rerun"""
+    if not ATIVO: return
+    get_registro().observa(tipo, alvo, op, segundos, ok, linhas, bytes_, detalhe)
+    rerun = _rerun_atual()
+    if rerun is not None and tipo != 'rerun':
+        rerun['chamadas'].append({'tipo': tipo, 'alvo': alvo, 'op': op, 'ms': round(segundos * 1000, 1),
+                                  'linhas': linhas, 'bytes': bytes_, 'ok': ok, 'detalhe': detalhe})
+
+def _rerun_atual():
+    """Estado do rerun da sessão; None em threads de fundo (worker de disparos)"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        if get_script_run_ctx() is None: return None
+        return st.session_state.get(_RERUN_KEY)
+    except Exception:
+        return None
+
+# --- CLIENTE SUPABASE CRONOMETRADO ---
+class _Consulta:
+    """Embrulha um builder do postgrest acumulando op/filtros até o execute()"""
+    __slots__ = ('_alvo', '_tabela', '_op', '_filtros')
+
+    def __init__(self, alvo, tabela, op='select', filtros=()):
+        self._alvo, self._tabela, self._op, self._filtros = alvo, tabela, op, filtros
+
+    def __getattr__(self, nome):
+        attr = getattr(self._alvo, nome)
+        if nome == 'execute': return self._execute
+        if not callable(attr):
+            return _Consulta(attr, self._tabela, self._op, self._filtros + ('not',)) if hasattr(attr, 'execute') else attr
+
+        def chamada(*args, **kwargs):
+            res = attr(*args, **kwargs)
+            if not hasattr(res, 'execute'): return res
+            op = nome if nome in OPERACOES else self._op
+            filtros = self._filtros
+            if nome in FILTROS:
+                col = args[0] if args and isinstance(args[0], str) and nome not in ('or_', 'limit', 'range') else ''
+                filtros = filtros + (f"{nome.rstrip('_')}({col})" if col else nome.rstrip('_'),)
+            return _Consulta(res, self._tabela, op, filtros)
+        return chamada
+
+    def _execute(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        ok, linhas, tamanho = False, 0, 0
+        try:
+            res = self._alvo.execute(*args, **kwargs)
+            ok = True
+            data = getattr(res, 'data', None)
+            if isinstance(data, list): linhas = len(data)
+            elif data is not None: linhas = 1
+            if data is not None:
+                try: tamanho = len(json.dumps(data, default=str, separators=(',', ':')))
+                except (TypeError, ValueError): pass
+            return res
+        finally:
+            observa('db', self._tabela, self._op, time.perf_counter() - inicio, ok=ok, linhas=linhas,
+                    bytes_=tamanho, detalhe=','.join(self._filtros) or None)
+
+class _Cliente:
+    """Cliente Supabase com table()/from_()/rpc() cronometrados; o resto passa direto"""
+    __slots__ = ('_client',)
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, nome):
+        return _Consulta(self._client.table(nome), nome)
+
+    def from_(self, nome):
+        return _Consulta(self._client.from_(nome), nome)
+
+    def rpc(self, fn, params=None, *args, **kwargs):
+        return _Consulta(self._client.rpc(fn, params or {}, *args, **kwargs), f"rpc:{fn}", 'rpc')
+
+    def __getattr__(self, nome):
+        return getattr(self._client, nome)
+
+def instrument(client):
+    if client is None or not ATIVO: return client
+    return _Cliente(client)
+
+# --- RERUN / ABAS ---
+def inicio_rerun():
+    """Chamar no topo do app, uma vez por rerun completo"""
+    if not ATIVO: return
+    st.session_state[_RERUN_KEY] = {'t0': time.perf_counter(), 'aba': None, 't_aba': None, 'chamadas': []}
+
+def marca_aba(aba):
+    """Início do desenho da aba ativa (a aba é a última coisa do rerun)"""
+    rerun = st.session_state.get(_RERUN_KEY)
+    if rerun is not None: rerun['aba'], rerun['t_aba'] = aba, time.perf_counter()
+
+def fim_rerun():
+    """Fecha o rerun: registra total e aba; reruns interrompidos por st.rerun/st.stop não contam"""
+    rerun = st.session_state.pop(_RERUN_KEY, None)
+    if rerun is None: return
+    fim = time.perf_counter()
+    total = fim - rerun['t0']
+    observa('rerun', rerun['aba'] or '-', 'total', total)
+    if rerun['aba']: observa('rerun', rerun['aba'], 'aba', fim - rerun['t_aba'])
+    st.session_state[_ULTIMO_KEY] = {
+        'aba': rerun['aba'], 'total_ms': round(total * 1000, 1),
+        'aba_ms': round((fim - rerun['t_aba']) * 1000, 1) if rerun['aba'] else None,
+        'chamadas': rerun['chamadas'],
+    }
+
+def ultimo_rerun():
+    return st.session_state.get(_ULTIMO_KEY)
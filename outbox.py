@@ -0,0 +1,216 @@
+import streamlit as st
+import os
+import time
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import services
+import cache
+import inbox_feed
+import zapi
+import settings
+
+# ==============================================================================
+# CAIXA DE SAÍDA DA INBOX (ENVIO ASSÍNCRONO)
+# ------------------------------------------------------------------------------
+# A resposta do atendente é gravada primeiro num SQLite local (sobrevive a
+# restart) e aparece na hora no chat como "enviando". Uma thread por processo
+# entrega pela Z-API (com o limitador da instância), repete falhas temporárias
+# com backoff e marca enviado/falhou. As escritas no Supabase saem em lote:
+# um insert em historico_mensagens e um update de bot_pausado por rodada.
+# Credenciais não vão para o disco: o envio lê de clientes na hora.
+# ==============================================================================
+
+ARQUIVO = settings.secret("OUTBOX_ARQUIVO", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".otti_outbox.sqlite3"))
+TENTATIVAS = int(settings.secret("OUTBOX_TENTATIVAS", 5))
+CONCORRENCIA = 4
+LOTE = 20              # mensagens por rodada (e por insert no histórico)
+INTERVALO = 2.0        # segundos entre rodadas sem nada novo
+BACKOFF_BASE = 2.0     # segundos; dobra a cada falha
+BACKOFF_MAXIMO = 120.0
+GUARDA_DIAS = 7        # entregues e gravadas saem do SQLite depois disso
+
+ESQUEMA = """
+create table if not exists outbox (
+    id integer primary key autoincrement,
+    cliente_id integer not null,
+    wa_id text not null,
+    texto text not null,
+    autor text,
+    status text not null default 'pendente',  -- pendente | enviando | enviado | falhou
+    tentativas integer not null default 0,
+    erro text,
+    criado_em real not null,
+    proxima_em real not null,
+    enviado_em real,
+    gravado integer not null default 0         -- 1 = já está em historico_mensagens
+);
+create index if not exists outbox_fila on outbox (status, proxima_em);
+create index if not exists outbox_conversa on outbox (cliente_id, wa_id, gravado);
+"""
+
+def _backoff(tentativas):
+    return random.uniform(0.5, 1.0) * min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** (tentativas - 1))
+
+class Outbox:
+    """Fila local + thread de entrega; compartilhada pelas sessões do processo"""
+
+    def __init__(self, arquivo=ARQUIVO, sender=None, client=None):
+        self.arquivo = arquivo
+        self.sender = sender or (lambda creds, wa_id, texto: zapi.get_client().send_text(creds, wa_id, texto, interativo=True))
+        self.client = client
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = sqlite3.connect(arquivo, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("pragma journal_mode=wal")
+            self._conn.executescript(ESQUEMA)
+            # 'enviando' de um processo que caiu: a Z-API pode ter recebido; o atendente decide se reenvia
+            self._conn.execute("update outbox set status = 'falhou', erro = 'Interrompido antes da confirmação' where status = 'enviando'")
+
+    def _db(self, sql, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    @property
+    def supabase(self):
+        return self.client or services.supabase
+
+    # --- CICLO DE VIDA ---
+    def start(self):
+        if self._thread and self._thread.is_alive(): return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="otti-outbox", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set(); self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try: trabalhou = self._rodada()
+            except Exception: trabalhou = False  # banco/SQLite fora: tenta de novo no próximo ciclo
+            if not trabalhou:
+                self._wake.wait(INTERVALO)
+                self._wake.clear()
+
+    # --- API USADA PELA INBOX ---
+    def enqueue(self, c_id, wa_id, texto, autor=None):
+        """Grava a resposta e acorda o envio; devolve o id local (sem esperar a Z-API)"""
+        agora = time.time()
+        with self._lock:
+            cur = self._conn.execute("insert into outbox (cliente_id, wa_id, texto, autor, criado_em, proxima_em) values (?, ?, ?, ?, ?, ?)",
+                                     (c_id, wa_id, texto, autor, agora, agora))
+        self._wake.set()
+        return cur.lastrowid
+
+    def pendentes(self, c_id, wa_id=None):
+        """Mensagens ainda fora do histórico (enviando ou falhou), da mais antiga para a mais nova"""
+        sql = "select id, wa_id, texto, status, tentativas, erro, criado_em from outbox where cliente_id = ? and gravado = 0"
+        args = [c_id]
+        if wa_id is not None:
+            sql += " and wa_id = ?"
+            args.append(wa_id)
+        return [dict(r) for r in self._db(sql + " order by id", args)]
+
+    def reenviar(self, msg_id):
+        """Volta uma mensagem que falhou para a fila"""
+        self._db("update outbox set status = 'pendente', tentativas = 0, erro = null, proxima_em = ? where id = ? and status = 'falhou'", (time.time(), msg_id))
+        self._wake.set()
+
+    def descartar(self, msg_id):
+        self._db("delete from outbox where id = ? and status = 'falhou'", (msg_id,))
+
+    def stats(self):
+        """{status: qtd} das mensagens ainda não gravadas no histórico"""
+        return {r['status']: r['qtd'] for r in self._db("select status, count(*) as qtd from outbox where gravado = 0 group by status")}
+
+    # --- ENTREGA ---
+    def _reivindica(self):
+        """pendente -> enviando com update condicional (vários processos no mesmo arquivo).
+        Só a mais antiga de cada conversa: a ordem no WhatsApp é a ordem digitada"""
+        agora = time.time()
+        with self._lock:
+            livres = self._conn.execute("""
+                select * from outbox o
+                where status = 'pendente' and proxima_em <= ?
+                  and not exists (select 1 from outbox a where a.cliente_id = o.cliente_id and a.wa_id = o.wa_id
+                                  and a.id < o.id and a.status in ('pendente', 'enviando'))
+                order by id limit ?""", (agora, LOTE)).fetchall()
+            lote = []
+            for r in livres:
+                if self._conn.execute("update outbox set status = 'enviando' where id = ? and status = 'pendente'", (r['id'],)).rowcount:
+                    lote.append(dict(r))
+            return lote
+
+    def _credenciais(self, ids):
+        if not ids: return {}
+        rows = self.supabase.table('clientes').select('id, id_instance, zapi_token, client_token').in_('id', sorted(ids)).execute().data or []
+        return {r['id']: r for r in rows}
+
+    def _envia(self, msg, creds):
+        if not creds or not creds.get('id_instance') or not creds.get('zapi_token'):
+            return zapi.ZapiError("Z-API não configurada", repetivel=False)
+        try:
+            self.sender(creds, msg['wa_id'], msg['texto'])
+            return None
+        except zapi.ZapiError as e:
+            return e
+        except Exception as e:
+            return zapi.ZapiError(str(e)[:300])
+
+    def _rodada(self):
+        lote = self._reivindica()
+        if lote:
+            try: creds = self._credenciais({m['cliente_id'] for m in lote})
+            except Exception:
+                ids = [m['id'] for m in lote]
+                self._db(f"update outbox set status = 'pendente', proxima_em = ? where id in ({','.join('?' * len(ids))})", [time.time() + INTERVALO] + ids)
+                raise
+            with ThreadPoolExecutor(max_workers=CONCORRENCIA, thread_name_prefix="otti-outbox-envio") as pool:
+                erros = list(pool.map(lambda m: self._envia(m, creds.get(m['cliente_id'])), lote))
+            agora = time.time()
+            with self._lock:
+                for m, e in zip(lote, erros):
+                    if e is None:
+                        self._conn.execute("update outbox set status = 'enviado', enviado_em = ?, erro = null, tentativas = tentativas + 1 where id = ?", (agora, m['id']))
+                    elif e.repetivel and m['tentativas'] + 1 < TENTATIVAS:
+                        self._conn.execute("update outbox set status = 'pendente', tentativas = tentativas + 1, erro = ?, proxima_em = ? where id = ?",
+                                           (str(e)[:300], agora + _backoff(m['tentativas'] + 1), m['id']))
+                    else:
+                        self._conn.execute("update outbox set status = 'falhou', tentativas = tentativas + 1, erro = ? where id = ?", (str(e)[:300], m['id']))
+        self._grava()
+        return bool(lote)
+
+    def _grava(self):
+        """Entregues -> historico_mensagens + bot_pausado, uma escrita de cada por rodada"""
+        entregues = [dict(r) for r in self._db("select id, cliente_id, wa_id, texto from outbox where status = 'enviado' and gravado = 0 order by id limit 500")]
+        if not entregues: return
+        self.supabase.table('historico_mensagens').insert([
+            {'cliente_id': m['cliente_id'], 'wa_id': m['wa_id'], 'role': 'assistant', 'content': m['texto']} for m in entregues
+        ]).execute()
+        ids = [m['id'] for m in entregues]
+        self._db(f"update outbox set gravado = 1 where id in ({','.join('?' * len(ids))})", ids)
+        self._db("delete from outbox where gravado = 1 and enviado_em < ?", (time.time() - GUARDA_DIAS * 86400,))
+
+        # Atendente respondeu: pausa o bot (falhar aqui não pode duplicar o histórico acima)
+        c_ids = sorted({m['cliente_id'] for m in entregues})
+        try: self.supabase.table('clientes').update({'bot_pausado': True}).in_('id', c_ids).execute()
+        except: pass
+
+        feed = inbox_feed.get_feed()
+        for c_id in c_ids: cache.invalidate(c_id, 'config', 'kpis')  # cache do processo: sem session_state nesta thread
+        for c_id, wa_id in {(m['cliente_id'], m['wa_id']) for m in entregues}:
+            try: feed.publish(c_id, wa_id, datetime.now(timezone.utc).isoformat())
+            except: pass
+
+@st.cache_resource
+def get_outbox():
+    """Uma caixa de saída (e uma thread de entrega) por processo"""
+    return Outbox().start()
@@ -0,0 +1,171 @@
+import io
+import csv
+import re
+import json
+import unicodedata
+import pandas as pd
+
+# ==============================================================================
+# CATÁLOGO DE PRODUTOS: REGRAS DE PREÇO, IMPORTAÇÃO E EXPORTAÇÃO
+# ------------------------------------------------------------------------------
+# regras_preco é sempre montado por regras_preco() (formulários, importação e
+# services.create_product), com os mesmos tipos e a mesma duração padrão.
+# A importação lê CSV (vírgula ou ponto e vírgula, decimal BR ou US) ou XLSX
+# (openpyxl), valida todas as linhas antes de gravar e separa o que
+# é produto novo do que atualiza um existente (por id ou nome). A gravação em
+# lote fica em services.importa_produtos.
+# ==============================================================================
+
+CATEGORIAS = ["Serviço", "Produto", "Serviço Salão"]
+DURACAO_PADRAO = 60
+MAX_LINHAS = 20_000
+
+# Colunas do arquivo (modelo e exportação) e apelidos aceitos na importação
+COLUNAS_ARQUIVO = ['id', 'nome', 'categoria', 'preco', 'sinal', 'duracao_minutos', 'ativo']
+_APELIDOS = {
+    'produto': 'nome', 'servico': 'nome', 'descricao': 'nome',
+    'preco_padrao': 'preco', 'valor': 'preco', 'preco_r': 'preco',
+    'valor_sinal': 'sinal', 'sinal_r': 'sinal',
+    'duracao': 'duracao_minutos', 'minutos': 'duracao_minutos',
+}
+_VERDADEIRO = {'1', 'true', 'sim', 's', 'yes', 'y', 'x', 'ativo'}
+_FALSO = {'0', 'false', 'nao', 'n', 'no', 'inativo'}
+
+def parse_regras(valor):
+    """regras_preco cru (dict ou string JSON) -> dict"""
+    if isinstance(valor, str):
+        try: valor = json.loads(valor)
+        except ValueError: return {}
+    return dict(valor) if isinstance(valor, dict) else {}
+
+def regras_preco(preco, sinal=0.0, duracao=None, base=None):
+    """Único construtor de regras_preco; `base` preserva chaves extras e a duração de um
+    existente (duracao None = a de `base`, senão DURACAO_PADRAO)"""
+    regras = parse_regras(base)
+    regras.update({'preco_padrao': float(preco or 0), 'valor_sinal': float(sinal or 0),
+                   'duracao_minutos': int(duracao or regras.get('duracao_minutos') or DURACAO_PADRAO)})
+    return regras
+
+def _chave(texto):
+    """Cabeçalho/nome normalizado: minúsculo, sem acento, só [a-z0-9_]"""
+    t = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode().lower().strip()
+    return ''.join(ch if ch.isalnum() else '_' for ch in t).strip('_')
+
+# Formatos de número aceitos no arquivo. O ponto só é separador de milhar em
+# grupos de três dígitos ('1.500', '1.234,56'); sem vírgula e com 1-2 dígitos
+# depois ('150.5', '10.99') é decimal. Qualquer outra coisa ('1.2345',
+# '1.50,0') é ambígua e a linha volta como erro em vez de virar um preço errado.
+_NUM_BR = re.compile(r'-?\d{1,3}(\.\d{3})+(,\d+)?|-?\d+(,\d+)?')
+_NUM_MILHAR = re.compile(r'-?\d{1,3}(\.\d{3})+')
+_NUM_PONTO = re.compile(r'-?\d+(\.\d{1,2})?')
+
+def _numero(valor):
+    """'1.234,56', '1.500', 'R$ 90', '150.5', 90 -> float; vazio -> None; ambíguo/lixo -> ValueError"""
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)): return None
+    if isinstance(valor, (int, float)): return float(valor)  # célula numérica do XLSX
+    t = str(valor).replace('R$', '').replace(' ', '').replace('\xa0', '').strip()
+    if not t: return None
+    if ',' in t or _NUM_MILHAR.fullmatch(t):
+        if not _NUM_BR.fullmatch(t): raise ValueError(f"número inválido ou ambíguo: {valor}")
+        return float(t.replace('.', '').replace(',', '.'))
+    if not _NUM_PONTO.fullmatch(t): raise ValueError(f"número inválido ou ambíguo: {valor}")
+    return float(t)
+
+def _texto(valor):
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)): return ''
+    return str(valor).strip()
+
+# --- LEITURA ---
+def le_arquivo(nome, conteudo):
+    """Bytes de um .csv/.xlsx -> DataFrame de strings com cabeçalhos normalizados"""
+    if nome.lower().endswith(('.xlsx', '.xlsm')):
+        try: import openpyxl  # noqa: F401 (só o pandas usa; está no requirements.txt)
+        except ImportError: raise ValueError("Para importar .xlsx instale o openpyxl (ou salve a planilha como CSV).")
+        df = pd.read_excel(io.BytesIO(conteudo), engine='openpyxl')  # sem dtype=str: célula numérica chega como float, sem ambiguidade
+    else:
+        texto = conteudo.decode('utf-8-sig', errors='replace')
+        try: sep = csv.Sniffer().sniff(texto[:4096], delimiters=',;\t').delimiter
+        except csv.Error: sep = ','
+        df = pd.read_csv(io.StringIO(texto), sep=sep, dtype=str, keep_default_na=False)
+    df.columns = [_APELIDOS.get(_chave(c), _chave(c)) for c in df.columns]
+    if 'nome' not in df.columns: raise ValueError("O arquivo precisa de uma coluna 'nome'.")
+    if len(df) > MAX_LINHAS: raise ValueError(f"Máximo de {MAX_LINHAS} linhas por importação.")
+    return df
+
+# --- VALIDAÇÃO ---
+def valida(df, existentes):
+    """(novos, atualizacoes, erros). novos/atualizacoes já no formato da tabela
+    produtos; erros = [(linha da planilha, mensagem)]. `existentes` = get_produtos()"""
+    por_id = {p['id']: p for p in existentes}
+    por_nome = {_chave(p['nome']): p for p in existentes if p.get('nome')}
+    categorias = {_chave(c): c for c in CATEGORIAS}
+    novos, atualizacoes, erros, vistos = [], [], [], set()
+
+    for i, row in enumerate(df.to_dict('records'), start=2):  # linha 1 = cabeçalho
+        nome = _texto(row.get('nome'))
+        if not nome:
+            if any(_texto(v) for v in row.values()): erros.append((i, "Nome vazio"))
+            continue
+        if _chave(nome) in vistos:
+            erros.append((i, f"'{nome}' repetido no arquivo")); continue
+        vistos.add(_chave(nome))
+
+        cat_txt = _texto(row.get('categoria'))
+        categoria = categorias.get(_chave(cat_txt)) if cat_txt else CATEGORIAS[0]
+        if categoria is None:
+            erros.append((i, f"Categoria '{cat_txt}' inválida (use {', '.join(CATEGORIAS)})")); continue
+
+        try:
+            preco, sinal, duracao = _numero(row.get('preco')), _numero(row.get('sinal')), _numero(row.get('duracao_minutos'))
+        except ValueError as e:
+            erros.append((i, f"Preço, sinal e duração precisam ser números ({e})")); continue
+        if preco is None: preco = 0.0
+        if preco < 0 or (sinal or 0) < 0: erros.append((i, "Valores negativos")); continue
+        if (sinal or 0) > preco: erros.append((i, "Sinal maior que o preço")); continue
+        if duracao is not None and duracao <= 0: erros.append((i, "Duração precisa ser maior que zero")); continue
+
+        ativo_txt = _chave(_texto(row.get('ativo')))
+        if ativo_txt and ativo_txt not in _VERDADEIRO | _FALSO:
+            erros.append((i, f"Ativo '{row.get('ativo')}' inválido (sim/não)")); continue
+        ativo = ativo_txt not in _FALSO
+
+        id_txt = _texto(row.get('id'))
+        atual = None
+        if id_txt:
+            try: atual = por_id.get(int(float(id_txt)))
+            except ValueError: atual = None
+            if atual is None:
+                erros.append((i, f"id {id_txt} não é um produto deste catálogo")); continue
+        else:
+            atual = por_nome.get(_chave(nome))
+
+        base = atual.get('regras_preco') if atual else None
+        linha = {'nome': nome, 'categoria': categoria, 'ativo': ativo,
+                 'regras_preco': regras_preco(preco, sinal, duracao, base=base)}
+        if atual: atualizacoes.append(dict(linha, id=atual['id']))
+        else: novos.append(linha)
+    return novos, atualizacoes, erros
+
+# --- EXPORTAÇÃO ---
+def iter_csv(produtos, lote=500):
+    """CSV (';' e vírgula decimal, abre direto no Excel BR) em blocos de `lote` linhas"""
+    buf = io.StringIO()
+    w = csv.writer(buf, delimiter=';', lineterminator='\n')
+    buf.write('\ufeff')  # BOM: acentos certos no Excel
+    w.writerow(COLUNAS_ARQUIVO)
+    for n, p in enumerate(produtos, start=1):
+        r = parse_regras(p.get('regras_preco'))
+        w.writerow([p.get('id'), p.get('nome') or '', p.get('categoria') or '',
+                    f"{float(r.get('preco_padrao') or 0):.2f}".replace('.', ','),
+                    f"{float(r.get('valor_sinal') or 0):.2f}".replace('.', ','),
+                    r.get('duracao_minutos') or DURACAO_PADRAO, 'sim' if p.get('ativo', True) else 'não'])
+        if n % lote == 0:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0); buf.truncate()
+    if buf.tell(): yield buf.getvalue().encode('utf-8')
+
+def modelo_csv():
+    """Arquivo de exemplo para a importação"""
+    exemplo = [{'nome': 'Corte feminino', 'categoria': 'Serviço', 'regras_preco': regras_preco(90, 30, 60)},
+               {'nome': 'Kit festa', 'categoria': 'Produto', 'regras_preco': regras_preco(250, 50)}]
+    return b''.join(iter_csv(exemplo))
@@ -1,113 +1,608 @@
-import streamlit as st
-import pandas as pd
-from supabase import create_client
-import json
-
-# --- CONEXÃO ---
-@st.cache_resource
-def init_connection():
-    url = st.secrets.get("SUPABASE_URL")
-    key = st.secrets.get("SUPABASE_KEY")
-    if not url: return None
-    return create_client(url, key)
-
-supabase = init_connection()
-
-# --- LEITURA (CACHED) ---
-@st.cache_data(ttl=60)
-def get_kpis():
-    if not supabase: return pd.DataFrame()
-    return pd.DataFrame(supabase.table('view_dashboard_kpis').select("*").execute().data)
-
-@st.cache_data(ttl=60)
-def get_financial_data(c_id):
-    """Busca dados de agendamentos de salão e serviços gerais"""
-    try:
-        r_s = supabase.table('agendamentos_salao').select('created_at, valor_sinal_registrado, status, produto_salao_id, produtos:produto_salao_id(nome)').eq('cliente_id', c_id).execute().data
-        r_p = supabase.table('agendamentos').select('created_at, valor_sinal_registrado, status, servico_id').eq('cliente_id', c_id).execute().data
-        return r_s, r_p
-    except: return [], []
-
-def get_messages(c_id):
-    """Busca lista de conversas recentes (Sem cache para ser real-time)"""
-    return supabase.table('conversas').select('id, cliente_wa_id, updated_at, metadata').eq('cliente_id', c_id).order('updated_at', desc=True).limit(20).execute()
-
-def get_chat_history(conversa_id):
-    """Busca histórico de mensagens de uma conversa específica"""
-    return supabase.table('historico_mensagens').select('*').eq('conversa_id', conversa_id).order('created_at', desc=True).limit(40).execute()
-
-def get_products(c_id):
-    """Busca lista de produtos"""
-    return supabase.table('produtos').select('nome, categoria, ativo').eq('cliente_id', c_id).order('nome').execute()
-
-def get_agenda(c_id):
-    """Busca agenda futura"""
-    try:
-        rs = supabase.table('agendamentos_salao').select('data_reserva, valor_total_registrado, cliente_final_waid').eq('cliente_id', c_id).order('created_at', desc=True).limit(50).execute()
-        if rs.data: return pd.DataFrame(rs.data)
-        
-        rv = supabase.table('agendamentos').select('data_hora_inicio, valor_total_registrado').eq('cliente_id', c_id).order('created_at', desc=True).limit(50).execute()
-        if rv.data: return pd.DataFrame(rv.data)
-        
-        return pd.DataFrame()
-    except: return pd.DataFrame()
-
-# --- ESCRITA E LÓGICA COMPLEXA (SEM CACHE) ---
-
-def toggle_bot(c_id, current_status):
-    """Pausa ou Ativa o Bot"""
-    new_status = not current_status
-    supabase.table('clientes').update({'bot_pausado': new_status}).eq('id', c_id).execute()
-    st.cache_data.clear()
-
-def create_product(c_id, nome, categoria, preco):
-    """Cria novo produto formatando o JSON de regras corretamente"""
-    try:
-        # Lógica de negócio encapsulada aqui
-        regras_json = {"preco_padrao": float(preco), "duracao_minutos": 60}
-        
-        payload = {
-            "cliente_id": c_id,
-            "nome": nome,
-            "categoria": categoria,
-            "ativo": True,
-            "regras_preco": json.dumps(regras_json)
-        }
-        supabase.table('produtos').insert(payload).execute()
-        return True
-    except Exception as e:
-        st.error(f"Erro ao criar produto: {e}")
-        return False
-
-def get_client_config(c_id):
-    """Recupera configuração bruta do cliente para edição"""
-    try:
-        res = supabase.table('clientes').select('config_fluxo, prompt_full').eq('id', c_id).execute()
-        if res.data:
-            data = res.data[0]
-            # Tratamento do JSON que pode vir como string ou dict
-            config = data.get('config_fluxo') or {}
-            if isinstance(config, str):
-                config = json.loads(config)
-            return data.get('prompt_full'), config
-        return "", {}
-    except:
-        return "", {}
-
-def update_brain(c_id, prompt_text, new_voice, new_temp, current_config):
-    """Atualiza o Cérebro (Prompt e Configurações JSON)"""
-    try:
-        # Atualiza o dicionário de config mantendo outros dados que possam existir
-        current_config['openai_voice'] = new_voice
-        current_config['temperature'] = new_temp
-        
-        payload = {
-            'prompt_full': prompt_text,
-            'config_fluxo': json.dumps(current_config) # Serializa de volta para salvar
-        }
-        
-        supabase.table('clientes').update(payload).eq('id', c_id).execute()
-        return True
-    except Exception as e:
-        st.error(f"Erro ao atualizar cérebro: {e}")
-        return False
+import streamlit as st
+import pandas as pd
+import time
+from supabase import create_client
+from datetime import datetime, timedelta
+import bookings
+import cache
+import metrics
+import products
+import tenant_config
+from cache import tenant_cached
+from tenant_config import TenantConfig
+
+# --- CONEXÃO ---
+@st.cache_resource
+def init_connection():
+    try: url, key = st.secrets.get("SUPABASE_URL"), st.secrets.get("SUPABASE_KEY")
+    except: return None  # sem secrets.toml (bench/, testes): o chamador injeta services.supabase
+    if not url: return None
+    try: return metrics.instrument(create_client(url, key))  # toda consulta cronometrada
+    except: return None
+
+supabase = init_connection()
+
+# --- REPOSITÓRIO DO INQUILINO (COALESCE POR RERUN) ---
+# Cada rerun abre um escopo novo com begin_run(). Dentro dele, uma consulta
+# idêntica -- ou coberta por outra já feita com mais colunas e os mesmos
+# filtros -- é servida da memória em vez de ir de novo ao Supabase.
+
+_RUN_KEY = '_repo_run'
+_RUN_ID_KEY = '_repo_run_id'
+
+COLS_AGENDAMENTOS = 'id, created_at, cliente_final_waid, status, valor_total_registrado, valor_sinal_registrado, servico_id, data_hora_inicio'
+COLS_AGENDAMENTOS_SALAO = 'id, created_at, cliente_final_waid, status, valor_total_registrado, valor_sinal_registrado, produto_salao_id, data_reserva'
+COLS_PRODUTOS = 'id, nome, categoria, ativo, regras_preco'
+COLS_CRM = 'id, wa_id, nome, atendente_atual, tags, notas'
+COLS_CRM_LISTA = 'wa_id, nome, atendente_atual'
+
+def begin_run():
+    """Abre o escopo de consultas do rerun atual (chamar uma vez no topo do app)"""
+    st.session_state[_RUN_KEY] = {}
+    st.session_state[_RUN_ID_KEY] = st.session_state.get(_RUN_ID_KEY, 0) + 1
+
+def run_id():
+    """Sequencial do rerun completo; reruns de fragmento mantêm o mesmo escopo e id"""
+    return st.session_state.get(_RUN_ID_KEY, 0)
+
+def _run_store():
+    if _RUN_KEY not in st.session_state: st.session_state[_RUN_KEY] = {}
+    return st.session_state[_RUN_KEY]
+
+def _parse_cols(select):
+    """'a, b, rel:fk(x, y)' -> frozenset; None quando é select *"""
+    if select.strip() == '*': return None
+    cols, buf, depth = [], '', 0
+    for ch in select:
+        if ch == '(': depth += 1
+        elif ch == ')': depth -= 1
+        if ch == ',' and depth == 0:
+            cols.append(buf.strip()); buf = ''
+        else: buf += ch
+    if buf.strip(): cols.append(buf.strip())
+    return frozenset(cols)
+
+def fetch(table, select='*', filters=(), order=None, desc=False, limit=None, offset=0):
+    """SELECT com coalesce: filters é uma tupla de (operador, coluna, valor)"""
+    if not supabase: return []
+    key = (table, tuple(filters), order, desc, limit, offset)
+    wanted = _parse_cols(select)
+    store = _run_store()
+    for cols, data in store.get(key, []):
+        if cols is None or (wanted is not None and wanted <= cols):
+            return data
+
+    q = supabase.table(table).select(select)
+    for op, col, val in filters:
+        q = getattr(q, op)(col, val)
+    if order: q = q.order(order, desc=desc)
+    if limit: q = q.range(offset, offset + limit - 1)
+    data = q.execute().data or []
+    store.setdefault(key, []).append((wanted, data))
+    return data
+
+def invalidate(table):
+    """Descarta do escopo atual tudo que foi lido de uma tabela (após escrita sem rerun)"""
+    store = _run_store()
+    for key in [k for k in store if k[0] == table]: del store[key]
+    if table in ('agendamentos', 'agendamentos_salao', 'produtos'):
+        for key in [k for k in store if k[0] == 'bookings_df']: del store[key]
+
+# Leituras entre reruns passam pelo cache por inquilino/domínio (cache.py): as
+# funções _load_* levantam exceção em erro para que falha nunca vá para o cache.
+
+# --- CONFIGURAÇÃO DO INQUILINO (TenantConfig) ---
+# O TenantConfig já interpretado fica no processo, por inquilino. A cada
+# CONFIG_REVALIDA segundos uma consulta de uma coluna (config_versao, sql/007)
+# diz se mudou; só então a linha é baixada e interpretada de novo. Escrita do
+# próprio painel (after_write 'config') antecipa a conferência.
+
+CONFIG_REVALIDA = 10
+
+@st.cache_resource
+def _configs():
+    return {}  # c_id -> último TenantConfig interpretado
+
+def _load_config(c_id):
+    anterior = _configs().get(c_id)
+    if anterior is not None and anterior.versao is not None:
+        try:
+            rows = supabase.table('clientes').select(tenant_config.COLUNA_VERSAO).eq('id', c_id).limit(1).execute().data
+            if rows and rows[0].get(tenant_config.COLUNA_VERSAO) == anterior.versao: return anterior
+        except: pass
+    try: rows = supabase.table('clientes').select(f"{tenant_config.COLUNAS}, {tenant_config.COLUNA_VERSAO}").eq('id', c_id).limit(1).execute().data
+    except: rows = supabase.table('clientes').select(tenant_config.COLUNAS).eq('id', c_id).limit(1).execute().data  # banco sem sql/007
+    cfg = TenantConfig.from_row(rows[0]) if rows else TenantConfig(cliente_id=c_id)
+    _configs()[c_id] = cfg
+    return cfg
+
+def get_config(c_id):
+    """TenantConfig do inquilino (imutável; para editar config_fluxo use cfg.fluxo())"""
+    if not supabase: return TenantConfig(cliente_id=c_id)
+    try: return cache.get_cache().get_or_load(c_id, 'config', 'tenant_config', lambda: _load_config(c_id), CONFIG_REVALIDA)
+    except: return _configs().get(c_id) or TenantConfig(cliente_id=c_id)
+
+def salvar_config(cfg, fluxo, **colunas):
+    """Grava só o que difere de `cfg` (a versão que a tela editou): caminhos de
+    config_fluxo + colunas (prompt_full, credenciais). Devolve o TenantConfig novo;
+    levanta ConfigConflito se outra pessoa salvou depois de `cfg`"""
+    definir, remover = tenant_config.diff_fluxo(cfg.fluxo(), fluxo)
+    colunas = tenant_config.diff_colunas(cfg, colunas)
+    if not definir and not remover and not colunas: return cfg
+
+    versao = supabase.rpc('clientes_config_patch', {
+        'p_cliente_id': cfg.cliente_id, 'p_versao': cfg.versao,
+        'p_definir': [{'caminho': c, 'valor': v} for c, v in definir], 'p_remover': remover, 'p_colunas': colunas,
+    }).execute().data
+    after_write(cfg.cliente_id, 'config')  # gravou ou perdeu a corrida: nos dois casos relê a versão do banco
+    if versao is None: raise tenant_config.ConfigConflito(f"config do inquilino {cfg.cliente_id} mudou desde a versão {cfg.versao}")
+    return get_config(cfg.cliente_id)
+
+PRODUTOS_PAGINA = 1000  # teto de linhas por resposta do PostgREST
+PRODUTOS_LOTE = 500     # linhas por insert/upsert na importação
+
+@tenant_cached('products')
+def _load_produtos(c_id):
+    rows, ini = [], 0
+    while True:
+        page = supabase.table('produtos').select(COLS_PRODUTOS).eq('cliente_id', c_id) \
+            .order('nome').order('id').range(ini, ini + PRODUTOS_PAGINA - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < PRODUTOS_PAGINA: return rows
+        ini += PRODUTOS_PAGINA
+
+def get_produtos(c_id):
+    """Catálogo do inquilino, ordenado por nome"""
+    try: return _load_produtos(c_id)
+    except: return []
+
+def get_mapa_produtos(c_id):
+    """{id: nome} para rotular agendamentos"""
+    return {p['id']: p['nome'] for p in get_produtos(c_id)}
+
+# --- AGENDA (JANELA OPERACIONAL) ---
+# A Agenda não baixa o histórico: só de AGENDA_DIAS_PASSADOS dias atrás até
+# AGENDA_DIAS_FUTUROS à frente (gte/lt na coluna de data, índice em sql/010).
+# Cada lado da janela tem teto de AGENDA_MAX_LINHAS por tabela: o passado vem
+# do mais recente para trás e o futuro de hoje para frente, então um inquilino
+# grande perde as pontas da janela, nunca o que está perto de hoje. Os cards de
+# baixa paginam de AGENDA_PAGINA em AGENDA_PAGINA, como as colunas do funil.
+# Confirmados mais antigos que a janela saem pela baixa por filtro.
+
+AGENDA_DIAS_PASSADOS = 14
+AGENDA_DIAS_FUTUROS = 60
+AGENDA_MAX_LINHAS = 1000
+AGENDA_PAGINA = 12
+
+def agenda_janela(hoje=None):
+    """(desde, hoje, ate) em ISO: datas do calendário, ate exclusivo"""
+    hoje = hoje or datetime.now().date()
+    return ((hoje - timedelta(days=AGENDA_DIAS_PASSADOS)).isoformat(), hoje.isoformat(),
+            (hoje + timedelta(days=AGENDA_DIAS_FUTUROS + 1)).isoformat())
+
+def _janela(table, cols, col_data, c_id, desde, hoje, ate):
+    base = (('eq', 'cliente_id', c_id),)
+    passado = fetch(table, cols, base + (('gte', col_data, desde), ('lt', col_data, hoje)), order=col_data, desc=True, limit=AGENDA_MAX_LINHAS)
+    futuro = fetch(table, cols, base + (('gte', col_data, hoje), ('lt', col_data, ate)), order=col_data, limit=AGENDA_MAX_LINHAS)
+    return passado[::-1] + futuro
+
+@tenant_cached('bookings')
+def get_agendamentos(c_id, desde, hoje, ate):
+    """Agendamentos de serviço do inquilino dentro da janela"""
+    return _janela('agendamentos', COLS_AGENDAMENTOS, 'data_hora_inicio', c_id, desde, hoje, ate)
+
+@tenant_cached('bookings')
+def get_agendamentos_salao(c_id, desde, hoje, ate):
+    """Reservas de salão do inquilino dentro da janela"""
+    return _janela('agendamentos_salao', COLS_AGENDAMENTOS_SALAO, 'data_reserva', c_id, desde, hoje, ate)
+
+def get_bookings_df(c_id):
+    """Serviços + salão da janela da Agenda num DataFrame normalizado (bookings.py), uma vez por rerun"""
+    store = _run_store()
+    janela = agenda_janela()
+    key = ('bookings_df', c_id) + janela
+    if key not in store:
+        store[key] = bookings.from_tables(get_agendamentos(c_id, *janela), get_agendamentos_salao(c_id, *janela), get_mapa_produtos(c_id))
+    return store[key]
+
+@tenant_cached('crm')
+def _load_crm_contatos(c_id, wa_ids, cols):
+    return fetch('crm_clientes_finais', cols, (('eq', 'cliente_id', c_id), ('in_', 'wa_id', wa_ids)))
+
+def get_crm_contatos(c_id, wa_ids, cols=COLS_CRM_LISTA):
+    """{wa_id: ficha} só dos contatos pedidos (a página visível da Inbox), nunca o CRM inteiro"""
+    wa_ids = tuple(sorted({w for w in wa_ids if w}))
+    if not wa_ids: return {}
+    try: return {c['wa_id']: c for c in _load_crm_contatos(c_id, wa_ids, cols)}
+    except: return {}
+
+def get_ficha_crm(c_id, wa_id):
+    """Ficha completa de um contato"""
+    return get_crm_contatos(c_id, [wa_id], COLS_CRM).get(wa_id)
+
+# --- PÚBLICO DE CAMPANHA (ETIQUETAS NO SERVIDOR) ---
+# A aba Disparos recebe só as etiquetas com contagem (crm_tags_contagem, sql/006)
+# e, para a seleção, o total + uma página de destinatários (overlap em tags).
+
+PUBLICO_PAGINA = 50
+COLS_PUBLICO = 'wa_id, nome, tags'
+PUBLICO_ORDENS = {'wa_id': 'Telefone', 'nome': 'Nome'}
+
+@tenant_cached('crm')
+def _load_tags_contagem(c_id):
+    return supabase.rpc('crm_tags_contagem', {'p_cliente_id': c_id}).execute().data or []
+
+def get_tags_contagem(c_id):
+    """{etiqueta: qtd de contatos}, da mais usada para a menos usada"""
+    try: return {r['tag']: int(r['qtd'] or 0) for r in _load_tags_contagem(c_id) if r.get('tag')}
+    except: return {}
+
+def _termo_busca(texto):
+    """Tira do termo o que quebraria a sintaxe do or_() do PostgREST"""
+    return ''.join(ch for ch in (texto or '') if ch not in ',()"\\%*_').strip()
+
+def _consulta_publico(c_id, tags, limit, offset, busca, ordem, desc):
+    q = supabase.table('crm_clientes_finais').select(COLS_PUBLICO, count='exact') \
+        .eq('cliente_id', c_id).overlaps('tags', list(tags))
+    if busca: q = q.or_(f'nome.ilike."%{busca}%",wa_id.ilike."%{busca}%"')
+    if ordem != 'wa_id': q = q.order(ordem, desc=desc)
+    res = q.order('wa_id', desc=desc).range(offset, offset + limit - 1).execute()
+    return res.count or 0, res.data or []
+
+@tenant_cached('crm')
+def _load_publico(c_id, tags, limit, offset, ordem, desc):
+    return _consulta_publico(c_id, tags, limit, offset, None, ordem, desc)
+
+def get_publico(c_id, tags, limit=PUBLICO_PAGINA, offset=0, busca=None, ordem='wa_id', desc=False):
+    """(total, página) dos contatos com qualquer uma das etiquetas; busca por nome
+    ou telefone e ordenação (PUBLICO_ORDENS) são feitas no banco"""
+    if not supabase or not tags: return 0, []
+    if ordem not in PUBLICO_ORDENS: ordem = 'wa_id'
+    tags, busca = tuple(sorted(tags)), _termo_busca(busca)
+    try:
+        # Texto livre não vai para o cache do processo: cada termo digitado seria uma entrada
+        if busca: return _consulta_publico(c_id, tags, limit, offset, busca, ordem, bool(desc))
+        return _load_publico(c_id, tags, limit, offset, ordem, bool(desc))
+    except: return 0, []
+
+def get_conversas(c_id, limit=30, offset=0):
+    """Página do índice de conversas (conversas_resumo), mais recentes primeiro"""
+    try: return fetch('conversas_resumo', 'wa_id, ultima_mensagem_em, ultimo_trecho, ultimo_role, qtd_mensagens',
+                      (('eq', 'cliente_id', c_id),), order='ultima_mensagem_em', desc=True, limit=limit, offset=offset)
+    except: return []
+
+# --- FUNIL (AGREGADO NO SERVIDOR) ---
+# Colunas do kanban -> status do banco. Espelhado em funil_coluna() (sql/004).
+FUNIL_COLUNAS = {
+    'pendente': ["Pendente", "Novo", "Aguardando", None, ""],
+    'confirmado': ["Confirmado", "Pago", "Agendado"],
+    'cancelado': ["Cancelado", "Desistiu"],
+}
+FUNIL_PAGINA = 12
+COLS_FUNIL = 'id, tipo, cliente_final_waid, status, valor, produto_id, data'
+
+@tenant_cached('bookings')
+def _load_funil_resumo(c_id):
+    return supabase.rpc('funil_resumo', {'p_cliente_id': c_id}).execute().data or []
+
+def get_funil_resumo(c_id):
+    """{coluna: {'qtd', 'valor'}} calculado no banco (funil_resumo)"""
+    resumo = {col: {'qtd': 0, 'valor': 0.0} for col in FUNIL_COLUNAS}
+    try:
+        for r in _load_funil_resumo(c_id):
+            if r.get('coluna') in resumo: resumo[r['coluna']] = {'qtd': int(r['qtd'] or 0), 'valor': float(r['valor'] or 0)}
+    except: pass
+    return resumo
+
+@tenant_cached('bookings')
+def _load_funil_pagina(c_id, coluna, limit):
+    return fetch('funil_leads', COLS_FUNIL, (('eq', 'cliente_id', c_id), ('eq', 'coluna', coluna)), order='data', desc=True, limit=limit)
+
+def get_funil_pagina(c_id, coluna, limit=FUNIL_PAGINA):
+    """Os `limit` leads mais recentes de uma coluna do funil"""
+    try: return _load_funil_pagina(c_id, coluna, limit)
+    except: return []
+
+# --- ANALYTICS (ROLLUP DIÁRIO) ---
+# Período e produtos viram gte/lte/in_ na consulta. O que já foi baixado fica em
+# cache na sessão: alargar a janela (ou incluir produtos) busca só a diferença,
+# estreitar não vai ao banco. O dia de hoje é sempre relido. Dias passados também
+# mudam (o bot confirma pagamento, outra sessão cancela): o cache da sessão vale
+# RECEITA_TTL segundos, o mesmo prazo do domínio 'bookings' no cache do processo.
+
+ANALYTICS_JANELA_DIAS = 90
+RECEITA_TTL = cache.TTL['bookings']
+COLS_RECEITA = 'dia, tipo, produto_id, status, qtd, valor'
+
+def _receita_query(c_id, ini, fim, produtos, excluir=None):
+    if ini > fim: return []
+    q = supabase.table('receita_diaria').select(COLS_RECEITA).eq('cliente_id', c_id) \
+        .gte('dia', ini.isoformat()).lte('dia', fim.isoformat())
+    if produtos is not None: q = q.in_('produto_id', sorted(produtos))
+    if excluir: q = q.not_.in_('produto_id', sorted(excluir))
+    return q.order('dia').execute().data or []
+
+def get_receita_periodo(c_id, ini, fim, produtos=None):
+    """Rollup entre ini e fim (datas) para os produto_id dados (None = todos)"""
+    if not supabase: return []
+    produtos = set(produtos) if produtos else None
+    hoje = datetime.now().date()
+    ontem = hoje - timedelta(days=1)
+    store = st.session_state.setdefault('receita_cache', {})
+    entry = store.get(c_id)
+    if entry is not None and time.monotonic() - entry['em'] > RECEITA_TTL: entry = None  # escritas de fora da sessão
+
+    try:
+        if entry is None:
+            entry = {'ini': ini, 'fim': min(fim, ontem), 'produtos': produtos, 'em': time.monotonic(),
+                     'rows': _receita_query(c_id, ini, min(fim, ontem), produtos)}
+        else:
+            if entry['produtos'] is not None and produtos is None:
+                # Passou a "todos": busca só o complemento do que já está em cache
+                entry['rows'] += _receita_query(c_id, entry['ini'], entry['fim'], None, excluir=entry['produtos'])
+                entry['produtos'] = None
+            elif entry['produtos'] is not None and not produtos <= entry['produtos']:
+                novos = produtos - entry['produtos']
+                entry['rows'] += _receita_query(c_id, entry['ini'], entry['fim'], novos)
+                entry['produtos'] = entry['produtos'] | novos
+            if ini < entry['ini']:
+                entry['rows'] += _receita_query(c_id, ini, min(entry['ini'] - timedelta(days=1), ontem), entry['produtos'])
+                entry['ini'] = ini
+            if min(fim, ontem) > entry['fim']:
+                entry['rows'] += _receita_query(c_id, entry['fim'] + timedelta(days=1), min(fim, ontem), entry['produtos'])
+                entry['fim'] = min(fim, ontem)
+        store[c_id] = entry
+        rows = entry['rows'] + (_receita_query(c_id, hoje, fim, produtos) if fim >= hoje else [])
+    except: return []
+
+    ini_s, fim_s = ini.isoformat(), fim.isoformat()
+    return [r for r in rows if ini_s <= r['dia'] <= fim_s and (produtos is None or r['produto_id'] in produtos)]
+
+def invalidate_receita(c_id=None):
+    """Descarta o cache incremental do Analytics (após escrita em agendamentos)"""
+    cache = st.session_state.get('receita_cache', {})
+    if c_id is None: cache.clear()
+    else: cache.pop(c_id, None)
+
+# --- TRANSIÇÕES DE STATUS EM LOTE ---
+# Um UPDATE por tabela, seja para uma lista de cards ou para um filtro inteiro.
+
+TABELA_POR_TIPO = {'servico': 'agendamentos', 'salao': 'agendamentos_salao'}
+COL_DATA_POR_TIPO = {'servico': 'data_hora_inicio', 'salao': 'data_reserva'}
+
+def _status_filter(status_de):
+    """or_() do PostgREST para 'status em lista', tratando None/'' como pendente"""
+    valores = [f'"{v}"' for v in status_de if v]
+    partes = [f"status.in.({','.join(valores)})"] if valores else []
+    if None in status_de: partes.append('status.is.null')
+    if '' in status_de: partes.append('status.eq.""')
+    return ','.join(partes)
+
+# --- INVALIDAÇÃO APÓS ESCRITA ---
+# Cada escrita declara os domínios que tocou; só esses pares (inquilino, domínio)
+# saem do cache, junto com as tabelas correspondentes no escopo do rerun.
+
+_TABELAS_POR_DOMINIO = {
+    'config': ('clientes',),
+    'products': ('produtos',),
+    'bookings': ('agendamentos', 'agendamentos_salao', 'funil_leads'),
+    'crm': ('crm_clientes_finais',),
+    'kpis': ('view_dashboard_kpis',),
+}
+
+def after_write(c_id, *dominios):
+    """Invalida só o que a escrita afetou"""
+    cache.invalidate(c_id, *dominios)
+    for d in dominios:
+        for table in _TABELAS_POR_DOMINIO.get(d, ()): invalidate(table)
+    if 'bookings' in dominios: invalidate_receita(c_id)
+
+def update_status_em_lote(c_id, itens, status):
+    """itens: [(tipo, id)]. Devolve quantas linhas foram alteradas"""
+    por_tabela = {}
+    for tipo, item_id in itens: por_tabela.setdefault(TABELA_POR_TIPO[tipo], []).append(item_id)
+    total = 0
+    for table, ids in por_tabela.items():
+        res = supabase.table(table).update({'status': status}).eq('cliente_id', c_id).in_('id', ids).execute()
+        total += len(res.data or [])
+    after_write(c_id, 'bookings', 'kpis')
+    return total
+
+def update_status_por_filtro(c_id, status_de, status_para, antes_de):
+    """Move para status_para tudo em status_de com data anterior a antes_de (ISO)"""
+    total = 0
+    for tipo, table in TABELA_POR_TIPO.items():
+        res = supabase.table(table).update({'status': status_para}).eq('cliente_id', c_id) \
+            .or_(_status_filter(status_de)).lt(COL_DATA_POR_TIPO[tipo], antes_de).execute()
+        total += len(res.data or [])
+    after_write(c_id, 'bookings', 'kpis')
+    return total
+
+# --- HISTÓRICO DO CHAT (KEYSET + CACHE POR CONVERSA) ---
+# Cursor (created_at, id). A primeira abertura traz as últimas CHAT_PAGINA
+# mensagens; "anteriores" pagina para trás; cada rerun só pede o que é mais novo
+# que a última mensagem em cache. O custo não depende do tamanho da conversa.
+
+CHAT_PAGINA = 40
+CHAT_CACHE_MAX = 20  # conversas mantidas por sessão
+COLS_CHAT = 'id, created_at, role, content'
+
+def _chat_query(c_id, wa_id):
+    return supabase.table('historico_mensagens').select(COLS_CHAT).eq('cliente_id', c_id).eq('wa_id', wa_id)
+
+def get_chat_page(c_id, wa_id, limit=CHAT_PAGINA, before=None):
+    """Até `limit` mensagens anteriores ao cursor `before` (ou as últimas), em ordem cronológica"""
+    q = _chat_query(c_id, wa_id)
+    if before:
+        ts, mid = before
+        q = q.or_(f'created_at.lt."{ts}",and(created_at.eq."{ts}",id.lt.{mid})')
+    rows = q.order('created_at', desc=True).order('id', desc=True).limit(limit).execute().data or []
+    return rows[::-1]
+
+def get_chat_delta(c_id, wa_id, after):
+    """Mensagens posteriores ao cursor `after`, em ordem cronológica"""
+    ts, mid = after
+    return _chat_query(c_id, wa_id).or_(f'created_at.gt."{ts}",and(created_at.eq."{ts}",id.gt.{mid})') \
+        .order('created_at').order('id').execute().data or []
+
+def _chat_cache():
+    if 'chat_cache' not in st.session_state: st.session_state['chat_cache'] = {}
+    return st.session_state['chat_cache']
+
+def load_chat(c_id, wa_id, refresh=True):
+    """Mensagens em cache da conversa, completadas com o delta desde a última"""
+    cache = _chat_cache()
+    key = (c_id, wa_id)
+    entry = cache.pop(key, None)  # reinsere no fim: ordem = LRU
+    if entry is None:
+        msgs = get_chat_page(c_id, wa_id)
+        entry = {'msgs': msgs, 'tem_anteriores': len(msgs) == CHAT_PAGINA}
+    elif not refresh:
+        pass
+    elif entry['msgs']:
+        last = entry['msgs'][-1]
+        entry['msgs'] += get_chat_delta(c_id, wa_id, (last['created_at'], last['id']))
+    else:
+        entry['msgs'] = get_chat_page(c_id, wa_id)
+    cache[key] = entry
+    while len(cache) > CHAT_CACHE_MAX: cache.pop(next(iter(cache)))
+    return entry
+
+def load_chat_older(c_id, wa_id):
+    """Prepende a página anterior à conversa em cache"""
+    entry = _chat_cache().get((c_id, wa_id))
+    if not entry or not entry['msgs']: return entry
+    first = entry['msgs'][0]
+    older = get_chat_page(c_id, wa_id, before=(first['created_at'], first['id']))
+    entry['msgs'] = older + entry['msgs']
+    entry['tem_anteriores'] = len(older) == CHAT_PAGINA
+    return entry
+
+def get_tarefas(c_id):
+    """Tarefas em aberto, por vencimento"""
+    return fetch('crm_tarefas', '*', (('eq', 'cliente_id', c_id), ('eq', 'concluido', False)), order='data_vencimento')
+
+def get_usuarios(c_id):
+    """Usuários do painel vinculados ao inquilino"""
+    return fetch('acesso_painel', 'id, nome_usuario, email', (('eq', 'cliente_id', c_id),))
+
+# --- LEITURA (CACHED) ---
+# --- KPIS ---
+# Usuário comum: só a própria linha da view (cache por inquilino, invalidado nas
+# escritas dele). Admin: lista enxuta de inquilinos p/ o seletor, paginada e
+# cacheada uma vez por processo; os números do selecionado vêm da linha própria.
+KPIS_PAGINA = 500
+COLS_KPIS_LISTA = 'cliente_id, nome_empresa'
+
+@tenant_cached('kpis')
+def _load_kpis_cliente(c_id):
+    res = supabase.table('view_dashboard_kpis').select('*').eq('cliente_id', c_id).limit(1).execute()
+    return res.data[0] if res.data else None
+
+def get_kpis_cliente(c_id):
+    """Linha de KPIs do inquilino (dict) ou None"""
+    if not supabase: return None
+    try:
+        row = _load_kpis_cliente(c_id)
+        return dict(row) if row else None
+    except: return None
+
+def _load_kpis_lista():
+    rows, ini = [], 0
+    while True:
+        page = supabase.table('view_dashboard_kpis').select(COLS_KPIS_LISTA) \
+            .order('nome_empresa').order('cliente_id').range(ini, ini + KPIS_PAGINA - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < KPIS_PAGINA: return rows
+        ini += KPIS_PAGINA
+
+def get_kpis_lista():
+    """[{'cliente_id', 'nome_empresa'}] de todos os inquilinos (seletor do admin)"""
+    if not supabase: return []
+    try: return list(cache.get_cache().get_or_load(None, 'kpis', 'lista', _load_kpis_lista))
+    except: return []
+
+@tenant_cached('bookings')
+def _load_financial_data(c_id):
+    r_s = supabase.table('agendamentos_salao').select('created_at, valor_sinal_registrado, status, produto_salao_id, produtos:produto_salao_id(nome)').eq('cliente_id', c_id).execute().data
+    r_p = supabase.table('agendamentos').select('created_at, valor_sinal_registrado, status, servico_id').eq('cliente_id', c_id).execute().data
+    return r_s, r_p
+
+def get_financial_data(c_id):
+    """Busca dados de agendamentos de salão e serviços gerais"""
+    try: return _load_financial_data(c_id)
+    except: return [], []
+
+def get_messages(c_id):
+    """Busca lista de conversas recentes (Sem cache para ser real-time)"""
+    return supabase.table('conversas').select('id, cliente_wa_id, updated_at, metadata').eq('cliente_id', c_id).order('updated_at', desc=True).limit(20).execute()
+
+def get_chat_history(conversa_id):
+    """Busca histórico de mensagens de uma conversa específica"""
+    return supabase.table('historico_mensagens').select('*').eq('conversa_id', conversa_id).order('created_at', desc=True).limit(40).execute()
+
+def get_products(c_id):
+    """Busca lista de produtos"""
+    return supabase.table('produtos').select('nome, categoria, ativo').eq('cliente_id', c_id).order('nome').execute()
+
+def get_agenda(c_id):
+    """Busca agenda futura"""
+    try:
+        rs = supabase.table('agendamentos_salao').select('data_reserva, valor_total_registrado, cliente_final_waid').eq('cliente_id', c_id).order('created_at', desc=True).limit(50).execute()
+        if rs.data: return pd.DataFrame(rs.data)
+        
+        rv = supabase.table('agendamentos').select('data_hora_inicio, valor_total_registrado').eq('cliente_id', c_id).order('created_at', desc=True).limit(50).execute()
+        if rv.data: return pd.DataFrame(rv.data)
+        
+        return pd.DataFrame()
+    except: return pd.DataFrame()
+
+# --- ESCRITA E LÓGICA COMPLEXA (SEM CACHE) ---
+
+def toggle_bot(c_id, current_status):
+    """Pausa ou Ativa o Bot"""
+    new_status = not current_status
+    supabase.table('clientes').update({'bot_pausado': new_status}).eq('id', c_id).execute()
+    after_write(c_id, 'config', 'kpis')
+
+def create_product(c_id, nome, categoria, preco, sinal=0.0):
+    """Cria novo produto com regras_preco no formato único (products.regras_preco)"""
+    try:
+        payload = {
+            "cliente_id": c_id,
+            "nome": nome,
+            "categoria": categoria,
+            "ativo": True,
+            "regras_preco": products.regras_preco(preco, sinal)
+        }
+        supabase.table('produtos').insert(payload).execute()
+        after_write(c_id, 'products')
+        return True
+    except Exception as e:
+        st.error(f"Erro ao criar produto: {e}")
+        return False
+
+def update_product(c_id, produto, nome, categoria, preco, sinal=0.0):
+    """Edita nome/categoria/preço/sinal preservando as demais chaves de regras_preco"""
+    supabase.table('produtos').update({
+        "nome": nome, "categoria": categoria,
+        "regras_preco": products.regras_preco(preco, sinal, base=produto.get('regras_preco')),
+    }).eq('id', produto['id']).eq('cliente_id', c_id).execute()
+    after_write(c_id, 'products')
+
+def importa_produtos(c_id, novos, atualizacoes, progresso=None):
+    """Grava o resultado de products.valida em lotes de PRODUTOS_LOTE: insert
+    para os novos, upsert por id para os existentes. Devolve (inseridos, atualizados)"""
+    lotes = [('insert', novos[i:i + PRODUTOS_LOTE]) for i in range(0, len(novos), PRODUTOS_LOTE)]
+    lotes += [('upsert', atualizacoes[i:i + PRODUTOS_LOTE]) for i in range(0, len(atualizacoes), PRODUTOS_LOTE)]
+    feitos = {'insert': 0, 'upsert': 0}
+    try:
+        for n, (op, lote) in enumerate(lotes, start=1):
+            payload = [dict(p, cliente_id=c_id) for p in lote]
+            q = supabase.table('produtos')
+            (q.insert(payload) if op == 'insert' else q.upsert(payload, on_conflict='id')).execute()
+            feitos[op] += len(lote)
+            if progresso: progresso(n / len(lotes))
+    finally:
+        if lotes: after_write(c_id, 'products')  # falha no meio: o que já entrou aparece
+    return feitos['insert'], feitos['upsert']
@@ -0,0 +1,13 @@
+import streamlit as st
+import os
+
+# ==============================================================================
+# CONFIGURAÇÃO POR AMBIENTE
+# ------------------------------------------------------------------------------
+# Variável de ambiente primeiro (bench/, containers), depois st.secrets; sem
+# secrets.toml (testes, scripts) vale o padrão.
+# ==============================================================================
+
+def secret(name, default):
+    try: return os.environ.get(name) or st.secrets.get(name, default)
+    except: return default
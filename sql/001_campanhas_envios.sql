@@ -0,0 +1,34 @@
+-- ==============================================================================
+-- 001. FILA DE DISPAROS (campaigns.py)
+-- A campanha vira um job persistido em crm_campanhas + uma linha por destinatário
+-- em crm_campanhas_envios. O worker reivindica o job com um lease (lease_ate), o
+-- que permite retomar após restart e impede dois processos no mesmo job.
+-- ==============================================================================
+
+alter table crm_campanhas
+    add column if not exists status text not null default 'concluida', -- na_fila | enviando | concluida | cancelada
+    add column if not exists taxa_por_minuto int not null default 30,
+    add column if not exists concorrencia int not null default 2,
+    add column if not exists qtd_enviados int not null default 0,
+    add column if not exists qtd_erros int not null default 0,
+    add column if not exists lease_ate timestamptz,
+    add column if not exists worker text,
+    add column if not exists finalizada_em timestamptz;
+
+create index if not exists crm_campanhas_ativas
+    on crm_campanhas (cliente_id, status) where status in ('na_fila', 'enviando');
+
+create table if not exists crm_campanhas_envios (
+    id bigserial primary key,
+    campanha_id bigint not null references crm_campanhas(id) on delete cascade,
+    cliente_id bigint not null,
+    wa_id text not null,
+    status text not null default 'pendente', -- pendente | enviado | erro
+    tentativas int not null default 0,
+    erro text,
+    enviado_em timestamptz,
+    unique (campanha_id, wa_id)
+);
+
+create index if not exists crm_campanhas_envios_pendentes
+    on crm_campanhas_envios (campanha_id, id) where status = 'pendente';
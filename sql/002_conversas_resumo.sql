@@ -0,0 +1,75 @@
+-- ==============================================================================
+-- 002. ÍNDICE DE CONVERSAS DA INBOX
+-- Uma linha por (inquilino, contato) com a última mensagem, um trecho dela e o
+-- total de mensagens. Mantido por trigger em historico_mensagens, então a lista
+-- da Inbox lê N linhas paginadas em vez de varrer o histórico inteiro.
+-- Contatos que só existem no funil entram com qtd_mensagens = 0.
+-- ==============================================================================
+
+create table if not exists conversas_resumo (
+    cliente_id bigint not null,
+    wa_id text not null,
+    ultima_mensagem_em timestamptz not null default now(),
+    ultimo_trecho text,
+    ultimo_role text,
+    qtd_mensagens int not null default 0,
+    primary key (cliente_id, wa_id)
+);
+
+create index if not exists conversas_resumo_recencia
+    on conversas_resumo (cliente_id, ultima_mensagem_em desc);
+
+create or replace function conversas_resumo_on_mensagem() returns trigger
+language plpgsql as $$
+begin
+    if new.cliente_id is null or new.wa_id is null then return new; end if;
+    insert into conversas_resumo as c (cliente_id, wa_id, ultima_mensagem_em, ultimo_trecho, ultimo_role, qtd_mensagens)
+    values (new.cliente_id, new.wa_id, coalesce(new.created_at, now()), left(new.content, 120), new.role, 1)
+    on conflict (cliente_id, wa_id) do update set
+        ultima_mensagem_em = greatest(c.ultima_mensagem_em, excluded.ultima_mensagem_em),
+        ultimo_trecho = case when excluded.ultima_mensagem_em >= c.ultima_mensagem_em then excluded.ultimo_trecho else c.ultimo_trecho end,
+        ultimo_role = case when excluded.ultima_mensagem_em >= c.ultima_mensagem_em then excluded.ultimo_role else c.ultimo_role end,
+        qtd_mensagens = c.qtd_mensagens + 1;
+    return new;
+end $$;
+
+drop trigger if exists trg_conversas_resumo on historico_mensagens;
+create trigger trg_conversas_resumo after insert on historico_mensagens
+    for each row execute function conversas_resumo_on_mensagem();
+
+create or replace function conversas_resumo_on_agendamento() returns trigger
+language plpgsql as $$
+begin
+    if new.cliente_id is null or coalesce(new.cliente_final_waid, '') = '' then return new; end if;
+    insert into conversas_resumo (cliente_id, wa_id, ultima_mensagem_em, qtd_mensagens)
+    values (new.cliente_id, new.cliente_final_waid, coalesce(new.created_at, now()), 0)
+    on conflict (cliente_id, wa_id) do nothing;
+    return new;
+end $$;
+
+drop trigger if exists trg_conversas_resumo on agendamentos;
+create trigger trg_conversas_resumo after insert on agendamentos
+    for each row execute function conversas_resumo_on_agendamento();
+
+drop trigger if exists trg_conversas_resumo on agendamentos_salao;
+create trigger trg_conversas_resumo after insert on agendamentos_salao
+    for each row execute function conversas_resumo_on_agendamento();
+
+-- Carga inicial (rodar uma vez)
+insert into conversas_resumo (cliente_id, wa_id, ultima_mensagem_em, ultimo_trecho, ultimo_role, qtd_mensagens)
+select distinct on (cliente_id, wa_id)
+       cliente_id, wa_id, created_at, left(content, 120), role,
+       count(*) over (partition by cliente_id, wa_id)
+from historico_mensagens
+where cliente_id is not null and wa_id is not null
+order by cliente_id, wa_id, created_at desc
+on conflict (cliente_id, wa_id) do nothing;
+
+insert into conversas_resumo (cliente_id, wa_id, ultima_mensagem_em, qtd_mensagens)
+select cliente_id, cliente_final_waid, max(created_at), 0
+from (select cliente_id, cliente_final_waid, created_at from agendamentos
+      union all
+      select cliente_id, cliente_final_waid, created_at from agendamentos_salao) a
+where cliente_id is not null and coalesce(cliente_final_waid, '') <> ''
+group by cliente_id, cliente_final_waid
+on conflict (cliente_id, wa_id) do nothing;
@@ -0,0 +1,9 @@
+-- ==============================================================================
+-- 003. PAGINAÇÃO KEYSET DO CHAT
+-- Cursor (created_at, id) por conversa: a última página, as anteriores e o delta
+-- de mensagens novas viram varreduras curtas de índice, independente do tamanho
+-- da conversa.
+-- ==============================================================================
+
+create index if not exists historico_mensagens_keyset
+    on historico_mensagens (cliente_id, wa_id, created_at desc, id desc);
@@ -0,0 +1,41 @@
+-- ==============================================================================
+-- 004. FUNIL AGREGADO NO SERVIDOR
+-- funil_leads une agendamentos e agendamentos_salao com colunas comuns e a
+-- coluna do kanban já calculada (mesmo mapeamento de services.FUNIL_COLUNAS).
+-- funil_resumo() devolve contagem e valor por coluna; a aba pagina cada coluna
+-- por data em vez de baixar todo o histórico.
+-- ==============================================================================
+
+create or replace function funil_coluna(p_status text) returns text
+language sql immutable as $$
+    select case
+        when p_status is null or p_status in ('Pendente', 'Novo', 'Aguardando', '') then 'pendente'
+        when p_status in ('Confirmado', 'Pago', 'Agendado') then 'confirmado'
+        when p_status in ('Cancelado', 'Desistiu') then 'cancelado'
+    end
+$$;
+
+create index if not exists agendamentos_funil
+    on agendamentos (cliente_id, funil_coluna(status), data_hora_inicio desc);
+create index if not exists agendamentos_salao_funil
+    on agendamentos_salao (cliente_id, funil_coluna(status), data_reserva desc);
+
+create or replace view funil_leads as
+select id, 'servico'::text as tipo, cliente_id, cliente_final_waid, status,
+       coalesce(valor_total_registrado, 0) as valor, servico_id as produto_id,
+       data_hora_inicio::timestamptz as data, funil_coluna(status) as coluna
+from agendamentos
+union all
+select id, 'salao'::text as tipo, cliente_id, cliente_final_waid, status,
+       coalesce(valor_total_registrado, 0) as valor, produto_salao_id as produto_id,
+       data_reserva::timestamptz as data, funil_coluna(status) as coluna
+from agendamentos_salao;
+
+create or replace function funil_resumo(p_cliente_id bigint)
+returns table (coluna text, qtd bigint, valor numeric)
+language sql stable as $$
+    select coluna, count(*), coalesce(sum(valor), 0)
+    from funil_leads
+    where cliente_id = p_cliente_id and coluna is not null
+    group by coluna
+$$;
@@ -0,0 +1,72 @@
+-- ==============================================================================
+-- 005. ROLLUP DIÁRIO DE RECEITA (ABA ANALYTICS)
+-- Uma linha por (inquilino, dia, tipo, produto, status) com quantidade e soma de
+-- valor_sinal_registrado. Os triggers aplicam só a diferença de cada
+-- insert/update/delete, então o gráfico lê ~dias x produtos linhas em vez de
+-- todos os agendamentos.
+-- produto_id = 0 quando o agendamento não aponta produto; status '' = sem status.
+-- ==============================================================================
+
+create table if not exists receita_diaria (
+    cliente_id bigint not null,
+    dia date not null,
+    tipo text not null,           -- servico | salao
+    produto_id bigint not null default 0,
+    status text not null default '',
+    qtd int not null default 0,
+    valor numeric not null default 0,
+    primary key (cliente_id, dia, tipo, produto_id, status)
+);
+
+create index if not exists receita_diaria_periodo on receita_diaria (cliente_id, dia);
+
+create or replace function receita_diaria_aplica(p_cliente bigint, p_dia date, p_tipo text, p_produto bigint, p_status text, p_qtd int, p_valor numeric)
+returns void language sql as $$
+    insert into receita_diaria as r (cliente_id, dia, tipo, produto_id, status, qtd, valor)
+    values (p_cliente, p_dia, p_tipo, coalesce(p_produto, 0), coalesce(p_status, ''), p_qtd, coalesce(p_valor, 0))
+    on conflict (cliente_id, dia, tipo, produto_id, status) do update
+        set qtd = r.qtd + excluded.qtd, valor = r.valor + excluded.valor
+$$;
+
+-- tg_argv[0] = coluna do produto, tg_argv[1] = tipo
+create or replace function receita_diaria_on_agendamento() returns trigger
+language plpgsql as $$
+declare
+    o jsonb;
+    n jsonb;
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        o := to_jsonb(old);
+        if old.cliente_id is not null and old.created_at is not null then
+            perform receita_diaria_aplica(old.cliente_id, old.created_at::date, tg_argv[1], (o->>tg_argv[0])::bigint,
+                                          old.status, -1, -coalesce(old.valor_sinal_registrado, 0));
+        end if;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        n := to_jsonb(new);
+        if new.cliente_id is not null and new.created_at is not null then
+            perform receita_diaria_aplica(new.cliente_id, new.created_at::date, tg_argv[1], (n->>tg_argv[0])::bigint,
+                                          new.status, 1, coalesce(new.valor_sinal_registrado, 0));
+        end if;
+    end if;
+    return null;
+end $$;
+
+drop trigger if exists trg_receita_diaria on agendamentos;
+create trigger trg_receita_diaria after insert or update or delete on agendamentos
+    for each row execute function receita_diaria_on_agendamento('servico_id', 'servico');
+
+drop trigger if exists trg_receita_diaria on agendamentos_salao;
+create trigger trg_receita_diaria after insert or update or delete on agendamentos_salao
+    for each row execute function receita_diaria_on_agendamento('produto_salao_id', 'salao');
+
+-- Carga inicial (rodar uma vez, com a tabela vazia)
+insert into receita_diaria (cliente_id, dia, tipo, produto_id, status, qtd, valor)
+select cliente_id, created_at::date, 'servico', coalesce(servico_id, 0), coalesce(status, ''), count(*), coalesce(sum(valor_sinal_registrado), 0)
+from agendamentos where cliente_id is not null and created_at is not null
+group by 1, 2, 3, 4, 5
+union all
+select cliente_id, created_at::date, 'salao', coalesce(produto_salao_id, 0), coalesce(status, ''), count(*), coalesce(sum(valor_sinal_registrado), 0)
+from agendamentos_salao where cliente_id is not null and created_at is not null
+group by 1, 2, 3, 4, 5
+on conflict do nothing;
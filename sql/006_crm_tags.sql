@@ -0,0 +1,44 @@
+-- ==============================================================================
+-- 006. ETIQUETAS E PÚBLICO DE CAMPANHA NO SERVIDOR
+-- A aba Disparos não baixa mais o CRM inteiro: crm_tags_contagem() devolve o
+-- universo de etiquetas com a contagem de contatos, o público é filtrado com
+-- overlap (tags && array[...]) no índice GIN e campanha_publico() grava os
+-- destinatários direto de crm_clientes_finais, sem passar a lista pelo painel.
+-- ==============================================================================
+
+create index if not exists crm_clientes_finais_tags
+    on crm_clientes_finais using gin (tags);
+create index if not exists crm_clientes_finais_cliente_wa
+    on crm_clientes_finais (cliente_id, wa_id);
+
+create or replace function crm_tags_contagem(p_cliente_id bigint)
+returns table (tag text, qtd bigint)
+language sql stable as $$
+    select t, count(*)
+    from crm_clientes_finais c, unnest(c.tags) as t
+    where c.cliente_id = p_cliente_id
+    group by t
+    order by count(*) desc, t
+$$;
+
+-- Enfileira o público (qualquer uma das etiquetas) numa campanha 'preparando'
+-- e a libera para o worker; devolve a quantidade de destinatários.
+create or replace function campanha_publico(p_campanha_id bigint, p_cliente_id bigint, p_tags text[])
+returns int
+language plpgsql as $$
+declare
+    n int;
+begin
+    insert into crm_campanhas_envios (campanha_id, cliente_id, wa_id)
+    select distinct p_campanha_id, p_cliente_id, wa_id
+    from crm_clientes_finais
+    where cliente_id = p_cliente_id and tags && p_tags and coalesce(wa_id, '') <> ''
+    on conflict (campanha_id, wa_id) do nothing;
+    get diagnostics n = row_count;
+
+    update crm_campanhas
+    set qtd_alvos = n, status = case when n > 0 then 'na_fila' else 'concluida' end
+    where id = p_campanha_id and status = 'preparando';
+    return n;
+end
+$$;
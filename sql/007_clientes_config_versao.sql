@@ -0,0 +1,32 @@
+-- ==============================================================================
+-- 007. VERSÃO DA CONFIGURAÇÃO DO INQUILINO (tenant_config.py)
+-- config_versao sobe a cada mudança de config_fluxo, prompt_full ou credenciais
+-- Z-API. O painel guarda o TenantConfig já interpretado e só confere esta
+-- coluna (uma linha, um inteiro) para saber se precisa baixar de novo.
+-- Mudanças de bot_pausado (botão do menu lateral) não contam.
+-- ==============================================================================
+
+alter table clientes
+    add column if not exists config_versao bigint not null default 1,
+    add column if not exists config_atualizado_em timestamptz not null default now();
+
+create or replace function clientes_config_versao() returns trigger
+language plpgsql as $$
+begin
+    if new.config_fluxo is distinct from old.config_fluxo
+       or new.prompt_full is distinct from old.prompt_full
+       or new.id_instance is distinct from old.id_instance
+       or new.zapi_token is distinct from old.zapi_token
+       or new.client_token is distinct from old.client_token
+       or new.nome_empresa is distinct from old.nome_empresa then
+        new.config_versao := old.config_versao + 1;
+        new.config_atualizado_em := now();
+    end if;
+    return new;
+end
+$$;
+
+drop trigger if exists clientes_config_versao on clientes;
+create trigger clientes_config_versao
+    before update on clientes
+    for each row execute function clientes_config_versao();
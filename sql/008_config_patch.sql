@@ -0,0 +1,46 @@
+-- ==============================================================================
+-- 008. GRAVAÇÃO PARCIAL DA CONFIGURAÇÃO (services.salvar_config)
+-- Em vez de reescrever config_fluxo inteiro (com os templates de follow-up) e o
+-- prompt a cada "Salvar", o painel manda só os caminhos alterados/removidos e as
+-- colunas tocadas. A gravação só acontece se config_versao (sql/007) ainda for
+-- a versão em que a edição começou: devolve a nova versão ou null (conflito).
+-- ==============================================================================
+
+create or replace function clientes_config_patch(
+    p_cliente_id bigint,
+    p_versao bigint,
+    p_definir jsonb default '[]',   -- [{"caminho": ["a", "b"], "valor": ...}]
+    p_remover jsonb default '[]',   -- [["a", "b"], ...]
+    p_colunas jsonb default '{}'    -- {"prompt_full": ..., "id_instance": ..., "zapi_token": ..., "client_token": ...}
+) returns bigint
+language plpgsql as $$
+declare
+    cfg jsonb;
+    item jsonb;
+    nova bigint;
+begin
+    select case when jsonb_typeof(config_fluxo::jsonb) = 'string' then (config_fluxo::jsonb #>> '{}')::jsonb
+                else coalesce(config_fluxo::jsonb, '{}'::jsonb) end
+    into cfg
+    from clientes where id = p_cliente_id and config_versao = p_versao
+    for update;
+    if not found then return null; end if;
+
+    for item in select * from jsonb_array_elements(coalesce(p_remover, '[]'::jsonb)) loop
+        cfg := cfg #- array(select jsonb_array_elements_text(item));
+    end loop;
+    for item in select * from jsonb_array_elements(coalesce(p_definir, '[]'::jsonb)) loop
+        cfg := jsonb_set(cfg, array(select jsonb_array_elements_text(item -> 'caminho')), item -> 'valor', true);
+    end loop;
+
+    update clientes set
+        config_fluxo = cfg,
+        prompt_full = case when p_colunas ? 'prompt_full' then p_colunas ->> 'prompt_full' else prompt_full end,
+        id_instance = case when p_colunas ? 'id_instance' then p_colunas ->> 'id_instance' else id_instance end,
+        zapi_token = case when p_colunas ? 'zapi_token' then p_colunas ->> 'zapi_token' else zapi_token end,
+        client_token = case when p_colunas ? 'client_token' then p_colunas ->> 'client_token' else client_token end
+    where id = p_cliente_id
+    returning config_versao into nova;
+    return nova;
+end
+$$;
@@ -0,0 +1,92 @@
+-- ==============================================================================
+-- 009. BALDE DE FICHAS DA Z-API COMPARTILHADO ENTRE NÓS (zapi.LimitadorCompartilhado)
+-- O orçamento de mensagens por minuto é da instância Z-API, não do processo:
+-- com vários nós rodando o painel (e o DispatchEngine), cada um com seu balde
+-- em memória, a taxa real somava. Aqui o balde fica numa linha por instância,
+-- travada (for update) só durante a conta de cada pedido.
+-- - zapi_ficha: repõe pela taxa atual e tira uma ficha; devolve espera = 0 se
+--   conseguiu, senão os segundos até a próxima (o processo dorme e pede de novo).
+-- - zapi_ficha_resultado: AIMD (sucesso recupera, 429/erro cortam) e pausa
+--   de Retry-After, valendo para todos os nós.
+-- Os parâmetros (orçamento, cortes, piso) vêm do zapi.py: o banco só guarda estado.
+-- ==============================================================================
+
+create table if not exists zapi_fichas (
+    id_instance text primary key,
+    teto double precision not null,        -- fichas por segundo (orçamento)
+    taxa double precision not null,        -- fichas por segundo efetivas (após cortes)
+    capacidade double precision not null,  -- rajada
+    fichas double precision not null,
+    em timestamptz not null default clock_timestamp(),
+    pausa_ate timestamptz not null default 'epoch'
+);
+
+create or replace function zapi_ficha(
+    p_id_instance text,
+    p_por_minuto double precision,
+    p_rajada double precision,
+    p_minimo double precision     -- fichas que precisam sobrar (reserva da Inbox)
+) returns table (espera double precision, taxa_min double precision, fichas double precision)
+language plpgsql as $$
+declare
+    b zapi_fichas;
+    agora timestamptz := clock_timestamp();
+    v_teto double precision := greatest(0.01, p_por_minuto / 60.0);
+begin
+    insert into zapi_fichas (id_instance, teto, taxa, capacidade, fichas, em)
+    values (p_id_instance, v_teto, v_teto, greatest(1.0, p_rajada), greatest(1.0, p_rajada), agora)
+    on conflict (id_instance) do nothing;
+
+    select * into b from zapi_fichas z where z.id_instance = p_id_instance for update;
+    -- Orçamento mudou no painel: vale a partir deste pedido
+    b.teto := v_teto;
+    b.taxa := least(b.taxa, v_teto);
+    b.capacidade := greatest(1.0, p_rajada);
+    b.fichas := least(b.capacidade, b.fichas + extract(epoch from agora - b.em) * b.taxa);
+
+    if agora >= b.pausa_ate and b.fichas >= p_minimo then
+        b.fichas := b.fichas - 1.0;
+        espera := 0;
+    else
+        espera := greatest(extract(epoch from b.pausa_ate - agora), (p_minimo - b.fichas) / b.taxa);
+    end if;
+
+    update zapi_fichas z set teto = b.teto, taxa = b.taxa, capacidade = b.capacidade, fichas = b.fichas, em = agora
+    where z.id_instance = p_id_instance;
+    taxa_min := b.taxa * 60;
+    fichas := b.fichas;
+    return next;
+end
+$$;
+
+create or replace function zapi_ficha_resultado(
+    p_id_instance text,
+    p_ok boolean,
+    p_status int default null,
+    p_retry_after double precision default null,
+    p_recuperacao double precision default 0.05,
+    p_piso double precision default 0.1,
+    p_corte_429 double precision default 0.5,
+    p_corte_erro double precision default 0.8
+) returns double precision   -- taxa efetiva por minuto depois do ajuste
+language plpgsql as $$
+declare
+    nova double precision;
+begin
+    update zapi_fichas z set
+        taxa = case when p_ok then least(z.teto, z.taxa + z.teto * p_recuperacao)
+                    else greatest(z.teto * p_piso, z.taxa * case when p_status = 429 then p_corte_429 else p_corte_erro end) end
+    where z.id_instance = p_id_instance
+    returning z.taxa into nova;
+    if nova is null then return null; end if;
+
+    if not p_ok and p_status = 429 then
+        -- Ninguém (em nenhum nó) envia pela instância até passar o Retry-After
+        update zapi_fichas z set
+            pausa_ate = greatest(z.pausa_ate, clock_timestamp() + make_interval(secs => coalesce(p_retry_after, 1.0 / nova))),
+            fichas = least(z.fichas, 0.0)
+        where z.id_instance = p_id_instance;
+    end if;
+    return nova * 60;
+end
+$$;
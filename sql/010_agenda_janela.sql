@@ -0,0 +1,12 @@
+-- ==============================================================================
+-- 010. JANELA DA AGENDA
+-- A aba Agenda lê só de hoje - AGENDA_DIAS_PASSADOS até hoje + AGENDA_DIAS_FUTUROS
+-- (services.get_agendamentos / get_agendamentos_salao), ordenado pela data.
+-- Os índices do funil (sql/004) começam por funil_coluna(status) e não servem
+-- para um intervalo só de data; estes servem.
+-- ==============================================================================
+
+create index if not exists agendamentos_agenda
+    on agendamentos (cliente_id, data_hora_inicio);
+create index if not exists agendamentos_salao_agenda
+    on agendamentos_salao (cliente_id, data_reserva);
@@ -1,139 +1,85 @@
-import streamlit as st
-
-def apply_styling():
-    # --- PALETA LIGHT PREMIUM ---
-    C_BG_MAIN    = "#F8FAFC"      # Cinza Gelo (Fundo Geral)
-    C_SIDEBAR    = "#FFFFFF"      # Branco Puro (Sidebar)
-    C_CARD       = "#FFFFFF"      # Branco (Cards)
-    C_TEXT_MAIN  = "#0F172A"      # Azul Quase Preto (Leitura perfeita)
-    C_TEXT_SEC   = "#64748B"      # Cinza Médio (Subtítulos)
-    C_ACCENT     = "#3F00FF"      # Seu Azul Elétrico (Destaques)
-    C_ACCENT_HOVR= "#3200CC"      # Azul Escuro (Hover)
-    C_BORDER     = "#E2E8F0"      # Borda sutil para separar elementos
-
-    st.markdown(f"""
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-
-        /* --- GERAL --- */
-        html, body, [class*="css"] {{
-            font-family: 'Inter', sans-serif;
-            color: {C_TEXT_MAIN};
-            background-color: {C_BG_MAIN};
-        }}
-
-        /* Força o fundo do app */
-        .stApp {{
-            background-color: {C_BG_MAIN};
-        }}
-
-        /* --- SIDEBAR --- */
-        section[data-testid="stSidebar"] {{
-            background-color: {C_SIDEBAR};
-            border-right: 1px solid {C_BORDER};
-            box-shadow: 2px 0 10px rgba(0,0,0,0.02);
-        }}
-        /* Textos da Sidebar */
-        section[data-testid="stSidebar"] p, 
-        section[data-testid="stSidebar"] span, 
-        section[data-testid="stSidebar"] label {{
-            color: {C_TEXT_MAIN} !important;
-        }}
-
-        /* --- CARDS E METRICAS --- */
-        div[data-testid="stMetric"] {{
-            background-color: {C_CARD};
-            border: 1px solid {C_BORDER};
-            border-radius: 12px;
-            padding: 20px;
-            /* Sombra suave para destacar no fundo branco */
-            box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.05), 0 2px 4px -1px rgba(0, 0, 0, 0.03); 
-            transition: all 0.2s ease;
-        }}
-        
-        div[data-testid="stMetric"]:hover {{
-            border-color: {C_ACCENT};
-            transform: translateY(-2px);
-            box-shadow: 0 10px 15px -3px rgba(63, 0, 255, 0.1);
-        }}
-
-        /* Cor do Valor da Métrica (Destaque) */
-        div[data-testid="stMetricValue"] {{
-            color: {C_ACCENT} !important;
-            font-weight: 700;
-        }}
-        div[data-testid="stMetricLabel"] {{
-            color: {C_TEXT_SEC} !important;
-            font-weight: 500;
-        }}
-
-        /* --- BOTÕES --- */
-        /* Botão Primário (Ação Principal) */
-        button[kind="primary"] {{
-            background-color: {C_ACCENT} !important;
-            color: #FFFFFF !important;
-            border: none;
-            border-radius: 8px;
-            font-weight: 600;
-            transition: background-color 0.2s;
-        }}
-        button[kind="primary"]:hover {{
-            background-color: {C_ACCENT_HOVR} !important;
-        }}
-
-        /* Botão Secundário (Ação Secundária) */
-        button[kind="secondary"] {{
-            background-color: #FFFFFF !important;
-            color: {C_TEXT_MAIN} !important;
-            border: 1px solid {C_BORDER} !important;
-            border-radius: 8px;
-        }}
-        button[kind="secondary"]:hover {{
-            border-color: {C_ACCENT} !important;
-            color: {C_ACCENT} !important;
-        }}
-
-        /* --- INPUTS E SELECTBOXES --- */
-        /* Fundo branco e texto escuro */
-        .stTextInput > div > div > input, 
-        .stTextArea > div > div > textarea,
-        .stSelectbox > div > div {{
-            background-color: #FFFFFF !important;
-            color: {C_TEXT_MAIN} !important;
-            border-color: {C_BORDER} !important;
-            border-radius: 8px;
-        }}
-        
-        /* Foco no input */
-        .stTextInput > div > div > input:focus,
-        .stTextArea > div > div > textarea:focus {{
-            border-color: {C_ACCENT} !important;
-            box-shadow: 0 0 0 1px {C_ACCENT} !important;
-        }}
-
-        /* --- TABS --- */
-        .stTabs [data-baseweb="tab-list"] {{
-            gap: 24px;
-            border-bottom: 1px solid {C_BORDER};
-        }}
-        .stTabs [data-baseweb="tab"] {{
-            height: 50px;
-            white-space: pre-wrap;
-            background-color: transparent;
-            border: none;
-            color: {C_TEXT_SEC};
-            font-weight: 600;
-        }}
-        .stTabs [data-baseweb="tab"][aria-selected="true"] {{
-            color: {C_ACCENT};
-            border-bottom: 2px solid {C_ACCENT};
-        }}
-        
-        /* Ajuste do Título */
-        h1, h2, h3 {{
-            color: {C_TEXT_MAIN} !important;
-            font-weight: 700;
-        }}
-        
-    </style>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+import streamlit as st
+import streamlit.components.v1 as components
+import os
+import json
+import base64
+
+# ==============================================================================
+# TEMA E ASSETS
+# ------------------------------------------------------------------------------
+# CSS e logo vivem em static/ e são lidos do disco uma vez por processo.
+# Com server.enableStaticServing o navegador baixa app/static/app.css e
+# app/static/logo.png uma vez (cache HTTP) e cada rerun só reenvia uma tag
+# <link>/<img> de poucos bytes, em vez do <style> inteiro e do PNG. A opção fica
+# em .streamlit/config.toml (o config.toml da raiz o Streamlit não lê).
+# Sem static serving, o CSS vai uma vez por sessão: um componente de altura zero
+# o põe no <head> da página, onde fica entre reruns.
+# ==============================================================================
+
+# --- CORES OFICIAIS OCTO (espelhadas em static/app.css) ---
+C_BG_OCTO_LIGHT = "#E2E8F0"
+C_SIDEBAR_NAVY  = "#031A89"
+C_ACCENT_NEON   = "#3F00FF"
+C_TEXT_DARK     = "#101828"
+C_CARD_WHITE    = "#FFFFFF"
+C_BTN_DARK      = "#031A89"
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+CSS_PATH = os.path.join(STATIC_DIR, "app.css")
+LOGO_PATH = os.path.join(STATIC_DIR, "logo.png")
+
+# O hash do conteúdo vai na URL: arquivo novo = URL nova (fura o cache do navegador)
+def _url(path):
+    return f"app/static/{os.path.basename(path)}?v={_versao(path)}"
+
+@st.cache_resource
+def _versao(path):
+    try: return format(os.path.getmtime(path), '.0f')
+    except OSError: return "0"
+
+def static_serving():
+    try: return bool(st.get_option("server.enableStaticServing"))
+    except Exception: return False
+
+_CSS_SESSAO_KEY = '_css_injetado'
+
+@st.cache_resource
+def css_inline():
+    """Script que põe o CSS no <head> da página, montado uma vez por processo (fallback sem static serving)"""
+    try:
+        with open(CSS_PATH, encoding="utf-8") as f: css = f.read()
+    except OSError: return ""
+    css = json.dumps(css).replace("</", "<\\/")
+    return ("<script>const d = window.parent.document;"
+            "if (!d.getElementById('otti-css')) { const s = d.createElement('style'); s.id = 'otti-css';"
+            f"s.textContent = {css}; d.head.appendChild(s); }}</script>")
+
+@st.cache_resource
+def logo_base64():
+    try:
+        with open(LOGO_PATH, "rb") as f: return base64.b64encode(f.read()).decode()
+    except OSError: return None
+
+def logo_src():
+    """URL estática se disponível; senão data URI (cacheado)"""
+    if static_serving() and os.path.exists(LOGO_PATH): return _url(LOGO_PATH)
+    b64 = logo_base64()
+    return f"data:image/png;base64,{b64}" if b64 else None
+
+def apply_styling():
+    """Chamar em todo rerun: com static serving reenvia só a tag <link> (o Streamlit
+    remove o que não for redesenhado); sem, o CSS vai no primeiro rerun da sessão"""
+    if static_serving() and os.path.exists(CSS_PATH):
+        st.markdown(f'<link rel="stylesheet" href="{_url(CSS_PATH)}">', unsafe_allow_html=True)
+    elif not st.session_state.get(_CSS_SESSAO_KEY):
+        script = css_inline()
+        if script: components.html(script, height=0)
+        st.session_state[_CSS_SESSAO_KEY] = True
+
+def render_logo(width=120, style=""):
+    if static_serving() and os.path.exists(LOGO_PATH):
+        st.markdown(f'<img src="{_url(LOGO_PATH)}" width="{width}" style="{style}">', unsafe_allow_html=True)
+    elif os.path.exists(LOGO_PATH):
+        st.image(LOGO_PATH, width=width)  # media file do Streamlit: URL por hash, não reenvia o PNG a cada rerun
+    else:
+        st.markdown("<h1 style='color:white; margin:0;'>OCTO</h1>", unsafe_allow_html=True)
@@ -0,0 +1,149 @@
+import copy
+import json
+from dataclasses import dataclass, field
+
+# ==============================================================================
+# CONFIGURAÇÃO TIPADA DO INQUILINO
+# ------------------------------------------------------------------------------
+# A linha de clientes (config_fluxo em JSON -- dict ou string, conforme quem
+# gravou -- + prompt + credenciais Z-API) vira um TenantConfig imutável, montado
+# uma vez por versão (config_versao, sql/007). Todas as abas leem daqui; as
+# chaves de config_fluxo que o painel não conhece ficam em `fluxo` e voltam
+# intactas ao salvar.
+# ==============================================================================
+
+VOZES = ('alloy', 'echo', 'fable', 'onyx', 'nova', 'shimmer')
+VOZ_PADRAO = 'alloy'
+PLANO_PADRAO = 'full'
+HORARIO_INICIO = '09:00'
+HORARIO_FIM = '18:00'
+TEMPERATURA_PADRAO = 0.5
+
+COLUNAS = 'id, nome_empresa, config_fluxo, prompt_full, id_instance, zapi_token, client_token'
+COLUNA_VERSAO = 'config_versao'
+
+def parse_fluxo(valor):
+    """config_fluxo cru (dict, string JSON, None ou lixo) -> dict"""
+    if isinstance(valor, str):
+        try: valor = json.loads(valor)
+        except ValueError: return {}
+    return dict(valor) if isinstance(valor, dict) else {}
+
+def _float(valor, padrao):
+    try: return float(valor)
+    except (TypeError, ValueError): return padrao
+
+def _int(valor, padrao):
+    try: return int(valor)
+    except (TypeError, ValueError): return padrao
+
+@dataclass(frozen=True)
+class EtapaFollowup:
+    nivel: int
+    minutos: int
+    instrucao: str = ''
+    acao: str = None  # 'cancelar' encerra o fluxo
+
+@dataclass(frozen=True)
+class Followup:
+    ativo: bool = False
+    horario_inicio: str = HORARIO_INICIO
+    horario_fim: str = HORARIO_FIM
+    ignorar_silencio: bool = False
+    template: str = ''
+    etapas: tuple = ()
+
+    @classmethod
+    def from_dict(cls, d):
+        d = parse_fluxo(d)
+        etapas = []
+        for e in d.get('etapas') or []:
+            if not isinstance(e, dict): continue
+            etapas.append(EtapaFollowup(nivel=_int(e.get('nivel'), len(etapas) + 1),
+                                        minutos=_int(e.get('minutos_apos_ultimo_input'), 0),
+                                        instrucao=e.get('instrucao_ia') or '', acao=e.get('acao_sistema')))
+        return cls(ativo=bool(d.get('ativo', False)), horario_inicio=d.get('horario_inicio') or HORARIO_INICIO,
+                   horario_fim=d.get('horario_fim') or HORARIO_FIM, ignorar_silencio=bool(d.get('ignorar_horario_silencio', False)),
+                   template=d.get('system_prompt_template') or '', etapas=tuple(sorted(etapas, key=lambda e: e.nivel)))
+
+@dataclass(frozen=True)
+class ZapiCreds:
+    id_instance: str = ''
+    zapi_token: str = ''
+    client_token: str = ''
+
+    @property
+    def ok(self):
+        return bool(self.id_instance and self.zapi_token)
+
+    def as_dict(self):
+        """Formato aceito por zapi.ZapiClient.send_text"""
+        return {'id_instance': self.id_instance, 'zapi_token': self.zapi_token, 'client_token': self.client_token}
+
+@dataclass(frozen=True)
+class TenantConfig:
+    cliente_id: int
+    versao: int = None          # None: banco sem sql/007 (sem revalidação barata)
+    nome_empresa: str = ''
+    plano: str = PLANO_PADRAO
+    horario_inicio: str = HORARIO_INICIO
+    horario_fim: str = HORARIO_FIM
+    modo_equipe: bool = False
+    temperatura: float = TEMPERATURA_PADRAO
+    voz: str = VOZ_PADRAO
+    responde_em_audio: bool = False
+    aceita_audio: bool = True
+    prompt: str = ''
+    followup: Followup = field(default_factory=Followup)
+    zapi: ZapiCreds = field(default_factory=ZapiCreds)
+    _fluxo: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def from_row(cls, row):
+        """Linha de clientes (COLUNAS [+ config_versao]) -> TenantConfig"""
+        fluxo = parse_fluxo(row.get('config_fluxo'))
+        voz = fluxo.get('openai_voice')
+        return cls(
+            cliente_id=row.get('id'), versao=row.get(COLUNA_VERSAO), nome_empresa=row.get('nome_empresa') or '',
+            plano=fluxo.get('plano') or PLANO_PADRAO,
+            horario_inicio=fluxo.get('horario_inicio') or HORARIO_INICIO, horario_fim=fluxo.get('horario_fim') or HORARIO_FIM,
+            modo_equipe=bool(fluxo.get('modo_equipe', False)),
+            temperatura=_float(fluxo.get('temperature'), TEMPERATURA_PADRAO),
+            voz=voz if voz in VOZES else VOZ_PADRAO,
+            responde_em_audio=bool(fluxo.get('responde_em_audio', False)), aceita_audio=bool(fluxo.get('aceita_audio', True)),
+            prompt=row.get('prompt_full') or '',
+            followup=Followup.from_dict(fluxo.get('followup_automatico')),
+            zapi=ZapiCreds(row.get('id_instance') or '', row.get('zapi_token') or '', row.get('client_token') or ''),
+            _fluxo=fluxo,
+        )
+
+    def fluxo(self):
+        """Cópia editável do config_fluxo completo (inclui chaves que o modelo não tipa)"""
+        return copy.deepcopy(self._fluxo)
+
+# --- GRAVAÇÃO PARCIAL (sql/008) ---
+# Salvar manda só o que mudou: caminhos de config_fluxo alterados/removidos e as
+# colunas tocadas, junto com a versão em que a edição começou. Se alguém salvou
+# no meio tempo, a RPC não grava nada e o painel avisa (ConfigConflito).
+
+class ConfigConflito(Exception):
+    """A configuração mudou no banco desde a versão editada"""
+
+def diff_fluxo(antigo, novo, prefixo=()):
+    """(definir, remover): [(caminho, valor)] e [caminho], descendo só em dicts"""
+    definir, remover = [], []
+    for k, v in novo.items():
+        caminho = prefixo + (str(k),)
+        if k not in antigo: definir.append((list(caminho), v))
+        elif isinstance(v, dict) and isinstance(antigo[k], dict):
+            d, r = diff_fluxo(antigo[k], v, caminho)
+            definir += d; remover += r
+        elif v != antigo[k]: definir.append((list(caminho), v))
+    remover += [list(prefixo + (str(k),)) for k in antigo if k not in novo]
+    return definir, remover
+
+def diff_colunas(cfg, colunas):
+    """Só as colunas cujo valor difere do TenantConfig carregado"""
+    atuais = {'prompt_full': cfg.prompt, 'id_instance': cfg.zapi.id_instance,
+              'zapi_token': cfg.zapi.zapi_token, 'client_token': cfg.zapi.client_token}
+    return {c: v for c, v in colunas.items() if c in atuais and (v or '') != (atuais[c] or '')}
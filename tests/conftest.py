@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Módulos do painel (raiz) e o Supabase em memória do bench/
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, 'bench')]
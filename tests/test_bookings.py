@@ -0,0 +1,17 @@
+import bookings
+
+
+def test_produto_apagado_vira_id_zero_com_rotulo_do_tipo():
+    rows = [{'dia': '2026-01-01', 'tipo': 'servico', 'produto_id': 5, 'status': 'Pago', 'qtd': 1, 'valor': 50},
+            {'dia': '2026-01-01', 'tipo': 'servico', 'produto_id': 42, 'status': 'Pago', 'qtd': 1, 'valor': 30},  # apagado
+            {'dia': '2026-01-02', 'tipo': 'salao', 'produto_id': 43, 'status': 'Pago', 'qtd': 2, 'valor': 20},  # apagado
+            {'dia': '2026-01-02', 'tipo': 'salao', 'produto_id': 0, 'status': 'Pago', 'qtd': 1, 'valor': 10}]
+    df = bookings.from_unified(rows, {5: 'Corte'}, data_col='dia')
+    assert list(zip(df['produto_id'], df['produto'])) == [(5, 'Corte'), (0, 'Serviço'), (0, 'Salão'), (0, 'Salão')]
+    por_rotulo = df[df['produto'].isin(['Serviço', 'Salão'])]
+    assert por_rotulo.index.equals(df[df['produto_id'] == 0].index)  # rótulo e id concordam
+
+
+def test_sem_mapa_tudo_sem_produto():
+    df = bookings.from_tables([{'servico_id': 7, 'data_hora_inicio': '2026-01-01T10:00:00'}], [], {})
+    assert (df['produto_id'].tolist(), df['produto'].tolist()) == ([0], ['Serviço'])
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from cache import TenantCache
+
+
+class Relogio:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_uma_carga_por_chave_com_sessoes_simultaneas():
+    c = TenantCache()
+    liberar, chamadas, resultados = threading.Event(), [], []
+
+    def loader():
+        chamadas.append(1)
+        liberar.wait(5)
+        return 'valor'
+
+    threads = [threading.Thread(target=lambda: resultados.append(c.get_or_load(1, 'crm', 'k', loader))) for _ in range(8)]
+    for t in threads: t.start()
+    time.sleep(0.05)
+    liberar.set()
+    for t in threads: t.join(5)
+    assert chamadas == [1]
+    assert resultados == ['valor'] * 8
+
+
+def test_carga_que_cruzou_invalidacao_nao_fica_no_cache():
+    c = TenantCache()
+    em_carga, liberar = threading.Event(), threading.Event()
+
+    def lento():
+        em_carga.set()
+        liberar.wait(5)
+        return 'velho'
+
+    t = threading.Thread(target=lambda: c.get_or_load(1, 'bookings', 'k', lento))
+    t.start()
+    em_carga.wait(5)
+    c.invalidate(1, 'bookings')  # escrita no meio da carga
+    liberar.set()
+    t.join(5)
+    assert c.get_or_load(1, 'bookings', 'k', lambda: 'novo') == 'novo'
+
+
+def test_invalidacao_so_do_inquilino_e_dominio():
+    c = TenantCache()
+    for c_id in (1, 2):
+        for dom in ('crm', 'kpis'): c.get_or_load(c_id, dom, 'k', lambda: 'antes')
+    c.invalidate(1, 'crm')
+    assert c.get_or_load(1, 'crm', 'k', lambda: 'depois') == 'depois'
+    assert c.get_or_load(1, 'kpis', 'k', lambda: 'depois') == 'antes'
+    assert c.get_or_load(2, 'crm', 'k', lambda: 'depois') == 'antes'
+
+
+def test_ttl_e_limpeza_das_vencidas():
+    r = Relogio()
+    c = TenantCache(max_entradas=3, relogio=r)
+    for i in range(3): c.get_or_load(1, 'crm', i, lambda: 'x', ttl=10)
+    r.t = 11
+    assert c.get_or_load(1, 'crm', 0, lambda: 'recarregado', ttl=10) == 'recarregado'
+    c.get_or_load(2, 'crm', 'a', lambda: 'y', ttl=10)  # passa do limite: varre as vencidas
+    assert c.stats() == {'1:crm': 1, '2:crm': 1}
+
+
+def test_limite_de_entradas_remove_a_menos_usada():
+    c = TenantCache(max_entradas=3)
+    for i in range(3): c.get_or_load(1, 'crm', i, lambda i=i: i)
+    c.get_or_load(1, 'crm', 0, lambda: 'nao deveria recarregar')  # 0 vira a mais usada
+    c.get_or_load(1, 'crm', 3, lambda: 3)
+    assert c.get_or_load(1, 'crm', 0, lambda: 'recarregado') == 0
+    assert c.get_or_load(1, 'crm', 1, lambda: 'recarregado') == 'recarregado'
+
+
+def test_quem_le_recebe_copia_e_nao_altera_a_entrada():
+    import pandas as pd
+    c = TenantCache()
+    linhas = c.get_or_load(1, 'products', 'k', lambda: [{'id': 1, 'regras_preco': {'preco_padrao': 90.0}}])
+    linhas[0]['regras_preco']['preco_padrao'] = 0.0  # quem carregou também não mexe no que ficou guardado
+    linhas.append({'id': 2})
+    assert c.get_or_load(1, 'products', 'k', None) == [{'id': 1, 'regras_preco': {'preco_padrao': 90.0}}]
+
+    df = c.get_or_load(1, 'bookings', 'df', lambda: pd.DataFrame({'valor': [1.0, 2.0]}))
+    df['valor'] = 0.0
+    assert c.get_or_load(1, 'bookings', 'df', None)['valor'].tolist() == [1.0, 2.0]
@@ -0,0 +1,70 @@
+import pytest
+
+import campaigns
+from fake_supabase import FakeClient, FakeDB, instala_esquema
+
+CREDS = {'id': 1, 'nome_empresa': 'Loja', 'id_instance': 'inst', 'zapi_token': 'tok', 'client_token': ''}
+
+
+class Sender:
+    """Z-API falsa; `depois` roda uma vez após o primeiro envio (outro worker, painel)"""
+
+    def __init__(self):
+        self.enviados, self.depois = [], None
+
+    def __call__(self, creds, wa_id, texto):
+        self.enviados.append(wa_id)
+        if self.depois: self.depois(); self.depois = None
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(campaigns, 'LOTE_MAXIMO', 1)  # uma rodada por destinatário
+    monkeypatch.setattr(campaigns._Pacer, 'wait', lambda self: None)
+    db = instala_esquema(FakeDB())
+    db.insert('clientes', [dict(CREDS)])
+    db.insert('crm_campanhas', [{'id': 7, 'cliente_id': 1, 'mensagem_enviada': 'promo', 'status': 'na_fila',
+                                 'taxa_por_minuto': 60, 'concorrencia': 1, 'lease_ate': None, 'worker': None}])
+    db.insert('crm_campanhas_envios', [{'id': i, 'campanha_id': 7, 'cliente_id': 1, 'wa_id': f"55{i}",
+                                        'status': 'pendente', 'tentativas': 0} for i in (1, 2, 3)])
+    eng = campaigns.DispatchEngine(FakeClient(db), sender=Sender())
+    eng.db = db
+    return eng
+
+
+def roda(eng):
+    job = campanha(eng)
+    assert eng._claim(job)
+    eng._run_job(job)
+
+
+def campanha(eng):
+    return dict(eng.db.rows('crm_campanhas', 1)[0])
+
+
+def test_envia_todos_e_conclui(engine):
+    roda(engine)
+    assert engine.sender.enviados == ['551', '552', '553']
+    assert campanha(engine)['status'] == 'concluida'
+
+
+def test_lease_perdido_para_o_job_sem_duplicar(engine):
+    def outro_worker():
+        engine.db.update('crm_campanhas', engine.db.rows('crm_campanhas', 1), {'worker': 'outro-no'})
+    engine.sender.depois = outro_worker
+    roda(engine)
+    assert engine.sender.enviados == ['551']  # o lote seguinte é do novo dono
+    c = campanha(engine)
+    assert (c['status'], c['worker']) == ('enviando', 'outro-no')
+    assert [e['status'] for e in engine.db.rows('crm_campanhas_envios', 1)] == ['enviado', 'pendente', 'pendente']
+
+
+def test_cancelada_no_painel_nao_volta_a_concluida(engine):
+    def cancela():
+        engine.db.update('crm_campanhas', engine.db.rows('crm_campanhas', 1), {'status': 'cancelada', 'lease_ate': None})
+    engine.sender.depois = cancela
+    roda(engine)
+    assert engine.sender.enviados == ['551']
+    assert campanha(engine)['status'] == 'cancelada'
+    engine._finish(7, 'concluida', 1, 0)  # mesmo chamado direto, não sobrescreve
+    assert campanha(engine)['status'] == 'cancelada'
@@ -0,0 +1,80 @@
+import pytest
+
+import inbox_feed
+import outbox
+import services
+from fake_supabase import FakeClient, FakeDB, instala_esquema
+
+T0 = '2026-01-01T12:00:00+00:00'
+
+
+def ts(minuto):
+    return f"2026-01-01T12:{minuto:02d}:00+00:00"
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Troca INBOX_LIVE_BACKEND e devolve o get_feed() recriado"""
+    def troca(valor):
+        monkeypatch.setattr(inbox_feed, 'BACKEND', valor)
+        inbox_feed.get_feed.clear()
+        return inbox_feed.get_feed()
+    yield troca
+    inbox_feed.get_feed.clear()
+
+
+def test_local_entrega_so_o_que_e_novo_e_do_proprio_cliente():
+    feed = inbox_feed.LocalPublisher()
+    feed.publish(1, 'antigo', ts(0))
+    feed.publish(1, '5511', ts(1))
+    feed.publish(2, '5522', ts(2))
+    feed.publish(1, '5533', ts(3))
+    assert [e['wa_id'] for e in feed.novidades(1, T0)] == ['5533', '5511']  # mais recente primeiro
+    assert [e['wa_id'] for e in feed.novidades(2, T0)] == ['5522']
+    assert feed.novidades(1, ts(3)) == []
+    assert feed.novidades(9, T0) == []
+
+
+def test_local_sem_ts_usa_agora():
+    feed = inbox_feed.LocalPublisher()
+    desde = inbox_feed.agora()
+    feed.publish(1, '5511')
+    assert [e['wa_id'] for e in feed.novidades(1, desde)] == ['5511']
+
+
+def test_get_feed_escolhe_o_backend(backend):
+    assert isinstance(backend('local'), inbox_feed.LocalPublisher)
+    assert isinstance(backend('poll'), inbox_feed.PollingFeed)
+    assert isinstance(backend('redis'), inbox_feed.PollingFeed)  # valor desconhecido: polling
+
+
+def test_entrega_da_outbox_chega_ao_feed_local(backend, tmp_path, monkeypatch):
+    feed = backend('local')
+    db = instala_esquema(FakeDB())
+    db.insert('clientes', [{'id': 1, 'nome_empresa': 'Loja', 'id_instance': 'inst', 'zapi_token': 'tok',
+                            'client_token': '', 'bot_pausado': False}])
+    monkeypatch.setattr(outbox, '_backoff', lambda tentativas: 0.0)
+    cx = outbox.Outbox(arquivo=str(tmp_path / 'outbox.sqlite3'), sender=lambda creds, wa_id, texto: None,
+                       client=FakeClient(db))
+    desde = inbox_feed.agora()
+    cx.enqueue(1, '5511', 'oi')
+    cx._rodada()
+    assert [e['wa_id'] for e in feed.novidades(1, desde)] == ['5511']
+    assert feed.novidades(2, desde) == []
+
+
+def test_polling_le_o_indice_de_conversas(backend, monkeypatch):
+    feed = backend('poll')
+    monkeypatch.setattr(services, 'supabase', None)
+    assert feed.novidades(1, T0) == []  # sem banco: nada, sem erro
+    db = FakeDB()
+    db.insert('conversas_resumo', [
+        {'id': 1, 'cliente_id': 1, 'wa_id': 'antigo', 'ultima_mensagem_em': ts(0)},
+        {'id': 2, 'cliente_id': 1, 'wa_id': '5511', 'ultima_mensagem_em': ts(1)},
+        {'id': 3, 'cliente_id': 2, 'wa_id': '5522', 'ultima_mensagem_em': ts(2)},
+        {'id': 4, 'cliente_id': 1, 'wa_id': '5533', 'ultima_mensagem_em': ts(3)},
+    ])
+    monkeypatch.setattr(services, 'supabase', FakeClient(db))
+    assert [e['wa_id'] for e in feed.novidades(1, T0)] == ['5533', '5511']
+    feed.publish(1, '5544')  # no-op: quem alimenta o índice é o trigger
+    assert [e['wa_id'] for e in feed.novidades(1, ts(1))] == ['5533']
@@ -0,0 +1,53 @@
+import metrics
+
+
+def familias(texto):
+    """[(nome, tipo, [amostras])] na ordem em que aparecem"""
+    out = []
+    for linha in texto.splitlines():
+        if linha.startswith('# HELP'): continue
+        if linha.startswith('# TYPE'):
+            _, _, nome, tipo = linha.split()
+            out.append((nome, tipo, []))
+        else:
+            out[-1][2].append(linha)
+    return out
+
+
+def test_prometheus_agrupa_cada_familia():
+    r = metrics.Registro()
+    r.observa('db', 'a', 'select', 0.01)
+    r.observa('zapi', 'send-text', 'post', 0.3, ok=False)
+    r.observa('db', 'b', 'update', 0.02)
+    fams = familias(r.prometheus())
+    nomes = [n for n, _, _ in fams]
+    assert len(nomes) == len(set(nomes))  # um bloco por família
+    for nome, tipo, amostras in fams:
+        assert amostras and all(a.startswith(nome) for a in amostras)
+    por_nome = {n: (t, a) for n, t, a in fams}
+    assert por_nome['otti_db_requests_total'] == ('counter', ['otti_db_requests_total{alvo="a",op="select"} 1',
+                                                              'otti_db_requests_total{alvo="b",op="update"} 1'])
+    assert por_nome['otti_zapi_errors_total'][1] == ['otti_zapi_errors_total{alvo="send-text",op="post"} 1']
+    tipo, hist = por_nome['otti_db_duration_seconds']
+    assert tipo == 'histogram' and len(hist) == 2 * (len(metrics.BUCKETS) + 3)
+
+
+def test_grava_jsonl_sem_rerun(tmp_path, monkeypatch):
+    arquivo = tmp_path / 'metricas.jsonl'
+    monkeypatch.setattr(metrics, 'JSONL_ARQUIVO', str(arquivo))
+    monkeypatch.setattr(metrics, 'FLUSH_SEGUNDOS', 0.05)
+    r = metrics.Registro().start()
+    try:
+        r.observa('zapi', 'send-text', 'post', 0.2)  # thread de fundo, nenhum fim_rerun
+        for _ in range(100):
+            if arquivo.exists() and arquivo.read_text(): break
+            r._stop.wait(0.02)
+    finally:
+        r.stop()
+    assert '"alvo": "send-text"' in arquivo.read_text()
+
+
+def test_sem_arquivo_nao_sobe_thread(monkeypatch):
+    monkeypatch.setattr(metrics, 'PROM_ARQUIVO', None)
+    monkeypatch.setattr(metrics, 'JSONL_ARQUIVO', None)
+    assert metrics.Registro().start()._thread is None
@@ -0,0 +1,121 @@
+import pytest
+
+import outbox
+import zapi
+from fake_supabase import FakeClient, FakeDB, instala_esquema
+
+CREDS = {'id': 1, 'nome_empresa': 'Loja', 'id_instance': 'inst', 'zapi_token': 'tok', 'client_token': '', 'bot_pausado': False}
+
+
+class Sender:
+    """Z-API falsa: `falhas` é uma fila de exceções a levantar antes de aceitar"""
+
+    def __init__(self):
+        self.enviados, self.falhas = [], []
+
+    def __call__(self, creds, wa_id, texto):
+        if self.falhas: raise self.falhas.pop(0)
+        self.enviados.append((wa_id, texto))
+
+
+@pytest.fixture
+def caixa(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox, '_backoff', lambda tentativas: 0.0)
+    db = instala_esquema(FakeDB())
+    db.insert('clientes', [dict(CREDS)])
+    sender = Sender()
+    cx = outbox.Outbox(arquivo=str(tmp_path / 'outbox.sqlite3'), sender=sender, client=FakeClient(db))
+    cx.db, cx.fake = db, sender
+    return cx
+
+
+def historico(cx):
+    return [(m['wa_id'], m['content']) for m in cx.db.rows('historico_mensagens', 1)]
+
+
+def test_entrega_grava_historico_e_pausa_o_bot(caixa):
+    caixa.enqueue(1, '5511', 'oi')
+    caixa._rodada()
+    assert caixa.fake.enviados == [('5511', 'oi')]
+    assert historico(caixa) == [('5511', 'oi')]
+    assert caixa.pendentes(1) == []
+    assert caixa.db.rows('clientes')[0]['bot_pausado'] is True
+    caixa._rodada()  # nada novo: não grava de novo
+    assert historico(caixa) == [('5511', 'oi')]
+
+
+def test_falha_temporaria_repete_e_depois_entrega(caixa):
+    caixa.enqueue(1, '5511', 'oi')
+    caixa.fake.falhas = [zapi.ZapiError("HTTP 503", status=503)]
+    caixa._rodada()
+    (msg,) = caixa.pendentes(1)
+    assert (msg['status'], msg['tentativas']) == ('pendente', 1)
+    caixa._rodada()
+    assert caixa.fake.enviados == [('5511', 'oi')]
+    assert historico(caixa) == [('5511', 'oi')]
+
+
+def test_desiste_depois_de_tentativas_ou_erro_definitivo(caixa):
+    caixa.enqueue(1, 'a', 'temporario')
+    caixa.fake.falhas = [zapi.ZapiError("HTTP 503", status=503) for _ in range(outbox.TENTATIVAS)]
+    for _ in range(outbox.TENTATIVAS): caixa._rodada()
+    caixa.enqueue(1, 'b', 'definitivo')
+    caixa.fake.falhas = [zapi.ZapiError("HTTP 400", status=400, repetivel=False)]
+    caixa._rodada()
+    estado = {m['wa_id']: (m['status'], m['tentativas']) for m in caixa.pendentes(1)}
+    assert estado == {'a': ('falhou', outbox.TENTATIVAS), 'b': ('falhou', 1)}
+    assert historico(caixa) == []
+
+
+def test_ordem_da_conversa_espera_a_mensagem_anterior(caixa):
+    caixa.enqueue(1, '5511', 'primeira')
+    caixa.enqueue(1, '5511', 'segunda')
+    caixa.enqueue(1, '5522', 'outra conversa')
+    caixa.fake.falhas = [zapi.ZapiError("HTTP 503", status=503)]
+    caixa._rodada()
+    # 'primeira' falhou e volta para a fila: 'segunda' não pode passar na frente
+    assert ('5511', 'segunda') not in caixa.fake.enviados
+    caixa._rodada()
+    caixa._rodada()
+    enviados_5511 = [t for w, t in caixa.fake.enviados if w == '5511']
+    assert enviados_5511 == ['primeira', 'segunda']
+
+
+def test_reenviar_e_descartar_so_valem_para_falhas(caixa):
+    a = caixa.enqueue(1, 'a', 'x')
+    b = caixa.enqueue(1, 'b', 'y')
+    caixa.fake.falhas = [zapi.ZapiError("HTTP 400", status=400, repetivel=False) for _ in range(2)]
+    caixa._rodada()
+    caixa.reenviar(a)
+    caixa.descartar(b)
+    caixa._rodada()
+    assert caixa.fake.enviados == [('a', 'x')]
+    assert caixa.pendentes(1) == []
+
+
+def test_sem_credenciais_nao_tenta_enviar(caixa):
+    caixa.enqueue(2, 'a', 'x')  # inquilino sem linha em clientes
+    caixa._rodada()
+    (msg,) = caixa.pendentes(2)
+    assert msg['status'] == 'falhou'
+    assert caixa.fake.enviados == []
+
+
+def test_falha_ao_ler_credenciais_devolve_para_a_fila(caixa, monkeypatch):
+    caixa.enqueue(1, 'a', 'x')
+    monkeypatch.setattr(caixa, '_credenciais', lambda ids: (_ for _ in ()).throw(RuntimeError("banco fora")))
+    with pytest.raises(RuntimeError):
+        caixa._rodada()
+    (msg,) = caixa.pendentes(1)
+    assert msg['status'] == 'pendente'
+
+
+def test_replay_apos_queda_marca_enviando_como_falhou(tmp_path):
+    arquivo = str(tmp_path / 'outbox.sqlite3')
+    primeira = outbox.Outbox(arquivo=arquivo, sender=Sender(), client=None)
+    msg_id = primeira.enqueue(1, 'a', 'x')
+    primeira._db("update outbox set status = 'enviando' where id = ?", (msg_id,))  # caiu no meio do envio
+    reaberta = outbox.Outbox(arquivo=arquivo, sender=Sender(), client=None)
+    (msg,) = reaberta.pendentes(1)
+    assert msg['status'] == 'falhou'
+    assert 'Interrompido' in msg['erro']
@@ -0,0 +1,72 @@
+import pytest
+
+import products
+
+
+def le_csv(texto):
+    return products.le_arquivo('catalogo.csv', texto.encode('utf-8'))
+
+
+# --- regras_preco ---
+
+def test_regras_preco_preserva_duracao_e_chaves_extras():
+    base = {'preco_padrao': 80.0, 'valor_sinal': 0.0, 'duracao_minutos': 90, 'cor': 'azul'}
+    r = products.regras_preco(100, 10, base=base)
+    assert r == {'preco_padrao': 100.0, 'valor_sinal': 10.0, 'duracao_minutos': 90, 'cor': 'azul'}
+    assert products.regras_preco(100, 10, base='{"duracao_minutos": 45}')['duracao_minutos'] == 45  # JSON cru
+
+
+def test_regras_preco_duracao_explicita_e_padrao():
+    assert products.regras_preco(100, duracao=30, base={'duracao_minutos': 90})['duracao_minutos'] == 30
+    assert products.regras_preco(100)['duracao_minutos'] == products.DURACAO_PADRAO
+
+
+# --- _numero ---
+
+@pytest.mark.parametrize('valor, esperado', [
+    ('1.234,56', 1234.56), ('1.500', 1500.0), ('1.234.567,8', 1234567.8), ('R$ 90', 90.0),
+    ('90,5', 90.5), ('150.5', 150.5), ('10.99', 10.99), ('-3,5', -3.5), ('1\xa0234,00', 1234.0),
+    (90, 90.0), (12.5, 12.5), ('', None), (None, None), (float('nan'), None),
+])
+def test_numero_formatos_aceitos(valor, esperado):
+    assert products._numero(valor) == esperado
+
+
+@pytest.mark.parametrize('valor', ['1.2345', '1.50,0', '12.34.56', 'abc', '1,2,3', '1.000.00'])
+def test_numero_ambiguo_ou_lixo_levanta(valor):
+    with pytest.raises(ValueError):
+        products._numero(valor)
+
+
+# --- valida ---
+
+def test_valida_decimal_br_milhar_e_erros_por_linha():
+    df = le_csv("nome;categoria;preco;sinal;duracao\n"
+                "Corte;Serviço;1.234,56;100;45\n"
+                "Escova;;1.500;;\n"
+                "Barba;Serviço;1.2345;;\n"
+                "Kit;Brinde;10;;\n"
+                "Pintura;Serviço;50;60;\n"
+                ";;;;\n")
+    novos, atualizacoes, erros = products.valida(df, [])
+    assert [(n['nome'], n['regras_preco']['preco_padrao'], n['regras_preco']['valor_sinal'], n['regras_preco']['duracao_minutos'])
+            for n in novos] == [('Corte', 1234.56, 100.0, 45), ('Escova', 1500.0, 0.0, products.DURACAO_PADRAO)]
+    assert atualizacoes == []
+    assert [linha for linha, _ in erros] == [4, 5, 6]  # linha vazia é ignorada
+    assert 'ambíguo' in erros[0][1] and "Categoria 'Brinde'" in erros[1][1] and 'Sinal maior' in erros[2][1]
+
+
+def test_valida_atualiza_por_nome_sem_perder_duracao():
+    existentes = [{'id': 7, 'nome': 'Corte Feminino', 'regras_preco': {'preco_padrao': 80, 'duracao_minutos': 90}}]
+    df = le_csv("produto,valor\ncorte feminino,\"95,00\"\n")  # apelidos + vírgula decimal entre aspas
+    novos, atualizacoes, erros = products.valida(df, existentes)
+    assert (novos, erros) == ([], [])
+    assert atualizacoes[0]['id'] == 7
+    assert atualizacoes[0]['regras_preco'] == {'preco_padrao': 95.0, 'valor_sinal': 0.0, 'duracao_minutos': 90}
+
+
+def test_valida_id_de_outro_catalogo_e_nome_repetido():
+    df = le_csv("id,nome,preco\n99,Corte,10\n,Escova,10\n,escova,12\n")
+    novos, _, erros = products.valida(df, [])
+    assert [n['nome'] for n in novos] == ['Escova']
+    assert erros == [(2, "id 99 não é um produto deste catálogo"), (4, "'escova' repetido no arquivo")]
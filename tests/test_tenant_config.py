@@ -0,0 +1,52 @@
+from tenant_config import TenantConfig, diff_fluxo, diff_colunas
+
+
+def test_diff_fluxo_sem_mudanca():
+    fluxo = {'plano': 'full', 'followup_automatico': {'ativo': True, 'etapas': [{'nivel': 1}]}}
+    assert diff_fluxo(fluxo, {'plano': 'full', 'followup_automatico': {'ativo': True, 'etapas': [{'nivel': 1}]}}) == ([], [])
+
+
+def test_diff_fluxo_desce_em_dicts_e_troca_o_resto_inteiro():
+    antigo = {'plano': 'full', 'temperature': 0.5, 'followup_automatico': {'ativo': False, 'etapas': [{'nivel': 1}]}}
+    novo = {'plano': 'full', 'temperature': 0.7, 'openai_voice': 'nova',
+            'followup_automatico': {'ativo': True, 'etapas': [{'nivel': 1}, {'nivel': 2}]}}
+    definir, remover = diff_fluxo(antigo, novo)
+    assert sorted(definir) == sorted([
+        (['temperature'], 0.7),
+        (['openai_voice'], 'nova'),
+        (['followup_automatico', 'ativo'], True),
+        (['followup_automatico', 'etapas'], [{'nivel': 1}, {'nivel': 2}]),  # lista: valor inteiro
+    ])
+    assert remover == []
+
+
+def test_diff_fluxo_remocoes_aninhadas():
+    antigo = {'a': 1, 'b': {'c': 2, 'd': 3}}
+    definir, remover = diff_fluxo(antigo, {'b': {'c': 2}})
+    assert definir == []
+    assert sorted(remover) == [['a'], ['b', 'd']]
+
+
+def test_diff_fluxo_tipo_trocado_vira_definicao():
+    assert diff_fluxo({'a': {'x': 1}}, {'a': 'texto'}) == ([(['a'], 'texto')], [])
+    assert diff_fluxo({'a': 'texto'}, {'a': {'x': 1}}) == ([(['a'], {'x': 1})], [])
+
+
+def test_diff_colunas_so_o_que_mudou():
+    cfg = TenantConfig.from_row({'id': 1, 'prompt_full': 'P', 'id_instance': 'inst', 'zapi_token': None, 'client_token': ''})
+    assert diff_colunas(cfg, {'prompt_full': 'P', 'id_instance': 'inst', 'zapi_token': '', 'client_token': None}) == {}
+    assert diff_colunas(cfg, {'prompt_full': 'Novo', 'zapi_token': 'tok'}) == {'prompt_full': 'Novo', 'zapi_token': 'tok'}
+
+
+def test_diff_colunas_ignora_colunas_desconhecidas():
+    cfg = TenantConfig(cliente_id=1)
+    assert diff_colunas(cfg, {'nome_empresa': 'X', 'bot_pausado': True}) == {}
+
+
+def test_from_row_aceita_fluxo_em_string_e_devolve_copia():
+    cfg = TenantConfig.from_row({'id': 3, 'config_fluxo': '{"plano": "basico", "openai_voice": "robo", "extra": {"k": 1}}'})
+    assert cfg.plano == 'basico'
+    assert cfg.voz == 'alloy'  # voz desconhecida cai no padrão
+    fluxo = cfg.fluxo()
+    fluxo['extra']['k'] = 2
+    assert cfg.fluxo()['extra']['k'] == 1
@@ -0,0 +1,96 @@
+import pytest
+
+import zapi
+from fake_supabase import FakeClient, FakeDB, instala_esquema
+
+
+class Relogio:
+    """Relógio falso: sleep() só avança o tempo"""
+
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, s):
+        self.t += s
+
+
+def limitador(por_minuto=60, rajada=3, cls=zapi.Limitador, **kwargs):
+    r = Relogio()
+    return cls(por_minuto=por_minuto, rajada=rajada, limites={}, relogio=r, sleep=r.sleep, **kwargs), r
+
+
+def test_rajada_e_depois_a_taxa_do_orcamento():
+    lim, r = limitador(por_minuto=60, rajada=3)
+    assert [lim.aguarda('i', interativo=True) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert lim.aguarda('i', interativo=True) == pytest.approx(1.0)
+    assert lim.aguarda('i', interativo=True) == pytest.approx(1.0)
+    assert r.t == pytest.approx(2.0)
+
+
+def test_disparo_deixa_a_reserva_para_a_inbox():
+    lim, r = limitador(por_minuto=60, rajada=3)
+    lim.aguarda('i')
+    lim.aguarda('i')
+    # sobrou 1 ficha: o disparo espera, a Inbox passa na hora
+    assert lim.aguarda('i', interativo=True) == 0.0
+    assert lim.aguarda('i') > 0
+
+
+def test_timeout_levanta_zapi_error():
+    lim, r = limitador(por_minuto=6, rajada=1)
+    lim.aguarda('i', interativo=True)
+    with pytest.raises(zapi.ZapiError) as e:
+        lim.aguarda('i', interativo=True, timeout=2)
+    assert e.value.status == 429
+
+
+def test_aimd_corta_em_429_e_erro_e_recupera_aos_poucos():
+    lim, r = limitador(por_minuto=60)
+    lim.resultado('i', ok=False, status=429, retry_after=5)
+    assert lim.taxa_por_minuto('i') == pytest.approx(60 * zapi.CORTE_429)
+    assert lim.stats()['i']['pausada_s'] == pytest.approx(5)
+    lim.resultado('i', ok=False, status=503)
+    assert lim.taxa_por_minuto('i') == pytest.approx(60 * zapi.CORTE_429 * zapi.CORTE_ERRO)
+    lim.resultado('i', ok=True)
+    assert lim.taxa_por_minuto('i') == pytest.approx(60 * (zapi.CORTE_429 * zapi.CORTE_ERRO + zapi.RECUPERACAO))
+    for _ in range(100): lim.resultado('i', ok=True)
+    assert lim.taxa_por_minuto('i') == pytest.approx(60)  # nunca passa do orçamento
+
+
+def test_aimd_tem_piso():
+    lim, _ = limitador(por_minuto=60)
+    for _ in range(50): lim.resultado('i', ok=False, status=429, retry_after=0)
+    assert lim.taxa_por_minuto('i') == pytest.approx(60 * zapi.PISO_ADAPTATIVO)
+
+
+def test_pausa_de_429_segura_todos_os_envios():
+    lim, r = limitador(por_minuto=600, rajada=5)
+    lim.resultado('i', ok=False, status=429, retry_after=3)
+    assert lim.aguarda('i', interativo=True) >= 3
+
+
+def test_compartilhado_divide_o_orcamento_entre_nos():
+    client = FakeClient(instala_esquema(FakeDB()))
+    a = zapi.LimitadorCompartilhado(client, por_minuto=60, rajada=2, limites={})
+    b = zapi.LimitadorCompartilhado(client, por_minuto=60, rajada=2, limites={})
+    assert a._tenta('i', True) == 0.0
+    assert b._tenta('i', True) == 0.0
+    assert a._tenta('i', True) > 0  # a rajada foi gasta pelos dois nós juntos
+    a.resultado('i', ok=False, status=429, retry_after=30)
+    assert b._tenta('i', True) > 25  # a pausa vale para o outro nó
+    assert b.stats()['i']['taxa_min'] == pytest.approx(60 * zapi.CORTE_429)
+
+
+def test_compartilhado_cai_no_balde_local_sem_o_banco():
+    class SemRPC:
+        def rpc(self, *a, **k): raise RuntimeError("function zapi_ficha does not exist")
+
+    lim, r = limitador(por_minuto=60, rajada=1, cls=zapi.LimitadorCompartilhado, client=SemRPC())
+    assert lim.aguarda('i', interativo=True) == 0.0
+    assert lim.aguarda('i', interativo=True) == pytest.approx(1.0)
+    lim.resultado('i', ok=False, status=503)
+    assert lim.taxa_por_minuto('i') == pytest.approx(60 * zapi.CORTE_ERRO)
+    assert lim.stats()['i']['falhas_banco'] >= 3
@@ -0,0 +1,352 @@
+import streamlit as st
+import time
+import random
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+import settings
+
+# ==============================================================================
+# CLIENTE HTTP DA Z-API
+# ------------------------------------------------------------------------------
+# Todo envio (Inbox e Disparos) passa por aqui:
+# - uma requests.Session por instância Z-API (keep-alive + pool de conexões);
+# - timeout de conexão e de leitura sempre explícitos (nada de thread presa);
+# - novas tentativas limitadas com backoff exponencial e jitter em 429/5xx e
+#   falha de conexão (respeita Retry-After quando vier);
+# - um balde de fichas por id_instance (Limitador): orçamento de mensagens por
+#   minuto configurável, que encolhe em 429/erro e se recupera aos poucos a
+#   cada sucesso. Por padrão o balde fica no banco (sql/009,
+#   LimitadorCompartilhado) e vale para todos os nós. Com ZAPI_LIMITADOR=local
+#   (ou se a RPC falhar) ele é só do processo: cada nó com Inbox/DispatchEngine
+#   gasta o orçamento inteiro e a taxa real da instância se multiplica;
+# - métricas de latência/erro por processo (stats() e metrics.py).
+# ZAPI_BASE_URL aponta para um servidor falso local em testes.
+# ==============================================================================
+
+ZAPI_BASE_URL = settings.secret("ZAPI_BASE_URL", "https://api.z-api.io").rstrip('/')
+TIMEOUT_CONEXAO = float(settings.secret("ZAPI_TIMEOUT_CONEXAO", 3.05))
+TIMEOUT_LEITURA = float(settings.secret("ZAPI_TIMEOUT_LEITURA", 15))
+TENTATIVAS = int(settings.secret("ZAPI_TENTATIVAS", 3))
+BACKOFF_BASE = 0.5     # segundos; dobra a cada tentativa
+BACKOFF_MAXIMO = 8.0
+POOL_POR_INSTANCIA = 8
+
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+
+# Orçamento por instância: ZAPI_MSG_POR_MINUTO para todas, ZAPI_LIMITES para
+# exceções ("inst_a=40,inst_b=90" ou tabela no secrets.toml)
+MSG_POR_MINUTO = float(settings.secret("ZAPI_MSG_POR_MINUTO", 60))
+RAJADA = float(settings.secret("ZAPI_RAJADA", 3))           # fichas acumuláveis (envios seguidos sem espera)
+RESERVA_INTERATIVA = 1.0   # fichas que os disparos deixam livres para a Inbox
+PISO_ADAPTATIVO = 0.1      # a taxa nunca cai abaixo desta fração do orçamento
+CORTE_429 = 0.5            # multiplica a taxa em 429
+CORTE_ERRO = 0.8           # ... e em 5xx/falha de conexão
+RECUPERACAO = 0.05         # fração do orçamento devolvida a cada sucesso
+ESPERA_INTERATIVA = 10.0   # segundos que um envio da Inbox aceita esperar por ficha
+LIMITADOR = settings.secret("ZAPI_LIMITADOR", "banco")  # banco (sql/009, todos os nós) | local (só o processo)
+AMOSTRAS = 500         # latências guardadas por operação (p50/p95)
+
+class ZapiError(Exception):
+    """Falha definitiva de envio (após as tentativas). repetivel=False: reenviar
+    não resolve (4xx, credencial) ou arrisca duplicar (timeout de leitura)"""
+    def __init__(self, msg, status=None, tentativas=1, repetivel=True):
+        super().__init__(msg)
+        self.status = status
+        self.tentativas = tentativas
+        self.repetivel = repetivel
+
+def _limites(valor):
+    if isinstance(valor, str):
+        pares = [p.split('=', 1) for p in valor.split(',') if '=' in p]
+        valor = {k.strip(): v for k, v in pares}
+    try: return {str(k): float(v) for k, v in dict(valor or {}).items()}
+    except (TypeError, ValueError): return {}
+
+LIMITES = _limites(settings.secret("ZAPI_LIMITES", {}))
+
+class _Balde:
+    def __init__(self, por_minuto, rajada, agora):
+        self.teto = max(0.01, por_minuto / 60.0)  # fichas por segundo
+        self.taxa = self.teto
+        self.capacidade = max(1.0, rajada)
+        self.fichas = self.capacidade
+        self.em = agora
+        self.pausa_ate = 0.0
+        self.envios = self.esperas = self.penalidades = 0
+        self.espera_total = 0.0
+
+    def repoe(self, agora):
+        self.fichas = min(self.capacidade, self.fichas + (agora - self.em) * self.taxa)
+        self.em = agora
+
+class Limitador:
+    """Balde de fichas por id_instance, compartilhado por Inbox, Disparos e tentativas"""
+
+    def __init__(self, por_minuto=MSG_POR_MINUTO, rajada=RAJADA, limites=None,
+                 relogio=time.monotonic, sleep=time.sleep):
+        self.por_minuto, self.rajada = por_minuto, rajada
+        self.limites = dict(LIMITES if limites is None else limites)
+        self._relogio, self._sleep = relogio, sleep
+        self._lock = threading.Lock()
+        self._baldes = {}
+
+    def _balde(self, id_instance):
+        b = self._baldes.get(id_instance)
+        if b is None:
+            b = self._baldes[id_instance] = _Balde(self.limites.get(id_instance, self.por_minuto), self.rajada, self._relogio())
+        return b
+
+    def orcamento(self, id_instance, por_minuto):
+        """Troca o orçamento de uma instância em tempo de execução"""
+        with self._lock:
+            self.limites[id_instance] = float(por_minuto)
+            b = self._balde(id_instance)
+            b.teto = max(0.01, float(por_minuto) / 60.0)
+            b.taxa = min(b.taxa, b.teto)
+
+    def _minimo(self, b, interativo):
+        return 1.0 if interativo else min(b.capacidade, 1.0 + RESERVA_INTERATIVA)
+
+    def _tenta(self, id_instance, interativo):
+        """Tira uma ficha se der: 0.0, senão os segundos até a próxima"""
+        with self._lock:
+            b = self._balde(id_instance)
+            agora = self._relogio()
+            b.repoe(agora)
+            minimo = self._minimo(b, interativo)
+            if agora >= b.pausa_ate and b.fichas >= minimo:
+                b.fichas -= 1.0
+                return 0.0
+            return max(b.pausa_ate - agora, (minimo - b.fichas) / b.taxa)
+
+    def aguarda(self, id_instance, interativo=False, timeout=None):
+        """Bloqueia até haver ficha; disparos deixam RESERVA_INTERATIVA para a Inbox.
+        Devolve os segundos esperados ou levanta ZapiError após `timeout`"""
+        inicio, dormiu = self._relogio(), False
+        while True:
+            espera = self._tenta(id_instance, interativo)
+            if espera <= 0: break
+            if timeout is not None and self._relogio() - inicio + espera > timeout:
+                raise ZapiError("Limite de envio da instância atingido; tente em instantes", status=429)
+            self._sleep(min(espera, 1.0))  # reavalia: a taxa pode ter mudado nesse meio tempo
+            dormiu = True
+        esperou = self._relogio() - inicio if dormiu else 0.0
+        with self._lock:
+            b = self._balde(id_instance)
+            b.envios += 1
+            if dormiu:
+                b.esperas += 1
+                b.espera_total += esperou
+        if dormiu: metrics.observa('zapi', 'limitador', 'espera', esperou)
+        return esperou
+
+    def taxa_por_minuto(self, id_instance):
+        """Taxa efetiva agora (já com o corte adaptativo)"""
+        with self._lock: return self._balde(id_instance).taxa * 60
+
+    def resultado(self, id_instance, ok, status=None, retry_after=None):
+        """AIMD: sucesso devolve RECUPERACAO do orçamento, 429/erro cortam a taxa"""
+        with self._lock:
+            b = self._balde(id_instance)
+            if ok:
+                b.taxa = min(b.teto, b.taxa + b.teto * RECUPERACAO)
+                return
+            b.penalidades += 1
+            b.taxa = max(b.teto * PISO_ADAPTATIVO, b.taxa * (CORTE_429 if status == 429 else CORTE_ERRO))
+            if status == 429:
+                # Ninguém envia pela instância até passar o Retry-After (ou o intervalo da nova taxa)
+                b.pausa_ate = max(b.pausa_ate, self._relogio() + (retry_after if retry_after is not None else 1.0 / b.taxa))
+                b.fichas = min(b.fichas, 0.0)
+
+    def stats(self):
+        """{id_instance: orçamento, taxa atual, fichas, envios, esperas, penalidades}"""
+        with self._lock:
+            agora = self._relogio()
+            out = {}
+            for inst, b in self._baldes.items():
+                b.repoe(agora)
+                out[inst] = {
+                    'orcamento_min': round(b.teto * 60, 1), 'taxa_min': round(b.taxa * 60, 1), 'fichas': round(b.fichas, 2),
+                    'pausada_s': round(max(0.0, b.pausa_ate - agora), 1), 'envios': b.envios, 'esperas': b.esperas,
+                    'espera_media_ms': round(b.espera_total / b.esperas * 1000, 1) if b.esperas else 0.0,
+                    'penalidades': b.penalidades,
+                }
+            return out
+
+class LimitadorCompartilhado(Limitador):
+    """O mesmo balde, guardado em zapi_fichas (sql/009): um orçamento por instância
+    para todos os processos e nós. O balde local vira espelho (stats, taxa da
+    campanha) e reserva: se a RPC falhar (sem sql/009, banco fora), aquele
+    pedido usa o balde do processo e o limite volta a ser por nó"""
+
+    def __init__(self, client, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.falhas_banco = 0
+
+    def _rpc(self, nome, params):
+        data = self.client.rpc(nome, params).execute().data
+        return data[0] if isinstance(data, list) else data
+
+    def _tenta(self, id_instance, interativo):
+        with self._lock:
+            b = self._balde(id_instance)
+            params = {'p_id_instance': id_instance, 'p_por_minuto': b.teto * 60,
+                      'p_rajada': b.capacidade, 'p_minimo': self._minimo(b, interativo)}
+        try: r = self._rpc('zapi_ficha', params)
+        except Exception:
+            with self._lock: self.falhas_banco += 1
+            return super()._tenta(id_instance, interativo)
+        with self._lock:
+            b.taxa, b.fichas, b.em = float(r['taxa_min']) / 60, float(r['fichas']), self._relogio()
+        return float(r['espera'])
+
+    def resultado(self, id_instance, ok, status=None, retry_after=None):
+        with self._lock:
+            b = self._balde(id_instance)
+            if ok and b.taxa >= b.teto: return  # já no teto: sucesso não muda nada no banco
+        try:
+            taxa = self._rpc('zapi_ficha_resultado', {
+                'p_id_instance': id_instance, 'p_ok': ok, 'p_status': status, 'p_retry_after': retry_after,
+                'p_recuperacao': RECUPERACAO, 'p_piso': PISO_ADAPTATIVO, 'p_corte_429': CORTE_429, 'p_corte_erro': CORTE_ERRO})
+        except Exception:
+            with self._lock: self.falhas_banco += 1
+            taxa = None
+        if taxa is None: return super().resultado(id_instance, ok, status, retry_after)
+        with self._lock:
+            b.taxa = float(taxa) / 60
+            if not ok: b.penalidades += 1
+
+    def stats(self):
+        out = super().stats()
+        for linha in out.values(): linha['falhas_banco'] = self.falhas_banco
+        return out
+
+class ZapiClient:
+    """Cliente compartilhado entre sessões e threads do processo"""
+
+    def __init__(self, base_url=ZAPI_BASE_URL, timeout=(TIMEOUT_CONEXAO, TIMEOUT_LEITURA),
+                 tentativas=TENTATIVAS, sleep=time.sleep, limitador=None):
+        self.base_url = base_url.rstrip('/')
+        self.limitador = limitador or Limitador()
+        self.timeout = timeout
+        self.tentativas = max(1, tentativas)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._metricas = {}
+
+    # --- CONEXÕES ---
+    def _session(self, id_instance):
+        with self._lock:
+            s = self._sessions.get(id_instance)
+            if s is None:
+                s = requests.Session()
+                # Sem retry do urllib3: as tentativas ficam aqui, com métrica e jitter
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_POR_INSTANCIA, max_retries=0)
+                s.mount('https://', adapter)
+                s.mount('http://', adapter)
+                self._sessions[id_instance] = s
+            return s
+
+    def close(self):
+        with self._lock:
+            for s in self._sessions.values():
+                try: s.close()
+                except: pass
+            self._sessions.clear()
+
+    # --- ENVIO ---
+    def send_text(self, creds, phone, message, interativo=False):
+        """POST send-text; devolve o JSON da Z-API ou levanta ZapiError.
+        interativo=True (Inbox): usa a reserva do balde e espera no máximo ESPERA_INTERATIVA"""
+        return self._post(creds, 'send-text', {"phone": phone, "message": message}, interativo)
+
+    def _post(self, creds, operacao, payload, interativo=False):
+        id_instance, token = creds.get('id_instance'), creds.get('zapi_token')
+        if not id_instance or not token: raise ZapiError("Z-API sem credenciais", repetivel=False)
+
+        url = f"{self.base_url}/instances/{id_instance}/token/{token}/{operacao}"
+        headers = {"Client-Token": creds['client_token']} if creds.get('client_token') else {}
+        session = self._session(id_instance)
+
+        for tentativa in range(1, self.tentativas + 1):
+            # Toda tentativa (inclusive as repetições) consome ficha da instância
+            self.limitador.aguarda(id_instance, interativo, timeout=ESPERA_INTERATIVA if interativo else None)
+            inicio = time.monotonic()
+            espera, status = None, None
+            try:
+                r = session.post(url, json=payload, headers=headers, timeout=self.timeout)
+                status = r.status_code
+                if status < 400:
+                    self.limitador.resultado(id_instance, ok=True)
+                    self._registra(operacao, time.monotonic() - inicio, ok=True, tentativa=tentativa)
+                    try: return r.json()
+                    except ValueError: return {}
+                erro = f"HTTP {status}: {r.text[:200]}"
+                if status not in STATUS_REPETIVEIS:
+                    # 4xx: não adianta repetir
+                    self._registra(operacao, time.monotonic() - inicio, ok=False, tentativa=tentativa)
+                    raise ZapiError(erro[:300], status=status, tentativas=tentativa, repetivel=False)
+                espera = _retry_after(r)
+                self.limitador.resultado(id_instance, ok=False, status=status, retry_after=espera)
+            except requests.exceptions.ConnectTimeout as e:
+                erro = f"Timeout de conexão: {e}"
+                self.limitador.resultado(id_instance, ok=False)
+            except requests.exceptions.ReadTimeout as e:
+                # A Z-API pode ter recebido o pedido: repetir arrisca mensagem duplicada
+                self.limitador.resultado(id_instance, ok=False)
+                self._registra(operacao, time.monotonic() - inicio, ok=False, tentativa=tentativa)
+                raise ZapiError(f"Timeout de leitura: {e}", tentativas=tentativa, repetivel=False)
+            except requests.exceptions.ConnectionError as e:
+                erro = f"Falha de conexão: {e}"
+                self.limitador.resultado(id_instance, ok=False)
+
+            self._registra(operacao, time.monotonic() - inicio, ok=False, tentativa=tentativa)
+            if tentativa >= self.tentativas:
+                raise ZapiError(erro[:300], status=status, tentativas=tentativa)  # 429/5xx/conexão: repetível
+            self._sleep(espera if espera is not None else _backoff(tentativa))
+
+    # --- MÉTRICAS ---
+    def _registra(self, operacao, segundos, ok, tentativa):
+        with self._lock:
+            m = self._metricas.setdefault(operacao, {'chamadas': 0, 'erros': 0, 'repeticoes': 0, 'latencias': deque(maxlen=AMOSTRAS)})
+            m['chamadas'] += 1
+            if not ok: m['erros'] += 1
+            if tentativa > 1: m['repeticoes'] += 1
+            m['latencias'].append(segundos)
+        metrics.observa('zapi', operacao, 'post', segundos, ok=ok, detalhe=f"tentativa {tentativa}" if tentativa > 1 else None)
+
+    def stats(self):
+        """{operacao: chamadas, erros, repeticoes, p50_ms, p95_ms, max_ms}"""
+        with self._lock:
+            out = {}
+            for op, m in self._metricas.items():
+                lat = sorted(m['latencias'])
+                out[op] = {
+                    'chamadas': m['chamadas'], 'erros': m['erros'], 'repeticoes': m['repeticoes'],
+                    'p50_ms': round(metrics.percentil(lat, 0.50) * 1000, 1),
+                    'p95_ms': round(metrics.percentil(lat, 0.95) * 1000, 1),
+                    'max_ms': round((lat[-1] if lat else 0) * 1000, 1),
+                }
+            return out
+
+def _backoff(tentativa):
+    """Exponencial com jitter total (evita rajadas sincronizadas)"""
+    return random.uniform(0, min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** (tentativa - 1)))
+
+def _retry_after(r):
+    try: return min(BACKOFF_MAXIMO, max(0.0, float(r.headers.get('Retry-After'))))
+    except (TypeError, ValueError): return None
+
+@st.cache_resource
+def get_client():
+    """Um cliente (e um pool por instância) por processo; o balde é o do banco
+    (sql/009) salvo ZAPI_LIMITADOR=local ou sem conexão"""
+    import services  # tardio: services não depende da Z-API
+    if LIMITADOR == 'banco' and services.supabase is not None:
+        return ZapiClient(limitador=LimitadorCompartilhado(services.supabase))
+    return ZapiClient()